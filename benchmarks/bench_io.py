@@ -0,0 +1,204 @@
+"""Benchmarks of bus-bound operations
+
+Runs typical PyFEA operations against the simulated FEA unit with a realistic latency model and reports
+wall-clock time, number of round trips (messages sent and serial polls) and bus transactions per second. Results can be stored
+as a baseline in a JSON file and compared with it to flag regressions. Only round trips and transactions are compared,
+they do not depend on the machine running the benchmark.
+
+Usage::
+
+    python benchmarks/bench_io.py                   # run and compare with baseline
+    python benchmarks/bench_io.py --save            # run and store new baseline
+    python benchmarks/bench_io.py --interface USB
+
+This file is part of PyFEA.
+
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pyfea
+import pyfea.sim
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+
+def bench_open(fea, resource_name):
+    fea.close()
+    fea.open(resource_name)
+
+
+def bench_open_cached(fea, resource_name):
+    catalog = pyfea.UnitCatalog(os.path.join(tempfile.gettempdir(), 'pyfea-bench-catalog.json'))
+    fea.close()
+    fea.open(resource_name, catalog)
+
+
+def bench_read_questionable_regs(fea, resource_name):
+    fea.read_questionable_regs()
+
+
+def bench_monitoring_sweep(fea, resource_name):
+    for instrument in fea.instruments:
+        if isinstance(instrument, pyfea.Supply):
+            instrument.measure_voltage()
+        instrument.measure_current()
+
+
+def bench_measure_all(fea, resource_name):
+    fea.measure_all()
+
+
+def bench_calibration_upload(fea, resource_name):
+    points = [(0.001 * index, 10.0 * index) for index in range(64)]
+    fea.aps._set_calibration_points(points, 'MEAS:VOLT')
+
+
+def bench_calibration_download(fea, resource_name):
+    fea.aps._get_calibration_points('MEAS:VOLT')
+
+
+def bench_calibration_flow(fea, resource_name):
+    """Bus traffic of the quiescent current calibration of examples/calibrate/feacal.py (without settling)."""
+    xps = fea.aps
+    program_cal_points = xps.get_program_calibration_points()
+    ovp = xps.get_ovp()
+    ocp = xps.get_ocp()
+    rise_rate = xps.get_rise_rate()
+    fall_rate = xps.get_fall_rate()
+
+    xps.set_program_calibration_points([(0, 0), (1, 1)])
+    xps.set_ovp(False)
+    xps.set_ocp(False)
+    xps.set_rise_rate(1e9)
+    xps.set_fall_rate(1e9)
+    xps.set_voltage(0)
+    xps.turn_on(True)
+    xps.quiescent_compensation(False)
+
+    for level in (0.0, 0.2, 0.4, 0.6, 0.8):
+        xps.set_voltage(level)
+        xps.measure_buffered(['voltage_adc', 'current_adc'], 10, 0)
+
+    xps.turn_off(True)
+    xps.set_voltage(0)
+    xps.set_program_calibration_points(program_cal_points)
+    xps.set_ovp(ovp)
+    xps.set_ocp(ocp)
+    xps.set_rise_rate(rise_rate)
+    xps.set_fall_rate(fall_rate)
+
+
+BENCHMARKS = [
+    ('open', bench_open),
+    ('open_cached', bench_open_cached),
+    ('read_questionable_regs', bench_read_questionable_regs),
+    ('monitoring_sweep', bench_monitoring_sweep),
+    ('measure_all', bench_measure_all),
+    ('calibration_upload', bench_calibration_upload),
+    ('calibration_download', bench_calibration_download),
+    ('calibration_flow', bench_calibration_flow),
+]
+
+
+def run(interface='GPIB', repeat=5, error_policy=pyfea.ERROR_POLICY_STRICT, selected=None):
+    """Run benchmarks and return dictionary of results per benchmark."""
+    resource_name = 'SIM::%s::BENCH::INSTR' % interface
+    device = pyfea.sim.SimulatedFea(serial='BENCH')
+    pyfea.sim.register_device(resource_name, device)
+
+    fea = pyfea.Fea(resource_name)
+    fea.set_error_policy(error_policy)
+    fea.set_calibration_mode(True, pyfea.sim.SIM_PASSWORD)
+
+    results = {}
+    for name, function in BENCHMARKS:
+        if selected and name not in selected:
+            continue
+        function(fea, resource_name)       # warm up
+        transactions = device.transactions
+        round_trips = device.round_trips
+        start = time.perf_counter()
+        for _ in range(repeat):
+            function(fea, resource_name)
+        elapsed = (time.perf_counter() - start) / repeat
+        transactions = (device.transactions - transactions) / repeat
+        results[name] = {
+            'time': elapsed,
+            'round_trips': (device.round_trips - round_trips) / repeat,
+            'transactions': transactions,
+            'tps': transactions / elapsed if elapsed > 0 else 0.0,
+        }
+
+    fea.close()
+    return results
+
+
+def compare(results, baseline):
+    """Return list of regressions (more round trips or bus transactions than baseline).
+
+    Both counts are deterministic on the simulated unit, while wall-clock times depend on the machine and its
+    load, they are reported for information only.
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline.get(name)
+        if reference is None:
+            continue
+        for key in ('round_trips', 'transactions'):
+            if result[key] > reference[key]:
+                regressions.append('%s: %.1f %s, baseline %.1f' %
+                                   (name, result[key], key.replace('_', ' '), reference[key]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PyFEA bus-bound operations benchmark')
+    parser.add_argument('--interface', default='GPIB', choices=sorted(pyfea.sim.LATENCY_MODELS))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--error-policy', default=pyfea.ERROR_POLICY_STRICT,
+                        choices=[pyfea.ERROR_POLICY_STRICT, pyfea.ERROR_POLICY_DEFERRED, pyfea.ERROR_POLICY_SRQ])
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help='store results as the new baseline')
+    parser.add_argument('benchmarks', nargs='*', help='names of benchmarks to run (all by default)')
+    args = parser.parse_args()
+
+    results = run(args.interface, args.repeat, args.error_policy, args.benchmarks)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    key = '%s/%s' % (args.interface, args.error_policy)
+    baseline = baselines.get(key, {})
+
+    print('%-24s %10s %12s %8s %12s %12s' %
+          ('benchmark', 'time (ms)', 'round trips', 'tps', 'baseline ms', 'baseline rt'))
+    for name, result in results.items():
+        reference = baseline.get(name)
+        print('%-24s %10.2f %12.1f %8.0f %12s %12s' %
+              (name, result['time'] * 1e3, result['round_trips'], result['tps'],
+               '%.2f' % (reference['time'] * 1e3) if reference else '-',
+               '%.1f' % reference['round_trips'] if reference else '-'))
+
+    if args.save:
+        baselines[key] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('Baseline stored to %s' % args.baseline)
+        return 0
+
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        print('REGRESSION %s' % regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,104 @@
+"""Benchmark of PyFEA startup time
+
+Runs short-lived interpreters doing typical first steps of a CLI helper or probe script and reports the shortest
+wall-clock time above the bare interpreter startup. Times depend on the machine and are reported for information
+only, the benchmark fails when ``import pyfea`` alone loads heavy dependencies (pyvisa, NumPy, matplotlib), which
+would defeat the lazy loading of the package.
+
+Usage::
+
+    python benchmarks/bench_startup.py              # run and check the lazy loading
+    python benchmarks/bench_startup.py --save       # run and store new baseline
+
+This file is part of PyFEA.
+
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+BASELINE_KEY = 'startup'
+
+# modules which must not be loaded by plain import of the package
+HEAVY_MODULES = ('pyvisa', 'numpy', 'matplotlib', 'ctypes')
+
+SCRIPTS = {
+    'interpreter': 'pass',
+    'import': 'import pyfea',
+    'import_fea': 'import pyfea; pyfea.Fea',
+    'open_sim': "import pyfea; pyfea.Fea('SIM::NONE::22::INSTR').close()",
+    'first_query': "import pyfea; fea = pyfea.Fea('SIM::NONE::22::INSTR'); fea.aps.get_voltage(); fea.close()",
+}
+
+
+def measure(script, repeat) -> float:
+    """Shortest wall-clock time of running the script in a new interpreter (least disturbed by other load)."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True)
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def loaded_heavy_modules():
+    """Heavy modules loaded by ``import pyfea``."""
+    script = 'import sys, pyfea; print(",".join(name for name in %r if name in sys.modules))' % (HEAVY_MODULES,)
+    output = subprocess.run([sys.executable, '-c', script], cwd=ROOT, check=True, capture_output=True, text=True)
+    return [name for name in output.stdout.strip().split(',') if name]
+
+
+def run(repeat, names=None):
+    interpreter = measure(SCRIPTS['interpreter'], repeat)
+    results = {}
+    for name, script in SCRIPTS.items():
+        if name == 'interpreter' or (names and name not in names):
+            continue
+        results[name] = {'time': max(measure(script, repeat) - interpreter, 0.0)}
+    return interpreter, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description='PyFEA startup time benchmark')
+    parser.add_argument('--repeat', type=int, default=9)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save', action='store_true', help='store results as the new baseline')
+    parser.add_argument('benchmarks', nargs='*', help='names of benchmarks to run (all by default)')
+    args = parser.parse_args()
+
+    interpreter, results = run(args.repeat, args.benchmarks)
+    heavy = loaded_heavy_modules()
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    baseline = baselines.get(BASELINE_KEY, {})
+
+    print('interpreter startup %.1f ms, times below exclude it' % (interpreter * 1e3))
+    print('%-24s %10s %12s' % ('benchmark', 'time (ms)', 'baseline ms'))
+    for name, result in results.items():
+        reference = baseline.get(name)
+        print('%-24s %10.1f %12s' %
+              (name, result['time'] * 1e3, '%.1f' % (reference['time'] * 1e3) if reference else '-'))
+
+    regressions = ['import pyfea loads %s' % name for name in heavy]
+    if args.save and not regressions:
+        baselines[BASELINE_KEY] = results
+        with open(args.baseline, 'w') as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+        print('Baseline stored to %s' % args.baseline)
+        return 0
+
+    for regression in regressions:
+        print('REGRESSION %s' % regression)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
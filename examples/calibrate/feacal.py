@@ -1,21 +1,10 @@
-from matplotlib import pyplot as plt
-import numpy as np
-from numpy import outer
-
 from pyfea import Fea
-import pyvisa
-from time import sleep
-
-global fea, voltage_meter, current_meter
+from pyfea.calibrator import (Calibrator, ReferenceMeter)
 
 voltage_probe_div_ratio = 1000
 
-def mean(values):
-    return np.array(values).mean()
 
 def open_devices():
-    global fea, voltage_meter, current_meter
-
     fea = Fea('GPIB::22::INSTR')
     fea.init()
 
@@ -25,236 +14,75 @@ def open_devices():
     print('Fw version: %s' % fea.fw_version)
     print('Instruments: %s' % ', '.join(fea.instrument_names))
 
-    pm = pyvisa.ResourceManager()
-    voltage_meter = pm.open_resource('34470A')
-    voltage_meter.write('*RST')
-    voltage_meter.write('*CLS')
-    voltage_meter.write('CONF:VOLT:DC 10V')
-    voltage_meter.write('VOLT:NPLC 1')
-    voltage_meter.write('VOLT:ZERO:AUTO ONCE')
-
-    current_meter = pm.open_resource('34461B')
-    current_meter.write('*RST')
-    current_meter.write('*CLS')
-    current_meter.write('CONF:CURR:DC 100uA')
-    current_meter.write('CURR:NPLC 1')
-    current_meter.write('CURR:ZERO:AUTO ONCE')
-
-
-def qcom_calibration(xps, test_levels):
-    global fea, voltage_meter, current_meter
-
-    print('=== Measuring quiescent current of %s ===' % xps.name)
-
-    print('Enabling calibration mode')
-    fea.set_calibration_mode(True, '1234')
-
-    print('Saving program calibration')
-    program_cal_points = xps.get_program_calibration_points()
-    output_range = xps.get_range()
-    ovp = xps.get_ovp()
-    ocp = xps.get_ocp()
-    rise_rate = xps.get_rise_rate()
-    fall_rate = xps.get_fall_rate()
-
-    print('Disabling program scaling')
-    xps.set_program_calibration_points([(0, 0), (1, 1)])
-    xps.set_ovp(False)
-    xps.set_ocp(False)
-#    xps.set_range(1)
-    xps.set_rise_rate(1e9)
-    xps.set_fall_rate(1e9)
-
-    print('Turning on %s, waiting 10 sec.' % xps.name)
-    xps.set_voltage(0)
-    xps.turn_on(True)
-    sleep(10)
-
-    cal_quiescent_points = []
-    xps.quiescent_compensation(False)
-
-    voltage_adc_vec = []
-    current_adc_vec = []
-
-    print('Iterating program levels ')
-    for level in test_levels:
-        xps.set_voltage(level)
-        sleep(10)
-        voltage_adc_values = []
-        current_adc_values = []
-        for i in range(0, 10):
-            voltage_adc_values.append(xps.measure_voltage_adc())
-            current_adc_values.append(xps.measure_current_adc())
-            print('.', end='')
-            sleep(0.2)
-
-        voltage_adc = mean(voltage_adc_values)
-        current_adc = mean(current_adc_values)
-        cal_quiescent_points.append((voltage_adc, current_adc))
-        print('\rLevel %f, voltage ADC: %.3f, current ADC: %.3f' % (level, voltage_adc, current_adc))
-        voltage_adc_vec.append(voltage_adc)
-        current_adc_vec.append(current_adc)
-
-    print('Turning supply off and waiting')
-    xps.turn_off(True)
-    xps.set_voltage(0)
-
-    # Restore program cal points
-    xps.set_program_calibration_points(program_cal_points)
- #   xps.set_range(output_range)
-    xps.set_ovp(ovp)
-    xps.set_ovp(ocp)
-    xps.set_rise_rate(rise_rate)
-    xps.set_fall_rate(fall_rate)
+    voltage_meter = ReferenceMeter('34470A', scale=voltage_probe_div_ratio,
+                                   setup=['*RST', '*CLS', 'CONF:VOLT:DC 10V', 'VOLT:NPLC 1', 'VOLT:ZERO:AUTO ONCE'])
+    current_meter = ReferenceMeter('34461B', tolerance=1e-8,
+                                   setup=['*RST', '*CLS', 'CONF:CURR:DC 100uA', 'CURR:NPLC 1', 'CURR:ZERO:AUTO ONCE'])
+    return fea, voltage_meter, current_meter
 
-    ax = plt.subplot(211)
-    ax.cla()
-    ax.plot(test_levels, np.array(voltage_adc_vec) * 100)
-    plt.ylabel("Voltage (%)")
-    ax.grid()
-    ax = plt.subplot(212)
-    ax.cla()
-    ax.plot(test_levels, np.array(current_adc_vec) * 100)
-    plt.ylabel("Current (%)")
-    ax.grid()
-    plt.show(block=True)
 
-    store_qcom = input('Store QCOM data? y/n')
-    if store_qcom and store_qcom.lower()[0] == 'y':
-        # Set newly acquired quiescent current compensation points
-        xps.set_quiescent_compensation_points(cal_quiescent_points)
-        # Turn qcom on
-        xps.quiescent_compensation(True)
+def print_progress(supply, index, result):
+    line = '%s level %.3f: voltage ADC %.5f, current ADC %.5f' % \
+           (supply.name, result.levels[index], result.voltage_adc[index], result.current_adc[index])
+    if result.voltage_ref is not None:
+        line += ', voltage %.3f V, current %.3f uA' % (result.voltage_ref[index], result.current_ref[index] * 1e6)
+    if not result.settled[index]:
+        line += ' (not settled)'
+    print(line)
 
 
-def do_calibration(xps, test_levels):
-    print('=== Measuring program and monitors of %s ===' % xps.name)
+def plot_results(results, title):
+    # matplotlib is loaded only when there is something to plot
+    from matplotlib import pyplot as plt
 
-    print('Enabling calibration mode')
-    fea.set_calibration_mode(True, '1234')
+    fig, axes = plt.subplots(2, 1, sharex=True)
+    fig.suptitle(title)
+    for name, result in results.items():
+        axes[0].plot(result.levels, result.voltage_adc * 100, label=name)
+        axes[1].plot(result.levels, result.current_adc * 100, label=name)
+    axes[0].set_ylabel('Voltage (%)')
+    axes[1].set_ylabel('Current (%)')
+    for ax in axes:
+        ax.grid()
+        ax.legend()
+    plt.show(block=False)
+    plt.pause(0.1)
 
-    print('Saving program calibration')
-    program_cal_points = xps.get_program_calibration_points()
-    ovp = xps.get_ovp()
-    ocp = xps.get_ocp()
-    xps.set_ovp(False)
-    xps.set_ocp(False)
 
-    print('Disabling program scaling')
-    xps.set_program_calibration_points([(0, 0), (1, 1)])
-
-    print('Turning on %s, waiting 10 sec.' % xps.name)
-    xps.set_voltage(0)
-    xps.turn_on(True)
-    sleep(10)
-
-    voltage_adc_vec = []
-    current_adc_vec = []
-    voltage_ext_vec = []
-    current_ext_vec = []
-
-    for level in test_levels:
-        xps.set_voltage(level)
-        sleep(10)
-
-        voltage_ext_values = []
-        current_ext_values = []
-        voltage_adc_values = []
-        current_adc_values = []
-
-        print( 'Level %f ' % level, end='')
-        for i in range(0, 10):
-            voltage_adc_values.append(xps.measure_voltage_adc())
-            current_adc_values.append(xps.measure_current_adc())
-            voltage_ext_values.append(float(voltage_meter.query("READ?")) * voltage_probe_div_ratio)
-            current_ext_values.append(float(current_meter.query("READ?")))
-            print('.', end='')
-            sleep(0.2)
-
-        voltage_adc = mean(voltage_adc_values)
-        current_adc = mean(current_adc_values)
-        voltage_ext = mean(voltage_ext_values)
-        current_ext = mean(current_ext_values)
-
-        print('\rLevel %f, voltage ADC/EXT: %.3f/%.3f V, current ADC/EXT: %.3f/%.3f uA' %
-              (level,
-               voltage_adc, voltage_ext,
-               current_adc, current_ext*1e6))
-
-        voltage_adc_vec.append(voltage_adc)
-        current_adc_vec.append(current_adc)
-        voltage_ext_vec.append(voltage_ext)
-        current_ext_vec.append(current_ext)
-
-    print('Turning supply off and waiting')
-    xps.turn_off(True)
-    xps.set_voltage(0)
-
-    # Restore program cal points
-    xps.set_program_calibration_points(program_cal_points)
-    xps.set_ovp(ovp)
-    xps.set_ovp(ocp)
-
-    plt.figure(1)
-    ax = plt.subplot(221)
-    ax.cla()
-    ax.plot(test_levels, np.array(voltage_adc_vec) * 100)
-    plt.ylabel("Voltage (%)")
-    ax.grid()
-
-    ax = plt.subplot(222)
-    ax.cla()
-    ax.plot(test_levels, voltage_ext_vec)
-    plt.ylabel("Voltage (V)")
-    ax.grid()
-
-    ax = plt.subplot(223)
-    ax.cla()
-    ax.plot(test_levels, np.array(current_adc_vec) * 100)
-    plt.ylabel("Current (%)")
-    ax.grid()
-
-    ax = plt.subplot(224)
-    ax.cla()
-    ax.plot(test_levels, np.array(current_ext_vec) * 1e6)
-    plt.ylabel("Current (uA)")
-    ax.grid()
-
-    plt.show(block=True)
-
-    store_cal = input('Set calibration data?')
-    if store_cal and store_cal.lower()[0] == 'y':
-        print( 'Set newly acquired cal. data' )
-        xps.set_program_calibration_points(list(zip(abs(np.array(voltage_ext_vec)), test_levels)))
-        xps.set_vmonit_calibration_points(list(zip(voltage_adc_vec, voltage_ext_vec)))
-        xps.set_imonit_calibration_points(list(zip(current_adc_vec, current_ext_vec)))
+def confirm(prompt):
+    answer = input(prompt)
+    return answer and answer.lower()[0] == 'y'
 
 
 if __name__ == '__main__':
 
-    open_devices()
-
-    # xps = fea.eps
-    # xps = fea.sps
-    xps = fea.aps
+    fea, voltage_meter, current_meter = open_devices()
+    calibrator = Calibrator(fea, '1234', progress=print_progress)
 
-    test_levels = np.linspace(0, xps.max_norm_prog, 5)
+    # all supplies are measured concurrently, supplies sharing the reference meters one after another
+    supplies = [fea.aps]
 
+    print('Turning supplies off')
+    fea.turn_off(supplies)
 
-    print('Turning supply off and waiting')
-    xps.turn_off(True)
-    xps.set_voltage(0)
-    sleep(3)
+    qcom = {}
+    if confirm('Disconnect output load and enter "y" to do quiescent compensation:'):
+        qcom = calibrator.measure_qcom(supplies)
+        plot_results(qcom, 'Quiescent current')
+        if not confirm('Store QCOM data? y/n'):
+            qcom = {}
 
-    do_qcom = input('Disconnect output load and enter "y" to do quiescent compensation:')
-    if do_qcom and do_qcom.lower()[0] == 'y':
-        qcom_calibration(xps, test_levels)
+    results = {}
+    if confirm('Connect output load and enter "y" to do program and monitors calibration:'):
+        results = calibrator.measure({supply: (voltage_meter, current_meter) for supply in supplies})
+        plot_results(results, 'Program and monitors')
+        if not confirm('Set calibration data?'):
+            results = {}
 
-    do_cal = input('Connect output load and enter "y" to do program and monitors calibration:')
-    if do_cal and do_cal.lower()[0] == 'y':
-        do_calibration(xps, test_levels)
+    calibrator.apply(results, qcom)
 
-    save_cal = input('Save calibration? ')
-    if save_cal and save_cal.lower()[0] == 'y':
+    if confirm('Save calibration? '):
         fea.save_calibration()
 
+    voltage_meter.close()
+    current_meter.close()
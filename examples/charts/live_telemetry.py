@@ -0,0 +1,26 @@
+"""Live view of FEA telemetry
+
+Streams APS, EPS and SPS voltages and AMM current by a background acquisition and plots them with
+bounded redraw rate until the window is closed. The simulated unit is used unless a VISA resource name
+is given, e.g. ``python live_telemetry.py GPIB::22::INSTR``.
+
+"""
+import sys
+from pyfea import (Fea, Acquisition)
+from pyfea.plotting import (LivePlot, telemetry_channels)
+
+if __name__ == '__main__':
+
+    fea = Fea(sys.argv[1] if len(sys.argv) > 1 else 'SIM::NONE::22::INSTR')
+    print('Unit: %s, serial: %s' % (fea.unit_name, fea.serial))
+
+    # acquisition runs at its own rate, the plot only reads the latest samples from its ring buffer
+    acquisition = Acquisition(fea, telemetry_channels(fea), rate=50, capacity=50 * 3600)
+    acquisition.start()
+    try:
+        plot = LivePlot(acquisition, window=300, max_fps=10, title='FEA %s' % fea.serial)
+        plot.show()
+        print('%d frames, %d full redraws, %d samples' % (plot.frames, plot.full_redraws, acquisition.count))
+    finally:
+        acquisition.stop()
+        fea.close()
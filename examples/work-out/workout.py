@@ -1,6 +1,5 @@
 from pyfea import Fea
 import random
-from time import sleep
 
 if __name__ == '__main__':
 
@@ -38,7 +37,12 @@ if __name__ == '__main__':
             fea.eps.set_voltage( voltage2 )
             fea.sps.set_voltage( voltage3 )
             fea.wait_for_operation_complete()
-            sleep(1)
+            # only outputs turned on are awaited
+            if not fea.settle(timeout=60):
+                print('Outputs not settled within 60 s')
+                break
 
     except KeyboardInterrupt:
-        pass
\ No newline at end of file
+        pass
+    finally:
+        fea.aps.turn_off()
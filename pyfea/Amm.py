@@ -8,6 +8,9 @@ This file is part of PyFEA.
 import pyfea
 from typing import *
 
+if TYPE_CHECKING:
+    from pyfea.measurement import BufferedMeasurement
+
 def floats(string_list) -> List[float]:
     """Convert list of floats represented as strings to list of float numbers."""
     return [float(value) for value in string_list]
@@ -57,13 +60,33 @@ class Amm(pyfea.Instrument):
         """
         return float(self._parent.query('CAL%d:MEAS:CURR:LEVEL?' % self.number))
 
+    def measure_current_buffered(self, count, interval) -> 'BufferedMeasurement':
+        """Acquire block of current samples (see :meth:`pyfea.Instrument.measure_buffered`)."""
+        return self.measure_buffered(['current'], count, interval)['current']
+
+    def measure_current_adc_buffered(self, count, interval) -> 'BufferedMeasurement':
+        """Acquire block of current monitor ADC samples (see :meth:`pyfea.Instrument.measure_buffered`)."""
+        return self.measure_buffered(['current_adc'], count, interval)['current_adc']
+
+    def _buffered_queries(self):
+        return {'current': ('CURR', 'MEAS%d:CURR?' % self.number),
+                'current_adc': ('CURR:LEV', 'CAL%d:MEAS:CURR:LEVEL?' % self.number)}
+
+    def _snapshot_queries(self):
+        return [('current', 'MEAS%d:CURR?' % self.number),
+                ('temperature', 'DIAG%d:TEMP?' % self.number)]
+
     def is_ready(self):
         """Check if output channel voltage is ready (settled) or not."""
 
-        self._parent.read_questionable_regs()
+        if not self._parent.ready_events:
+            self._parent.read_questionable_regs()
+        return self.ready
+
+    def _is_ready_flag(self) -> bool:
         return self.ready
 
-    def _set_ready(self, ready):
+    def _set_ready(self, channel, ready):
         self.ready = ready
 
     def zero_check(self, enable):
@@ -86,20 +109,32 @@ class Amm(pyfea.Instrument):
         range
             Range in amps
         """
-        self._parent.write('MEAS%d:CURR:RANG %f' % (self.number, range))
+        self._cached_write('range', 'MEAS%d:CURR:RANG %f' % (self.number, range), float(range))
+        if self.cache_enabled:
+            self._cache['auto_range'] = False
 
     def get_range(self) -> float:
         """Get range (in amperes)"""
-        return float(self._parent.query('MEAS%d:CURR:RANG?' % self.number))
+        if not self.cache_enabled:
+            return float(self._parent.query('MEAS%d:CURR:RANG?' % self.number))
+        if self.is_auto_range():
+            # range is selected by the device, it cannot be cached
+            self._cache.pop('range', None)
+            return float(self._parent.query('MEAS%d:CURR:RANG?' % self.number))
+        return self._cached_query('range', 'MEAS%d:CURR:RANG?' % self.number, float)
 
     def auto_range(self):
         self._parent.write('MEAS%d:CURR:RANG:AUTO' % self.number)
+        self._settings['range'] = 'MEAS%d:CURR:RANG:AUTO' % self.number
+        self._cache.pop('range', None)
+        if self.cache_enabled:
+            self._cache['auto_range'] = True
 
     def is_auto_range(self):
-        return int(self._parent.query('MEAS%d:CURR:RANG:AUTO?' % self.number)) != 0
+        return self._cached_query('auto_range', 'MEAS%d:CURR:RANG:AUTO?' % self.number, lambda value: int(value) != 0)
 
     def set_averaging(self, count):
-        self._parent.write('MEAS%d:CURR:AVER %d' % (self.number, count))
+        self._cached_write('averaging', 'MEAS%d:CURR:AVER %d' % (self.number, count), int(count))
 
     def get_averaging(self):
-        return int(self._parent.query('MEAS%d:CURR:RANG:AVER?' % self.number))
+        return self._cached_query('averaging', 'MEAS%d:CURR:RANG:AVER?' % self.number, int)
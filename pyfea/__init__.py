@@ -1,9 +1,98 @@
+"""Control of FEA units
+
+Only errors and constants are imported with the package, other public names are loaded on first access
+(PEP 562), so ``import pyfea`` does not pay for pyvisa, NumPy or features which are not used.
+
+This file is part of PyFEA.
+
+"""
+import importlib
+from typing import TYPE_CHECKING
+from . import errors as _errors
+from . import constants as _constants
 from .errors import *
 from .constants import *
-from .device import Fea
-from .instrument import Instrument
-from .supply import Supply
-from .Aps import Aps
-from .Sps import Sps
-from .Eps import Eps
-from .Amm import Amm
+
+# public names and modules defining them
+_LAZY_NAMES = {
+    'Fea': 'device',
+    'Batch': 'batch',
+    'Snapshot': 'snapshot',
+    'Reading': 'snapshot',
+    'Acquisition': 'acquisition',
+    'AsyncFea': 'aio',
+    'AsyncInstrument': 'aio',
+    'FeaCluster': 'cluster',
+    'ClusterResult': 'cluster',
+    'StatusTree': 'status',
+    'StatusTable': 'status',
+    'BufferedMeasurement': 'measurement',
+    'Tracer': 'trace',
+    'JsonlExporter': 'trace',
+    'LoggingExporter': 'trace',
+    'IoScheduler': 'scheduler',
+    'CalibrationCurve': 'calibration',
+    'SupplyCalibration': 'calibration',
+    'Calibrator': 'calibrator',
+    'ReferenceMeter': 'calibrator',
+    'Sequencer': 'sequencer',
+    'SequenceReport': 'sequencer',
+    'UnitCatalog': 'catalog',
+    'RecoveryPolicy': 'recovery',
+    'Reconnection': 'recovery',
+    'Recorder': 'recorder',
+    'RecordingReader': 'recorder',
+    'LivePlot': 'plotting',
+    'Instrument': 'instrument',
+    'Supply': 'supply',
+    'Aps': 'Aps',
+    'Sps': 'Sps',
+    'Eps': 'Eps',
+    'Amm': 'Amm',
+}
+
+# names exported by star import, optional features must be imported explicitly so that they stay lazy
+_CORE_NAMES = ['Fea', 'Batch', 'Snapshot', 'Reading', 'Instrument', 'Supply', 'Aps', 'Sps', 'Eps', 'Amm']
+
+__all__ = ([name for name in vars(_errors) if not name.startswith('_')] +
+           [name for name in vars(_constants) if not name.startswith('_')] +
+           _CORE_NAMES)
+
+
+def __getattr__(name):
+    module = _LAZY_NAMES.get(name)
+    if module is None:
+        raise AttributeError('module %r has no attribute %r' % (__name__, name))
+    value = getattr(importlib.import_module('.' + module, __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_LAZY_NAMES))
+
+
+if TYPE_CHECKING:
+    from .device import Fea
+    from .batch import Batch
+    from .snapshot import (Snapshot, Reading)
+    from .acquisition import Acquisition
+    from .aio import (AsyncFea, AsyncInstrument)
+    from .cluster import (FeaCluster, ClusterResult)
+    from .status import (StatusTree, StatusTable)
+    from .measurement import BufferedMeasurement
+    from .trace import (Tracer, JsonlExporter, LoggingExporter)
+    from .scheduler import IoScheduler
+    from .calibration import (CalibrationCurve, SupplyCalibration)
+    from .calibrator import (Calibrator, ReferenceMeter)
+    from .sequencer import (Sequencer, SequenceReport)
+    from .catalog import UnitCatalog
+    from .recovery import (RecoveryPolicy, Reconnection)
+    from .recorder import (Recorder, RecordingReader)
+    from .plotting import LivePlot
+    from .instrument import Instrument
+    from .supply import Supply
+    from .Aps import Aps
+    from .Sps import Sps
+    from .Eps import Eps
+    from .Amm import Amm
@@ -0,0 +1,220 @@
+"""Background streaming acquisition
+
+This file is part of PyFEA.
+
+"""
+import threading
+import time
+import numpy as np
+from typing import (Iterator, List, Tuple)
+from pyfea.errors import *
+from pyfea.constants import *
+from pyfea.scpi import (join_commands, split_response)
+
+
+class Acquisition:
+    """Fixed-rate acquisition of measured values running on a dedicated thread.
+
+    All selected channels are read by one compound query per sample. Samples are stored in a preallocated ring
+    buffer, the first column holds the timestamp and the following columns hold values of the channels in the
+    order they were given. The writer publishes a sample only after it is completely stored, so readers never
+    need to take a lock.
+
+    Example
+    -------
+    >>> acq = Acquisition(fea, [(fea.aps, 'voltage'), (fea.aps, 'current'), (fea.amm, 'current')], rate=20)
+    >>> acq.start()
+    >>> for block in acq.blocks():
+    ...     print(block[:, 1].mean())
+    """
+
+    def __init__(self, parent, channels: List[Tuple[object, str]], rate=10.0, capacity=100000, max_duty=0.5):
+        """Object constructor
+
+        Parameters
+        ----------
+        parent : pyfea.Fea
+            FEA unit to be polled.
+        channels
+            List of (instrument, quantity) pairs, quantity is one of 'voltage', 'current' or 'temperature'.
+        rate : float
+            Target sampling rate in samples per second.
+        capacity : int
+            Number of samples held in the ring buffer.
+        max_duty : float
+            Maximal fraction of time the interface is occupied by the acquisition, the rest is left to
+            other (ad-hoc) commands even if the target rate cannot be reached.
+        """
+        if rate <= 0:
+            raise ValueError('Sampling rate must be positive, got %r' % rate)
+        if not 0 < max_duty <= 1:
+            raise ValueError('Maximal duty must be in (0, 1], got %r' % max_duty)
+        self._parent = parent
+        self.channels = list(channels)
+        self.rate = rate
+        self.capacity = capacity
+        self.max_duty = max_duty
+
+        queries = []
+        for instrument, quantity in self.channels:
+            available = dict(instrument._snapshot_queries())
+            if quantity not in available or quantity == 'state':
+                raise ValueError('%s cannot measure %s' % (instrument.name, quantity))
+            queries.append(available[quantity])
+        self._message = join_commands(queries)
+
+        self._buffer = np.full((capacity, len(self.channels) + 1), np.nan)
+        self._count = 0
+        self._new_data = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = None
+
+        self.missed = 0
+        self.errors = 0
+        self.last_error = None
+
+    @property
+    def names(self) -> List[str]:
+        """Column names of the buffer."""
+        return ['time'] + ['%s.%s' % (instrument.name, quantity) for instrument, quantity in self.channels]
+
+    @property
+    def count(self) -> int:
+        """Total number of acquired samples."""
+        return self._count
+
+    def start(self):
+        """Start the acquisition thread."""
+        if self.is_running():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='pyfea-acquisition', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop the acquisition thread and wait for its termination."""
+        self._stop.set()
+        with self._new_data:
+            self._new_data.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def _run(self):
+        with self._parent.io_priority(PRIORITY_LOW):
+            self._loop()
+
+    def _loop(self):
+        period = 1.0 / self.rate
+        next_time = time.monotonic()
+        while not self._stop.is_set():
+            busy_start = time.monotonic()
+            self._poll()
+            busy = time.monotonic() - busy_start
+
+            next_time += period
+            now = time.monotonic()
+            if now > next_time:
+                missed = int((now - next_time) / period) + 1
+                self.missed += missed
+                next_time += missed * period
+
+            # leave the interface to other threads at least for (1 - max_duty) of the time
+            delay = max(next_time - now, busy * (1.0 - self.max_duty) / self.max_duty)
+            self._stop.wait(delay)
+
+    def _poll(self):
+        start = time.time()
+        try:
+            response = self._parent.query(self._message)
+        except Error as error:
+            self.errors += 1
+            self.last_error = error
+            return
+        timestamp = (start + time.time()) / 2
+
+        try:
+            values = [float(value) for value in split_response(response)]
+            if len(values) != len(self.channels):
+                raise ValueError('Expected %d values, got %d in %r' % (len(self.channels), len(values), response))
+        except ValueError as error:
+            self.errors += 1
+            self.last_error = error
+            return
+
+        row = self._buffer[self._count % self.capacity]
+        row[0] = timestamp
+        row[1:] = values
+
+        # publish the sample
+        self._count += 1
+        with self._new_data:
+            self._new_data.notify_all()
+
+    def view(self, start, stop) -> np.ndarray:
+        """Get samples with absolute indexes from start to stop.
+
+        The result is a view of the ring buffer when the range is contiguous, a copy otherwise. Views are valid
+        until the samples are overwritten (after ``capacity`` new samples).
+
+        Parameters
+        ----------
+        start : int
+            Absolute index of the first sample.
+        stop : int
+            Absolute index after the last sample.
+
+        Returns
+        -------
+        numpy.ndarray
+            Array of shape (samples, channels + 1), the first column is timestamp.
+        """
+        count = self._count
+        start = max(start, count - self.capacity, 0)
+        stop = min(stop, count)
+        if stop <= start:
+            return self._buffer[0:0]
+
+        first = start % self.capacity
+        last = first + (stop - start)
+        if last <= self.capacity:
+            return self._buffer[first:last]
+        return np.concatenate((self._buffer[first:], self._buffer[:last - self.capacity]))
+
+    def latest(self, samples=1) -> np.ndarray:
+        """Get copy of the latest samples."""
+        count = self._count
+        return self.view(count - samples, count).copy()
+
+    def blocks(self, timeout=None) -> Iterator[np.ndarray]:
+        """Generator of blocks of new samples.
+
+        Each block contains copies of all samples acquired since the previous block. Samples overwritten
+        before they were read are silently skipped.
+
+        Parameters
+        ----------
+        timeout : float
+            Maximal time to wait for new samples (in seconds), the generator ends when it elapses.
+        """
+        index = self._count
+        while True:
+            with self._new_data:
+                if self._count == index and not self._stop.is_set():
+                    self._new_data.wait(timeout)
+            count = self._count
+            if count == index:
+                return
+            yield self.view(index, count).copy()
+            index = count
@@ -0,0 +1,204 @@
+"""asyncio front-end for the FEA unit
+
+This file is part of PyFEA.
+
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from pyfea.device import Fea
+
+
+class AsyncInstrument:
+    """Awaitable proxy of a virtual instrument.
+
+    Every method of the wrapped instrument (e.g. ``set_voltage`` of :class:`pyfea.Supply` or ``measure_current``
+    of :class:`pyfea.Amm`) is available as a coroutine executed by the I/O worker of the parent unit.
+    Other attributes are returned unchanged.
+    """
+
+    def __init__(self, parent, instrument):
+        self._parent = parent
+        self.instrument = instrument
+
+    def __getattr__(self, name):
+        if name == 'instrument':
+            raise AttributeError(name)
+        attribute = getattr(self.instrument, name)
+        if not callable(attribute):
+            return attribute
+
+        async def method(*args, timeout=None, **kwargs):
+            return await self._parent.run(attribute, *args, timeout=timeout, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = attribute.__doc__
+        return method
+
+    def __repr__(self):
+        return 'AsyncInstrument(%s)' % self.instrument.name
+
+
+class AsyncFea:
+    """asyncio front-end of :class:`pyfea.Fea`.
+
+    All blocking calls are executed by a single I/O worker thread dedicated to the VISA resource, so the event
+    loop is never blocked and commands keep their order. When an awaited call is cancelled or times out before
+    it was started, it is not sent at all; a call already in progress is bounded by the VISA timeout of the
+    query and its result is discarded.
+
+    Methods of :class:`pyfea.Fea` not defined here are available as coroutines as well.
+
+    Example
+    -------
+    >>> fea = AsyncFea()
+    >>> await fea.open('GPIB::22::INSTR')
+    >>> await fea.aps.set_voltage(1000)
+    >>> await fea.aps.turn_on(False)
+    >>> await fea.wait_for_operation_complete(timeout=15000)
+    """
+
+    def __init__(self, fea: Fea = None):
+        self.fea = fea if fea is not None else Fea()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pyfea-io')
+        self._instruments = {}
+        self._opc_waiters = []
+
+    async def run(self, function, *args, timeout=None, **kwargs):
+        """Execute blocking function on the I/O worker.
+
+        Parameters
+        ----------
+        function
+            Callable to be executed.
+        timeout : int
+            Maximal time to wait for the result (in milliseconds), no limit when None.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(function, *args, **kwargs))
+        if timeout is None:
+            return await future
+        return await asyncio.wait_for(future, timeout / 1000)
+
+    async def open(self, visa_name):
+        await self.run(self.fea.open, visa_name)
+        await self.run(self.fea.add_operation_complete_listener, self._operation_complete)
+
+    async def close(self):
+        if self.fea.is_opened():
+            await self.run(self.fea.remove_operation_complete_listener, self._operation_complete)
+        await self.run(self.fea.close)
+        self._instruments = {}
+
+    def shutdown(self):
+        """Stop the I/O worker."""
+        self._executor.shutdown(wait=True)
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close()
+        self.shutdown()
+        return False
+
+    async def write(self, command, check_errors=True, timeout=None):
+        """Send command string to the FEA device (see :meth:`pyfea.Fea.write`)."""
+        await self.run(self.fea.write, command, check_errors, timeout=timeout)
+
+    async def query(self, query, check_errors=True, timeout=None) -> str:
+        """Send query string to the FEA device and retrieve a response (see :meth:`pyfea.Fea.query`).
+
+        Parameters
+        ----------
+        query : str
+            SCPI command string to be sent to the FEA
+        check_errors : bool
+            When True the STB register error flag will be tested.
+        timeout : int
+            Maximal time to wait for response (in milliseconds). It is used both as the VISA timeout of the
+            transaction and as the limit of the awaiting.
+        """
+        return await self.run(self.fea.query, query, check_errors, time_out=timeout, timeout=timeout)
+
+    async def wait_for_operation_complete(self, timeout=15000):
+        """Wait for finishing of previous (pending) operations.
+
+        The ``*OPC`` command is sent and the coroutine waits for the operation complete event signalled by
+        the service request, the interface is not occupied meanwhile.
+
+        Parameters
+        ----------
+        timeout : int
+            Maximal time to wait (in milliseconds), no limit when None.
+
+        Raises
+        ------
+        asyncio.TimeoutError
+            Operation was not completed within timeout.
+        """
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._opc_waiters.append((loop, waiter))
+        try:
+            await self.run(self.fea.write, '*OPC')
+            await asyncio.wait_for(waiter, None if timeout is None else timeout / 1000)
+        finally:
+            if (loop, waiter) in self._opc_waiters:
+                self._opc_waiters.remove((loop, waiter))
+        await self.run(self.fea.check_errors)
+
+    def _operation_complete(self):
+        """Operation complete listener called from the VISA event thread."""
+        waiters = self._opc_waiters
+        self._opc_waiters = []
+        for loop, waiter in waiters:
+            loop.call_soon_threadsafe(self._resolve_waiter, waiter)
+
+    @staticmethod
+    def _resolve_waiter(waiter):
+        if not waiter.done():
+            waiter.set_result(True)
+
+    def instrument(self, instrument) -> AsyncInstrument:
+        """Get awaitable proxy of the virtual instrument."""
+        proxy = self._instruments.get(id(instrument))
+        if proxy is None:
+            proxy = AsyncInstrument(self, instrument)
+            self._instruments[id(instrument)] = proxy
+        return proxy
+
+    @property
+    def instruments(self) -> List[AsyncInstrument]:
+        return [self.instrument(instrument) for instrument in self.fea.instruments]
+
+    @property
+    def aps(self) -> AsyncInstrument:
+        return self.instrument(self.fea.aps)
+
+    @property
+    def eps(self) -> AsyncInstrument:
+        return self.instrument(self.fea.eps)
+
+    @property
+    def sps(self) -> AsyncInstrument:
+        return self.instrument(self.fea.sps)
+
+    @property
+    def amm(self) -> AsyncInstrument:
+        return self.instrument(self.fea.amm)
+
+    def __getattr__(self, name):
+        if name == 'fea':
+            raise AttributeError(name)
+        attribute = getattr(self.fea, name)
+        if not callable(attribute):
+            return attribute
+
+        async def method(*args, timeout=None, **kwargs):
+            return await self.run(attribute, *args, timeout=timeout, **kwargs)
+
+        method.__name__ = name
+        method.__doc__ = attribute.__doc__
+        return method
@@ -0,0 +1,153 @@
+"""Batched SCPI command pipeline
+
+This file is part of PyFEA.
+
+"""
+from concurrent.futures import Future
+from typing import (Callable, List, Optional, Tuple)
+from pyfea.errors import *
+from pyfea.scpi import (join_commands, split_response, group_commands)
+
+BATCH_MAX_LENGTH = 256
+
+
+class Batch:
+    """Queue of SCPI commands sent to the FEA unit as compound program messages.
+
+    Batch is normally created by :meth:`pyfea.Fea.batch` and used as a context manager. While the batch is active,
+    all commands written by the calling thread (including the ones issued by virtual instruments' setters) are
+    queued and sent on exit joined into as few messages as possible. Error status is checked only once, at the end
+    of the batch.
+
+    Example
+    -------
+    >>> with fea.batch() as b:
+    ...     fea.aps.set_rise_rate(1000)
+    ...     fea.aps.set_voltage(5000)
+    ...     voltage = b.query('MEAS%d:VOLT?' % fea.aps.number, float)
+    >>> voltage.result()
+    """
+
+    def __init__(self, parent, max_length=BATCH_MAX_LENGTH, check_errors=True):
+        self._parent = parent
+        self.max_length = max_length
+        self.check_errors = check_errors
+        self._commands: List[Tuple[str, Optional[Future], Optional[Callable]]] = []
+        self._depth = 0
+
+    def __enter__(self):
+        if self._depth == 0:
+            self._parent._begin_batch(self)
+        self._depth += 1
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self._depth -= 1
+        if self._depth > 0:
+            return False
+
+        self._parent._end_batch(self)
+        if exc_type is not None:
+            self.discard()
+            return False
+
+        commands = self.flush()
+        if self.check_errors:
+            self._parent.check_errors(commands)
+        return False
+
+    def __len__(self):
+        return len(self._commands)
+
+    def write(self, command):
+        """Queue SCPI command.
+
+        Parameters
+        ----------
+        command : str
+            SCPI command string to be sent to the FEA
+        """
+        self._commands.append((command, None, None))
+
+    def query(self, query, convert=None) -> Future:
+        """Queue SCPI query.
+
+        Parameters
+        ----------
+        query : str
+            SCPI query string to be sent to the FEA
+        convert : callable
+            Optional function applied to the response string (e.g. ``float``).
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future resolved with the (converted) response when the batch is flushed.
+        """
+        future = Future()
+        future.set_running_or_notify_cancel()
+        self._commands.append((query, future, convert))
+        return future
+
+    def discard(self):
+        """Drop all queued commands and cancel pending query results."""
+        for _, future, _ in self._commands:
+            if future is not None:
+                future.set_exception(VISAError('Batch discarded'))
+        self._commands = []
+
+    def flush(self):
+        """Send all queued commands to the device and resolve query results.
+
+        Returns
+        -------
+        List[str]
+            Commands sent to the device.
+        """
+        commands = self._commands
+        self._commands = []
+
+        # detach the batch so that the messages are not queued again
+        active = self._parent._active_batch() is self
+        if active:
+            self._parent._end_batch(self)
+        messages = self._pack(commands)
+        try:
+            for message, futures in messages:
+                if futures:
+                    response = self._parent.query(message, check_errors=False)
+                    self._resolve(futures, split_response(response))
+                else:
+                    self._parent.write(message, check_errors=False)
+        except Exception as error:
+            # results of the failed message and of all messages not sent yet will never arrive
+            for _, futures in messages:
+                for future, _ in futures:
+                    if not future.done():
+                        future.set_exception(error)
+            raise
+        finally:
+            if active:
+                self._parent._begin_batch(self)
+
+        return [command for command, _, _ in commands]
+
+    def _pack(self, commands):
+        """Group queued commands into program messages not exceeding ``max_length``."""
+        messages = []
+        for group in group_commands([command for command, _, _ in commands], self.max_length):
+            group = commands[group.start:group.stop]
+            messages.append((join_commands([command for command, _, _ in group]),
+                             [(future, convert) for _, future, convert in group if future is not None]))
+        return messages
+
+    @staticmethod
+    def _resolve(futures, responses):
+        for index, (future, convert) in enumerate(futures):
+            if index >= len(responses):
+                future.set_exception(VISAError('Missing response in batch'))
+                continue
+            try:
+                future.set_result(convert(responses[index]) if convert else responses[index])
+            except ValueError as error:
+                future.set_exception(error)
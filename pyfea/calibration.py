@@ -0,0 +1,201 @@
+"""Host-side evaluation and fitting of calibration curves
+
+This file is part of PyFEA.
+
+"""
+import numpy as np
+from typing import (List, Tuple)
+
+
+class CalibrationCurve:
+    """Piece-wise linear conversion defined by calibration points.
+
+    The conversion follows the firmware: values between the points are interpolated linearly, values outside
+    the points are extrapolated from the first or the last segment, a table with one point converts to a
+    constant and an empty table is the identity. All methods accept scalars as well as NumPy arrays.
+
+    Example
+    -------
+    >>> curve = fea.aps.get_calibration_curve(CAL_PROGRAM)
+    >>> dac = curve(np.linspace(0, 1000, 10001))          # DAC codes of a setpoint schedule
+    >>> voltage = curve.inverse(dac)
+    """
+
+    def __init__(self, points, target=None):
+        """Object constructor
+
+        Parameters
+        ----------
+        points
+            Sequence of (input, output) pairs ordered by input value.
+        target : str
+            Calibration table the points belong to (e.g. ``CAL_PROGRAM``), informative only.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        self.x = np.ascontiguousarray(points[:, 0])
+        self.y = np.ascontiguousarray(points[:, 1])
+        self.target = target
+        if np.any(np.diff(self.x) < 0):
+            raise ValueError('Calibration points must be ordered by input value')
+
+    @property
+    def points(self) -> List[Tuple[float, float]]:
+        """Calibration points as list of pairs (suitable for ``set_*_calibration_points``)."""
+        return list(zip(self.x.tolist(), self.y.tolist()))
+
+    def __len__(self):
+        return len(self.x)
+
+    def __call__(self, values):
+        return self.forward(values)
+
+    def __repr__(self):
+        return 'CalibrationCurve(%s, %d points)' % (self.target, len(self))
+
+    @staticmethod
+    def _evaluate(xs, ys, values):
+        values = np.asarray(values, dtype=float)
+        if len(xs) == 0:
+            result = values.copy()
+        elif len(xs) == 1:
+            result = np.full_like(values, ys[0])
+        else:
+            index = np.clip(np.searchsorted(xs, values, side='right'), 1, len(xs) - 1)
+            x0, x1 = xs[index - 1], xs[index]
+            y0, y1 = ys[index - 1], ys[index]
+            dx = x1 - x0
+            with np.errstate(divide='ignore', invalid='ignore'):
+                result = np.where(dx != 0, y0 + (values - x0) * (y1 - y0) / dx, y0)
+        return result if result.ndim else float(result)
+
+    def forward(self, values):
+        """Convert input values (e.g. normalized ADC values) to output values."""
+        return self._evaluate(self.x, self.y, values)
+
+    def is_monotonic(self) -> bool:
+        """True when the output strictly increases or strictly decreases with the input."""
+        dy = np.diff(self.y)
+        return bool(np.all(dy > 0) or np.all(dy < 0))
+
+    def inverse(self, values):
+        """Convert output values back to input values (e.g. voltage to DAC value).
+
+        Raises
+        ------
+        ValueError
+            When the curve is not monotonic.
+        """
+        if len(self) < 2:
+            if len(self) == 0:
+                return self._evaluate(self.x, self.y, values)
+            raise ValueError('Curve with one point cannot be inverted')
+        if not self.is_monotonic():
+            raise ValueError('Calibration curve %s is not monotonic' % self.target)
+        if self.y[0] > self.y[-1]:
+            return self._evaluate(self.y[::-1], self.x[::-1], values)
+        return self._evaluate(self.y, self.x, values)
+
+    def residuals(self, x, y) -> np.ndarray:
+        """Differences between measured outputs and outputs converted by the curve."""
+        return np.asarray(y, dtype=float) - self.forward(x)
+
+    @classmethod
+    def fit(cls, x, y, count, tolerance=None, breakpoints=None, target=None) -> 'CalibrationCurve':
+        """Fit curve to dense measurement data.
+
+        Breakpoints are placed greedily: starting from the ends of the measured range, a breakpoint is inserted
+        at the sample deviating most from the polyline through the samples at the breakpoints, until ``count``
+        points are used or the deviation drops below ``tolerance``. Output values of the breakpoints are then
+        found by least squares, so the curve is the best continuous piece-wise linear approximation for the
+        chosen breakpoints.
+
+        Parameters
+        ----------
+        x, y
+            Measured input and output values.
+        count : int
+            Maximal number of calibration points (at least 2).
+        tolerance : float
+            Residual at which the placement of breakpoints stops, None to use all ``count`` points.
+        breakpoints
+            Fixed input values of the breakpoints, when given only the output values are fitted.
+        target : str
+            Calibration table the curve belongs to.
+        """
+        x = np.asarray(x, dtype=float).ravel()
+        y = np.asarray(y, dtype=float).ravel()
+        if len(x) != len(y):
+            raise ValueError('Input and output arrays differ in length')
+        order = np.argsort(x, kind='stable')
+        x, y = x[order], y[order]
+
+        if breakpoints is not None:
+            return cls(np.column_stack(cls._fit_values(x, y, np.unique(breakpoints))), target)
+
+        if count < 2:
+            raise ValueError('At least 2 calibration points are needed')
+        selected = [0, len(x) - 1] if x[-1] > x[0] else [0]
+        while len(selected) < count:
+            residuals = np.abs(y - cls._evaluate(x[selected], y[selected], x))
+            worst = int(np.argmax(residuals))
+            if residuals[worst] == 0 or (tolerance is not None and residuals[worst] <= tolerance):
+                break
+            selected = sorted(set(selected) | {worst})
+        return cls(np.column_stack(cls._fit_values(x, y, np.unique(x[selected]))), target)
+
+    @staticmethod
+    def _fit_values(x, y, knots) -> Tuple[np.ndarray, np.ndarray]:
+        """Least squares output values at given breakpoints."""
+        knots = np.asarray(knots, dtype=float)
+        if len(knots) == 1:
+            return knots, np.array([y.mean()])
+        index = np.clip(np.searchsorted(knots, x, side='right'), 1, len(knots) - 1)
+        t = (x - knots[index - 1]) / (knots[index] - knots[index - 1])
+        basis = np.zeros((len(x), len(knots)))
+        rows = np.arange(len(x))
+        basis[rows, index - 1] = 1 - t
+        basis[rows, index] += t
+        values = np.linalg.lstsq(basis, y, rcond=None)[0]
+        return knots, values
+
+
+class SupplyCalibration:
+    """All calibration curves of one supply channel.
+
+    Converts raw captures of the monitor ADCs (``measure_*_adc``) to output voltage and current in bulk
+    and predicts DAC values of voltage setpoints without accessing the device.
+    """
+
+    def __init__(self, program, vmonit, imonit, qcom=None):
+        """Object constructor
+
+        Parameters
+        ----------
+        program, vmonit, imonit : CalibrationCurve
+            Voltage program, voltage monitor and current monitor curves.
+        qcom : CalibrationCurve
+            Quiescent current compensation curve, None when the compensation is disabled.
+        """
+        self.program = program
+        self.vmonit = vmonit
+        self.imonit = imonit
+        self.qcom = qcom
+
+    def dac(self, voltage):
+        """Normalized DAC value of output voltage setpoints."""
+        return self.program.forward(voltage)
+
+    def voltage(self, voltage_adc):
+        """Output voltage from normalized voltage monitor ADC values."""
+        return self.vmonit.forward(voltage_adc)
+
+    def current(self, current_adc, voltage_adc=None):
+        """Output current from normalized current monitor ADC values.
+
+        Quiescent current compensation is applied when the curve is present and voltage monitor ADC values
+        measured together with the current are given.
+        """
+        current_adc = np.asarray(current_adc, dtype=float)
+        if self.qcom is not None and voltage_adc is not None:
+            current_adc = current_adc - self.qcom.forward(voltage_adc)
+        return self.imonit.forward(current_adc)
@@ -0,0 +1,351 @@
+"""Automated calibration of FEA supplies
+
+This file is part of PyFEA.
+
+"""
+import time
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Callable, Dict, List, Optional, Tuple)
+from pyfea.scpi import (join_commands, split_response)
+from pyfea.settling import StabilityDetector
+from pyfea.device import resource_manager
+
+
+class ReferenceMeter:
+    """External reference multimeter operated on its own I/O thread.
+
+    Readings are requested asynchronously, so the meter is read while the FEA is being queried.
+    """
+
+    def __init__(self, resource, scale=1.0, setup=(), query='READ?', tolerance=None):
+        """Object constructor
+
+        Parameters
+        ----------
+        resource
+            Opened pyvisa resource or VISA resource name of the meter.
+        scale : float
+            Factor applied to readings (e.g. division ratio of a high voltage probe).
+        setup
+            Commands written to the meter on its I/O thread before the first reading.
+        query : str
+            Query returning one reading.
+        tolerance : float
+            Absolute settling tolerance of scaled readings, derived from the calibrated supply when None.
+        """
+        if isinstance(resource, str):
+            resource = resource_manager().open_resource(resource)
+        self.resource = resource
+        self.scale = scale
+        self.query = query
+        self.tolerance = tolerance
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='pyfea-meter')
+        for command in setup:
+            self._executor.submit(self.resource.write, command)
+
+    def _read(self) -> float:
+        return float(self.resource.query(self.query)) * self.scale
+
+    def read(self):
+        """Request one reading.
+
+        Returns
+        -------
+        concurrent.futures.Future
+            Future of the scaled reading.
+        """
+        return self._executor.submit(self._read)
+
+    def close(self):
+        self._executor.shutdown(wait=True)
+
+
+class CalibrationResult:
+    """Readings of one supply taken at calibration levels.
+
+    Levels are normalized voltage program values, ADC readings are normalized monitor values, reference
+    readings are in volts and amps (None for quiescent current measurement).
+    """
+
+    def __init__(self, supply, levels):
+        self.supply = supply
+        self.levels = np.asarray(levels, dtype=float)
+        count = len(self.levels)
+        self.voltage_adc = np.full(count, np.nan)
+        self.current_adc = np.full(count, np.nan)
+        self.voltage_ref = None
+        self.current_ref = None
+        self.settled = np.zeros(count, dtype=bool)
+        self.duration = 0.0
+
+    @staticmethod
+    def _pairs(x, y) -> List[Tuple[float, float]]:
+        order = np.argsort(x, kind='stable')
+        return list(zip(np.asarray(x)[order].tolist(), np.asarray(y)[order].tolist()))
+
+    @property
+    def program_points(self) -> List[Tuple[float, float]]:
+        """Voltage program calibration points (output voltage, DAC value)."""
+        return self._pairs(np.abs(self.voltage_ref), self.levels)
+
+    @property
+    def vmonit_points(self) -> List[Tuple[float, float]]:
+        """Voltage monitor calibration points (ADC value, output voltage)."""
+        return self._pairs(self.voltage_adc, self.voltage_ref)
+
+    @property
+    def imonit_points(self) -> List[Tuple[float, float]]:
+        """Current monitor calibration points (ADC value, output current)."""
+        return self._pairs(self.current_adc, self.current_ref)
+
+    @property
+    def qcom_points(self) -> List[Tuple[float, float]]:
+        """Quiescent current compensation points (voltage ADC value, current ADC value)."""
+        return self._pairs(self.voltage_adc, self.current_adc)
+
+    @property
+    def has_reference(self) -> bool:
+        return self.voltage_ref is not None and self.current_ref is not None
+
+    def __repr__(self):
+        return 'CalibrationResult(%s, %d levels, %d settled, %.1f s)' % \
+               (self.supply.name, len(self.levels), int(self.settled.sum()), self.duration)
+
+
+class Calibrator:
+    """Calibration of voltage program, monitors and quiescent current compensation of FEA supplies.
+
+    Supplies are swept through calibration levels concurrently, each on its own thread. Supplies sharing a
+    reference meter are swept one after another. Instead of fixed delays, every level is measured as soon as
+    the monitor readings (and the reference readings) are settled.
+
+    Example
+    -------
+    >>> calibrator = Calibrator(fea, password='1234')
+    >>> qcom = calibrator.measure_qcom()                  # without output load
+    >>> results = calibrator.measure({fea.aps: (vmeter, imeter)})
+    >>> calibrator.apply(results, qcom)
+    >>> fea.save_calibration()
+    """
+
+    def __init__(self, fea, password, levels=5, samples=10, interval=0.2, tolerance=1e-4, window=5,
+                 settle_interval=0.1, settle_timeout=30.0, progress: Optional[Callable] = None):
+        """Object constructor
+
+        Parameters
+        ----------
+        fea : pyfea.Fea
+            Opened FEA unit.
+        password : str
+            Calibration password.
+        levels
+            Number of calibration levels evenly spread over the program range of each supply or sequence of
+            normalized program values.
+        samples : int
+            Number of averaged readings per level.
+        interval : float
+            Time between averaged readings in seconds.
+        tolerance : float
+            Settling tolerance of normalized ADC readings, reference readings use the same relative tolerance.
+        window : int
+            Number of readings which must stay within tolerance.
+        settle_interval : float
+            Time between readings during settling in seconds.
+        settle_timeout : float
+            Maximal settling time per level in seconds, the level is measured anyway after it elapses.
+        progress
+            Function called as ``progress(supply, index, result)`` after each measured level.
+        """
+        self.fea = fea
+        self.password = password
+        self.levels = levels
+        self.samples = samples
+        self.interval = interval
+        self.tolerance = tolerance
+        self.window = window
+        self.settle_interval = settle_interval
+        self.settle_timeout = settle_timeout
+        self.progress = progress
+
+    def supplies(self):
+        """Supplies of the unit."""
+        return self.fea._supplies()
+
+    def _levels(self, supply) -> np.ndarray:
+        if np.isscalar(self.levels):
+            return np.linspace(0, supply.max_norm_prog, int(self.levels))
+        return np.asarray(self.levels, dtype=float)
+
+    def measure_qcom(self, supplies=None) -> Dict[str, CalibrationResult]:
+        """Measure quiescent current of supplies without output load.
+
+        Returns
+        -------
+        dict
+            :class:`CalibrationResult` indexed by supply names.
+        """
+        supplies = self.supplies() if supplies is None else list(supplies)
+        return self._run([[(supply, None, None)] for supply in supplies], qcom=True)
+
+    def measure(self, meters: Dict[object, Tuple[ReferenceMeter, ReferenceMeter]]) -> Dict[str, CalibrationResult]:
+        """Measure voltage program and monitors of supplies against reference meters.
+
+        Parameters
+        ----------
+        meters
+            Pairs of voltage and current reference meters indexed by supplies.
+
+        Returns
+        -------
+        dict
+            :class:`CalibrationResult` indexed by supply names.
+        """
+        groups = []
+        for supply, (voltage_meter, current_meter) in meters.items():
+            for group in groups:
+                if any({voltage_meter, current_meter} & {v, c} for _, v, c in group):
+                    group.append((supply, voltage_meter, current_meter))
+                    break
+            else:
+                groups.append([(supply, voltage_meter, current_meter)])
+        return self._run(groups, qcom=False)
+
+    def _run(self, groups, qcom) -> Dict[str, CalibrationResult]:
+        if not self.fea.get_calibration_mode():
+            self.fea.set_calibration_mode(True, self.password)
+
+        def run_group(group):
+            return [self._sweep(supply, voltage_meter, current_meter, qcom)
+                    for supply, voltage_meter, current_meter in group]
+
+        with ThreadPoolExecutor(max_workers=max(len(groups), 1), thread_name_prefix='pyfea-cal') as pool:
+            futures = [pool.submit(run_group, group) for group in groups]
+            results = {}
+            errors = []
+            for future in futures:
+                try:
+                    for result in future.result():
+                        results[result.supply.name] = result
+                except Exception as error:
+                    errors.append(error)
+        if errors:
+            raise errors[0]
+        return results
+
+    def _sweep(self, supply, voltage_meter, current_meter, qcom) -> CalibrationResult:
+        """Sweep one supply through calibration levels."""
+        result = CalibrationResult(supply, self._levels(supply))
+        if voltage_meter is not None:
+            result.voltage_ref = np.full(len(result.levels), np.nan)
+        if current_meter is not None:
+            result.current_ref = np.full(len(result.levels), np.nan)
+        start = time.monotonic()
+
+        saved = {'program': supply.get_program_calibration_points(),
+                 'ovp': supply.get_ovp(),
+                 'ocp': supply.get_ocp(),
+                 'rise_rate': supply.get_rise_rate(),
+                 'fall_rate': supply.get_fall_rate()}
+        try:
+            # output directly in normalized DAC values
+            supply.set_program_calibration_points([(0, 0), (1, 1)])
+            supply.set_ovp(False)
+            supply.set_ocp(False)
+            supply.set_rise_rate(1e9)
+            supply.set_fall_rate(1e9)
+            if qcom:
+                supply.quiescent_compensation(False)
+            supply.set_voltage(0)
+            supply.turn_on(True)
+
+            for index, level in enumerate(result.levels):
+                supply.set_voltage(level)
+                result.settled[index] = self._settle(supply, voltage_meter)
+                self._sample(supply, voltage_meter, current_meter, result, index)
+                if self.progress:
+                    self.progress(supply, index, result)
+        finally:
+            supply.turn_off(True)
+            supply.set_voltage(0)
+            supply.set_program_calibration_points(saved['program'])
+            supply.set_ovp(saved['ovp'])
+            supply.set_ocp(saved['ocp'])
+            supply.set_rise_rate(saved['rise_rate'])
+            supply.set_fall_rate(saved['fall_rate'])
+            result.duration = time.monotonic() - start
+        return result
+
+    def _settle(self, supply, voltage_meter) -> bool:
+        """Wait until the voltage monitor and the reference voltage are settled."""
+        adc_detector = StabilityDetector(self.tolerance, self.window)
+        ref_detector = None
+        if voltage_meter is not None:
+            tolerance = voltage_meter.tolerance
+            if tolerance is None:
+                tolerance = self.tolerance * supply.full_scale_voltage
+            ref_detector = StabilityDetector(tolerance, self.window, relative=self.tolerance)
+
+        deadline = time.monotonic() + self.settle_timeout
+        next_time = time.monotonic()
+        while True:
+            reference = voltage_meter.read() if voltage_meter is not None else None
+            settled = adc_detector.add(supply.measure_voltage_adc())
+            if reference is not None:
+                settled = ref_detector.add(reference.result()) and settled
+            if settled:
+                return True
+            next_time += self.settle_interval
+            now = time.monotonic()
+            if now >= deadline:
+                return False
+            if next_time > now:
+                time.sleep(next_time - now)
+
+    def _sample(self, supply, voltage_meter, current_meter, result, index):
+        """Average readings of monitors and reference meters at one level."""
+        queries = supply._buffered_queries()
+        message = join_commands([queries['voltage_adc'][1], queries['current_adc'][1]])
+        adc = np.empty((self.samples, 2))
+        voltage_ref = np.empty(self.samples)
+        current_ref = np.empty(self.samples)
+        next_time = time.monotonic()
+        for sample in range(self.samples):
+            delay = next_time - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            voltage_future = voltage_meter.read() if voltage_meter is not None else None
+            current_future = current_meter.read() if current_meter is not None else None
+            adc[sample] = [float(value) for value in split_response(self.fea.query(message))]
+            if voltage_future is not None:
+                voltage_ref[sample] = voltage_future.result()
+            if current_future is not None:
+                current_ref[sample] = current_future.result()
+            next_time += self.interval
+
+        result.voltage_adc[index], result.current_adc[index] = adc.mean(axis=0)
+        if voltage_meter is not None:
+            result.voltage_ref[index] = voltage_ref.mean()
+        if current_meter is not None:
+            result.current_ref[index] = current_ref.mean()
+
+    def apply(self, results: Dict[str, CalibrationResult] = None, qcom: Dict[str, CalibrationResult] = None):
+        """Write calibration points of measured supplies to the unit in one batch.
+
+        Parameters
+        ----------
+        results
+            Results of :meth:`measure`, sets voltage program and monitor calibration points.
+        qcom
+            Results of :meth:`measure_qcom`, sets quiescent compensation points and enables the compensation.
+        """
+        with self.fea.batch():
+            for result in (qcom or {}).values():
+                result.supply.set_quiescent_compensation_points(result.qcom_points)
+                result.supply.quiescent_compensation(True)
+            for result in (results or {}).values():
+                if not result.has_reference:
+                    raise ValueError('Result of %s has no reference readings' % result.supply.name)
+                result.supply.set_program_calibration_points(result.program_points)
+                result.supply.set_vmonit_calibration_points(result.vmonit_points)
+                result.supply.set_imonit_calibration_points(result.imonit_points)
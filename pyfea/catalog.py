@@ -0,0 +1,110 @@
+"""Persistent cache of unit identity and instrument catalog
+
+This file is part of PyFEA.
+
+"""
+import json
+import os
+import threading
+from typing import (Dict, Optional)
+
+CATALOG_ENV = 'PYFEA_CATALOG'
+CATALOG_PATH = os.path.join(os.path.expanduser('~'), '.cache', 'pyfea', 'catalog.json')
+
+
+class UnitCatalog:
+    """JSON file with identity, options and instrument catalog of known units.
+
+    Entries are indexed by serial numbers, VISA resource names are mapped to the serial number of the unit
+    last seen on them. An entry is valid only for the firmware version it was read from.
+    """
+
+    def __init__(self, path=None):
+        """Object constructor
+
+        Parameters
+        ----------
+        path : str
+            Path of the cache file, ``$PYFEA_CATALOG`` or ``~/.cache/pyfea/catalog.json`` when None.
+        """
+        self.path = path or os.environ.get(CATALOG_ENV) or CATALOG_PATH
+        self._lock = threading.Lock()
+        # serializes writers of the file, so that an older content cannot replace a newer one
+        self._save_lock = threading.Lock()
+        self._units: Dict[str, dict] = {}
+        self._resources: Dict[str, str] = {}
+        self.load()
+
+    def load(self):
+        """Read the cache file, missing or corrupted file gives empty catalog."""
+        try:
+            with open(self.path) as file:
+                content = json.load(file)
+            units = dict(content.get('units', {}))
+            resources = dict(content.get('resources', {}))
+        except (OSError, ValueError, AttributeError):
+            units, resources = {}, {}
+        with self._lock:
+            self._units = units
+            self._resources = resources
+
+    def save(self):
+        """Write the cache file atomically."""
+        import tempfile
+        with self._save_lock:
+            with self._lock:
+                content = {'units': dict(self._units), 'resources': dict(self._resources)}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            handle, temporary = tempfile.mkstemp(dir=directory, prefix='.catalog-', suffix='.json')
+            try:
+                with os.fdopen(handle, 'w') as file:
+                    json.dump(content, file, indent=1, sort_keys=True)
+                os.replace(temporary, self.path)
+            except BaseException:
+                os.unlink(temporary)
+                raise
+
+    def get(self, serial) -> Optional[dict]:
+        """Entry of the unit with the serial number."""
+        with self._lock:
+            entry = self._units.get(serial)
+            return dict(entry) if entry is not None else None
+
+    def lookup(self, visa_name) -> Optional[dict]:
+        """Entry of the unit last seen on the VISA resource."""
+        with self._lock:
+            serial = self._resources.get(visa_name)
+            entry = self._units.get(serial) if serial is not None else None
+            return dict(entry) if entry is not None else None
+
+    def store(self, visa_name, entry: dict, save=True):
+        """Add or replace entry of a unit and map the VISA resource to it.
+
+        Parameters
+        ----------
+        visa_name : str
+            VISA resource name the unit was opened on.
+        entry : dict
+            Identity and catalog of the unit, must contain 'serial'.
+        save : bool
+            When True the cache file is written.
+        """
+        with self._lock:
+            self._units[entry['serial']] = dict(entry)
+            self._resources[visa_name] = entry['serial']
+        if save:
+            self.save()
+
+    def remove(self, serial, save=True):
+        """Forget the unit with the serial number."""
+        with self._lock:
+            self._units.pop(serial, None)
+            self._resources = {name: value for name, value in self._resources.items() if value != serial}
+        if save:
+            self.save()
+
+    @staticmethod
+    def matches(entry, serial, fw_version) -> bool:
+        """Check that entry describes the unit with given serial number and firmware version."""
+        return entry is not None and entry.get('serial') == serial and entry.get('fw_version') == fw_version
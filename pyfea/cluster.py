@@ -0,0 +1,198 @@
+"""Control of several FEA units
+
+This file is part of PyFEA.
+
+"""
+from concurrent.futures import ThreadPoolExecutor
+from typing import (Dict, List)
+from pyfea.errors import *
+from pyfea.constants import *
+from pyfea.device import Fea
+from pyfea.catalog import UnitCatalog
+
+
+class ClusterResult:
+    """Results and errors of an operation executed on several FEA units.
+
+    Both dictionaries are indexed by VISA resource names of the units.
+    """
+
+    def __init__(self):
+        self.results = {}
+        self.errors = {}
+
+    @property
+    def ok(self) -> bool:
+        """True when the operation succeeded on all units."""
+        return not self.errors
+
+    def raise_errors(self):
+        """Raise the first error if the operation failed on any unit."""
+        for visa_name, error in self.errors.items():
+            raise ClusterError(visa_name, error) from error
+
+    def __getitem__(self, visa_name):
+        if visa_name in self.errors:
+            raise ClusterError(visa_name, self.errors[visa_name])
+        return self.results[visa_name]
+
+    def __repr__(self):
+        return 'ClusterResult(results=%s, errors=%s)' % (self.results, self.errors)
+
+
+class FeaCluster:
+    """Group of FEA units controlled in parallel.
+
+    Each unit keeps its own VISA resource and interface lock, operations are fanned out to all units at once
+    on a thread pool so bringing up or reconfiguring the whole rack takes as long as the slowest unit.
+
+    Example
+    -------
+    >>> cluster = FeaCluster(['GPIB::22::INSTR', 'GPIB::23::INSTR'])
+    >>> cluster.set_voltage('eps', 2000)
+    >>> cluster.turn_on().raise_errors()
+    >>> snapshots = cluster.measure_all()
+    """
+
+    def __init__(self, visa_names=None, max_workers=None, catalog=None):
+        """Object constructor
+
+        Parameters
+        ----------
+        visa_names
+            VISA resource names of the units to be opened.
+        max_workers : int
+            Size of the thread pool, one worker per unit when None.
+        catalog
+            :class:`pyfea.catalog.UnitCatalog` or True for the default one, units are opened in fast mode.
+        """
+        self._max_workers = max_workers
+        self.catalog = UnitCatalog() if catalog is True else catalog
+        self._executor = None
+        self.units: Dict[str, Fea] = {}
+        self.open_errors = {}
+
+        if visa_names:
+            self.open(visa_names)
+
+    def _pool(self, size) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self._max_workers or max(size, 1),
+                                                thread_name_prefix='pyfea-cluster')
+        return self._executor
+
+    def _fan_out(self, jobs) -> ClusterResult:
+        """Execute jobs given as {visa_name: (function, args, kwargs)} in parallel."""
+        pool = self._pool(len(jobs))
+        futures = {visa_name: pool.submit(function, *args, **kwargs)
+                   for visa_name, (function, args, kwargs) in jobs.items()}
+        result = ClusterResult()
+        for visa_name, future in futures.items():
+            try:
+                result.results[visa_name] = future.result()
+            except Exception as error:
+                result.errors[visa_name] = error
+        return result
+
+    def open(self, visa_names: List[str]) -> ClusterResult:
+        """Open units in parallel.
+
+        Units which failed to open are not added to the cluster, their errors are kept in ``open_errors``.
+        """
+        jobs = {visa_name: (Fea, (visa_name, self.catalog), {})
+                for visa_name in visa_names if visa_name not in self.units}
+        result = self._fan_out(jobs)
+        self.units.update(result.results)
+        self.open_errors = dict(result.errors)
+        return result
+
+    def close(self):
+        """Close all units and stop the thread pool."""
+        self.map(Fea.close)
+        self.units = {}
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(self.units)
+
+    def __getitem__(self, visa_name) -> Fea:
+        return self.units[visa_name]
+
+    def map(self, function, *args, **kwargs) -> ClusterResult:
+        """Call ``function(fea, *args, **kwargs)`` for all units in parallel.
+
+        Returns
+        -------
+        ClusterResult
+            Return values and exceptions per unit.
+        """
+        return self._fan_out({visa_name: (function, (fea,) + args, kwargs) for visa_name, fea in self.units.items()})
+
+    def turn_on(self, wait=True) -> ClusterResult:
+        """Turn on all virtual instruments of all units."""
+        return self.map(Fea.turn_on, None, wait)
+
+    def turn_off(self, wait=True) -> ClusterResult:
+        """Turn off all virtual instruments of all units."""
+        return self.map(Fea.turn_off, None, wait)
+
+    def set_voltage(self, supply, voltage) -> ClusterResult:
+        """Set output voltage of one supply type on all units.
+
+        Parameters
+        ----------
+        supply : str
+            Supply attribute of the units: 'aps', 'eps' or 'sps'.
+        voltage
+            Output voltage in volts, either common value or dictionary indexed by VISA resource names.
+        """
+        def set_unit_voltage(fea, value):
+            getattr(fea, supply).set_voltage(value)
+
+        if isinstance(voltage, dict):
+            jobs = {visa_name: (set_unit_voltage, (self.units[visa_name], value), {})
+                    for visa_name, value in voltage.items()}
+            return self._fan_out(jobs)
+        return self.map(set_unit_voltage, voltage)
+
+    def measure_all(self) -> ClusterResult:
+        """Measure all virtual instruments of all units (see :meth:`pyfea.Fea.measure_all`).
+
+        Returns
+        -------
+        ClusterResult
+            :class:`pyfea.snapshot.Snapshot` per unit.
+        """
+        return self.map(Fea.measure_all)
+
+    def status(self) -> ClusterResult:
+        """Read status of all units.
+
+        Returns
+        -------
+        ClusterResult
+            Dictionary with serial number, firmware version, status byte and error flag per unit.
+        """
+        def unit_status(fea):
+            return {'serial': fea.serial,
+                    'fw_version': fea.fw_version,
+                    'stb': fea.get_stb(),
+                    'error': fea.error}
+
+        return self.map(unit_status)
+
+    def is_ok(self) -> bool:
+        """Check that all units were opened and none of them reports an error."""
+        if self.open_errors:
+            return False
+        status = self.status()
+        return status.ok and not any(unit['stb'] & STB_ERR for unit in status.results.values())
@@ -21,3 +21,35 @@ QUEST_VOLTAGE = 1
 QUEST_CURRENT = 2
 QUEST_INST_SUM = 8192
 
+
+ERROR_POLICY_STRICT = 'strict'          # check STB after every command
+ERROR_POLICY_DEFERRED = 'deferred'      # check STB at synchronization points only
+ERROR_POLICY_SRQ = 'srq'                # rely on service request raised by STB_ERR
+
+MAX_ERROR_QUEUE = 32
+MAX_UNCHECKED_COMMANDS = 256
+MAX_RECONNECTIONS = 100
+
+OPTION_TRACE = 'TRACE'                  # hardware timed buffered measurement
+OPTION_BINARY = 'BIN'                   # IEEE 488.2 definite length binary blocks
+OPTION_LIST = 'LIST'                    # hardware timed voltage lists
+
+BINARY_FORMATS = {'d': 'REAL,64', 'f': 'REAL,32'}
+
+PRIORITY_HIGH = 0                       # interactive setpoints and event handling
+PRIORITY_NORMAL = 1                     # ordinary queries
+PRIORITY_LOW = 2                        # background polling
+PRIORITY_NAMES = {PRIORITY_HIGH: 'high', PRIORITY_NORMAL: 'normal', PRIORITY_LOW: 'low'}
+
+COALESCE_PREFIXES = ('MEAS', 'DIAG', 'STAT:QUES')  # read-only queries merged when executed concurrently
+NEVER_COALESCE_PREFIXES = ('CAL', 'SYST:ERR', '*')  # queries with side effects, never merged
+# commands and queries which must not be repeated when the link failed during their transfer
+NON_IDEMPOTENT_PREFIXES = ('*RST', '*RCL', '*TRG', '*CLS', '*ESR', 'SYST:ERR', 'INIT', 'TRAC:DATA',
+                           'CAL:PASS', 'CAL:UPD', 'CAL:SAVE', 'CAL:LOAD')
+
+CAL_PROGRAM = 'SOUR:VOLT'               # output voltage -> normalized DAC value
+CAL_VMONIT = 'MEAS:VOLT'                # normalized voltage monitor ADC value -> output voltage
+CAL_IMONIT = 'MEAS:CURR'                # normalized current monitor ADC value -> output current
+CAL_QCOM = 'MEAS:CURR:QCOM'             # voltage monitor ADC value -> quiescent current monitor ADC value
+
+SIM_PREFIX = 'SIM::'                    # resource names of the simulated unit
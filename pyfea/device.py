@@ -4,15 +4,31 @@ This file is part of PyFEA.
 
 """
 
-import pyvisa
+import importlib
 import pyfea
 from pyfea.errors import *
 from pyfea.constants import *
-from pyvisa import constants
-import ctypes
+from pyfea.batch import (Batch, BATCH_MAX_LENGTH)
+from pyfea.scpi import (join_commands, split_commands, split_response, pack_commands, is_query)
+from pyfea.scheduler import IoScheduler
+from pyfea.snapshot import (Snapshot, SnapshotPlan)
+from pyfea.catalog import UnitCatalog
+from pyfea.recovery import (RecoveryPolicy, Reconnection, is_idempotent)
 import threading
-from typing import (Tuple, List)
+from contextlib import contextmanager
+from collections import deque
+from typing import (Tuple, List, TYPE_CHECKING)
 from datetime import datetime
+import time
+
+if TYPE_CHECKING:
+    import numpy
+    from pyfea.instrument import Instrument
+    from pyfea.status import StatusTable
+
+# pyvisa and its constants, imported by import_pyvisa() when the first unit is opened
+pyvisa = None
+constants = None
 
 def bool_to_str(bool_value):
     if bool_value:
@@ -30,8 +46,44 @@ def str_to_bool(string):
 
 
 
+_resource_manager = None
+_resource_manager_lock = threading.Lock()
+
+# prefixes of instrument names and classes of their objects
+INSTRUMENT_TYPES = (('EPS', 'Eps'), ('SPS', 'Sps'), ('APS', 'Aps'), ('AMP', 'Amm'))
+
+# time to wait for response to *OPT? (in milliseconds), firmware without options may not respond at all
+OPTIONS_TIME_OUT = 200
+
+# options of units already probed in this process, indexed by (serial, firmware version)
+_unit_options = {}
+
+
+def import_pyvisa():
+    """Import pyvisa on first use, it takes most of the import time of PyFEA."""
+    global pyvisa, constants
+    if pyvisa is None:
+        with _resource_manager_lock:
+            if pyvisa is None:
+                visa_constants = importlib.import_module('pyvisa.constants')
+                constants = visa_constants
+                pyvisa = importlib.import_module('pyvisa')
+    return pyvisa
+
+
+def resource_manager() -> 'pyvisa.ResourceManager':
+    """VISA resource manager shared by all units (created on first use)."""
+    global _resource_manager
+    import_pyvisa()
+    with _resource_manager_lock:
+        if _resource_manager is None:
+            _resource_manager = pyvisa.ResourceManager()
+        return _resource_manager
+
+
 def event_handler(resource, event, user_handle):
     """System Request callback function"""
+    import ctypes
     device = ctypes.cast(user_handle.value, ctypes.py_object).value
     # print('System request on %s' % device.visaName)
     device._event_callback()
@@ -40,10 +92,20 @@ def event_handler(resource, event, user_handle):
 class Fea:
     """Main FEA class"""
 
-    def __init__(self, visa_name=None):
-        """Object constructor"""
+    def __init__(self, visa_name=None, catalog=None):
+        """Object constructor
 
-        self._semaphore = threading.BoundedSemaphore(value=1)
+        Parameters
+        ----------
+        visa_name : str
+            VISA resource name of the unit to be opened.
+        catalog
+            :class:`pyfea.catalog.UnitCatalog` or True for the default one, enables fast open (see :meth:`open`).
+        """
+
+        self._scheduler = IoScheduler()
+        self._coalescing = {}
+        self._local = threading.local()
         self.stb = 0
         self.esr = 0
         self.error = False
@@ -53,50 +115,117 @@ class Fea:
         self.unit_name = ""
         self.serial = ""
         self.fw_version = ""
+        self.options = []
         self.instrument_nums = []
         self.instrument_names = []
-        self._instruments = []
+        self._instrument_objects = {}
         self.instrument_selected = None
         self._handler = None
         self._wrapped_handler = None
         self._opened = False
-
-        self.aps = None
-        self.esp = None
-        self.sps = None
+        self.error_policy = ERROR_POLICY_STRICT
+        self._service_request_mask = 0
+        self._unchecked_commands = deque(maxlen=MAX_UNCHECKED_COMMANDS)
+        self._pending_errors = []
+        self._pending_errors_lock = threading.Lock()
+        self._snapshot_plans = {}
+        self._status_tree = None
+        self._opc_listeners = []
+        self._ready_condition = threading.Condition()
+        self.ready_events = False
+        self._tracer = None
+        self._recovery = RecoveryPolicy()
+        self.reconnections = deque(maxlen=MAX_RECONNECTIONS)
+        self._reconnect_listeners = []
 
         if visa_name:
-            self.open(visa_name)
+            self.open(visa_name, catalog)
 
     def __delete__(self):
         self.close()
 
-    from pyfea.instrument import Instrument
+    @property
+    def instruments(self) -> List['Instrument']:
+        return [self._instrument(num) for num in self.instrument_nums or []]
+
+    @property
+    def aps(self):
+        return self._instrument_of_type('APS')
+
+    @property
+    def eps(self):
+        return self._instrument_of_type('EPS')
 
     @property
-    def instruments(self) -> List[Instrument]:
-        return self._instruments
+    def sps(self):
+        return self._instrument_of_type('SPS')
+
+    @property
+    def amm(self):
+        return self._instrument_of_type('AMP')
+
+    def _instrument(self, num) -> 'Instrument':
+        """Object of the virtual instrument, created on first use."""
+        instrument = self._instrument_objects.get(num)
+        if instrument is None:
+            name = self.instrument_names[self.instrument_nums.index(num)]
+            class_name = self._instrument_class(name)
+            instrument_class = getattr(importlib.import_module('pyfea.' + class_name), class_name)
+            instrument = instrument_class(self, num, name)
+            instrument = self._instrument_objects.setdefault(num, instrument)
+        return instrument
+
+    def _instrument_of_type(self, prefix):
+        for name, num in zip(self.instrument_names or [], self.instrument_nums or []):
+            if name.startswith(prefix):
+                return self._instrument(num)
+        return None
+
+    @staticmethod
+    def _instrument_class(name) -> str:
+        for prefix, class_name in INSTRUMENT_TYPES:
+            if name.startswith(prefix):
+                return class_name
+        return None
+
+    def open(self, visa_name, catalog=None):
+        """Open the unit.
+
+        With a catalog the unit is opened in fast mode: the event registers are configured and the identity
+        is verified by one query and when the serial number and the firmware version match the catalog entry
+        of the resource, options and instrument catalog are taken from the entry. Otherwise they are read from
+        the unit and the entry is updated.
 
-    def open(self, visa_name):
+        Parameters
+        ----------
+        visa_name : str
+            VISA resource name of the unit.
+        catalog
+            :class:`pyfea.catalog.UnitCatalog` or True for the default one, None for full open.
+        """
         if self.is_opened():
             return
 
         self.visa_name = visa_name
+        if catalog is True:
+            catalog = UnitCatalog()
 
+        import_pyvisa()
         try:
-            pm = pyvisa.ResourceManager()
-            self._visa = pm.open_resource(visa_name)
-            self._visa.read_termination = '\n'
-            self._visa.write_termination = '\n'
-            self._visa.timeout = 10000
-            self._visa.query_delay = 0.0
-            self._visa.clear()
+            self._visa = self._open_resource(visa_name)
         except pyvisa.errors.VisaIOError:
             raise pyfea.errors.VISAError
 
-        self.init()
+        entry = catalog.lookup(visa_name) if catalog is not None else None
+        if entry is not None:
+            # initialization and identity verification in one transaction
+            idn = self.query(join_commands(self._init_commands() + ['*IDN?']), check_errors=False)
+            self._reset_state()
+        else:
+            self.init()
+            idn = self.query('*IDN?')
 
-        idn = self.query('*IDN?').split(',')
+        idn = idn.split(',')
         self.vendor = idn[0]
         self.unit_name = idn[1]
         self.serial = idn[2]
@@ -105,40 +234,75 @@ class Fea:
         if self.unit_name != FEA_NAME:
             raise WrongId(self)
 
-        self.instrument_nums, self.instrument_names = self.read_instrument_list()
-        self._instruments = []
-        for name, num in zip(self.instrument_names, self.instrument_nums):
+        if UnitCatalog.matches(entry, self.serial, self.fw_version):
+            self.options = list(entry['options'])
+            self.instrument_nums = list(entry['instrument_nums'])
+            self.instrument_names = list(entry['instrument_names'])
+        else:
+            key = (self.serial, self.fw_version)
+            if key not in _unit_options:
+                _unit_options[key] = self.read_options()
+            self.options = list(_unit_options[key])
+            self.instrument_nums, self.instrument_names = self.read_instrument_list()
 
-            new_object = None
-            if name.startswith('EPS'):
-                self.eps = pyfea.Eps(self, num, name)
-                new_object = self.eps
-            elif name.startswith('SPS'):
-                self.sps = pyfea.Sps(self, num, name)
-                new_object = self.sps
-            elif name.startswith('APS'):
-                self.aps = pyfea.Aps(self, num, name)
-                new_object = self.aps
-            elif name.startswith('AMP'):
-                self.amm = pyfea.Amm(self, num, name)
-                new_object = self.amm
-            else:
+        for name, num in zip(self.instrument_names, self.instrument_nums):
+            if self._instrument_class(name) is None:
                 raise pyfea.errors.WrongInstrument( num )
 
-            if new_object:
-                self._instruments.append(new_object)
-
+        if catalog is not None and not UnitCatalog.matches(entry, self.serial, self.fw_version):
+            catalog.store(visa_name, {'vendor': self.vendor,
+                                      'unit_name': self.unit_name,
+                                      'serial': self.serial,
+                                      'fw_version': self.fw_version,
+                                      'options': self.options,
+                                      'instrument_nums': self.instrument_nums,
+                                      'instrument_names': self.instrument_names})
+
+        self._instrument_objects = {}
+        self._snapshot_plans = {}
+        self._status_tree = None
         self.instrument_selected = None
+        self._install_handler()
+        self._opened = True
+
+    @staticmethod
+    def _open_resource(visa_name):
+        """Open and clear the VISA resource (or the simulated one)."""
+        if visa_name.upper().startswith(SIM_PREFIX):
+            resource = importlib.import_module('pyfea.sim').open_resource(visa_name)
+        else:
+            resource = resource_manager().open_resource(visa_name)
+        resource.read_termination = '\n'
+        resource.write_termination = '\n'
+        resource.timeout = 10000
+        resource.query_delay = 0.0
+        resource.clear()
+        return resource
+
+    def _install_handler(self):
+        """Install the service request handler on the resource."""
         self._wrapped_handler = self._visa.wrap_handler(event_handler)
         self._handler = self._visa.install_handler(constants.EventType.service_request, self._wrapped_handler, id(self))
         self._visa.enable_event(constants.EventType.service_request, constants.EventMechanism.handler, None)
-        self._opened = True
+
+    def _release_resource(self):
+        """Uninstall the service request handler and close the resource, errors of a lost link are ignored."""
+        try:
+            if self._handler is not None:
+                self._visa.disable_event(constants.EventType.service_request, constants.EventMechanism.handler)
+                self._visa.uninstall_handler(constants.EventType.service_request, self._wrapped_handler,
+                                             self._handler)
+        except pyvisa.errors.Error:
+            pass
+        self._handler = None
+        try:
+            self._visa.close()
+        except pyvisa.errors.Error:
+            pass
 
     def close(self):
         if self.is_opened():
-            self._visa.disable_event(constants.EventType.service_request, constants.EventMechanism.handler)
-            self._visa.uninstall_handler(constants.EventType.service_request, self._wrapped_handler, self._handler)
-            self._visa.close()
+            self._release_resource()
             self.stb = 0
             self.esr = 0
             self.error = False
@@ -148,25 +312,298 @@ class Fea:
             self.unit_name = ""
             self.serial = ""
             self.fw_version = ""
+            self.options = []
             self.instrument_nums = None
             self.instrument_names = None
-            self._instruments = None
+            self._instrument_objects = {}
             self.instrument_selected = None
             self._handler = None
+            self.ready_events = False
             self._opened = False
 
     def is_opened(self):
         return self._opened
 
-    def _lock(self):
+    def _lock(self, priority=PRIORITY_NORMAL):
         """Acquire lock for the resource"""
-        self._semaphore.acquire()
-
-
+        self._local.lock_wait = self._scheduler.acquire(self._priority(priority))
 
     def _unlock(self):
         """Release lock for the resource"""
-        self._semaphore.release()
+        self._scheduler.release()
+
+    def _priority(self, default) -> int:
+        """Priority of the calling thread set by :meth:`io_priority` or the default."""
+        priority = getattr(self._local, 'priority', None)
+        return default if priority is None else priority
+
+    @contextmanager
+    def io_priority(self, priority):
+        """Set priority of interface access of the calling thread within the context.
+
+        By default setting commands are sent with ``PRIORITY_HIGH`` and queries with ``PRIORITY_NORMAL``.
+        Background threads (e.g. polling loops) should use ``PRIORITY_LOW``.
+
+        Parameters
+        ----------
+        priority : int
+            PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW.
+        """
+        previous = getattr(self._local, 'priority', None)
+        self._local.priority = priority
+        try:
+            yield
+        finally:
+            self._local.priority = previous
+
+    def lock_statistics(self, reset=False) -> dict:
+        """Interface lock wait statistics per priority level.
+
+        Parameters
+        ----------
+        reset : bool
+            When True the statistics are cleared after reading.
+
+        Returns
+        -------
+        dict
+            Number of acquisitions, number of contended ones, number of coalesced queries, mean, maximal and
+            total wait time in seconds indexed by priority name.
+        """
+        statistics = self._scheduler.statistics()
+        if reset:
+            self._scheduler.reset_statistics()
+        return statistics
+
+    def set_coalescing(self, prefixes=COALESCE_PREFIXES, freshness=0.0):
+        """Select queries answered by one transaction when requested by several threads at once.
+
+        A query is merged only when all commands of the message are queries starting with one of the prefixes.
+        Callers asking while an identical query waits for the interface or is being executed get its response,
+        within the freshness window the response of the last finished one is reused as well. Any command written
+        to the device ends the freshness of all stored responses. Setting commands and queries with side effects
+        (``NEVER_COALESCE_PREFIXES``, e.g. calibration) are never merged. Coalescing is disabled until this
+        method is called, note that merged ``STAT:QUES`` queries include event register reads which clear them.
+
+        Parameters
+        ----------
+        prefixes
+            Sequence of command header prefixes (e.g. 'MEAS', 'STAT:QUES') or dictionary of freshness windows
+            indexed by prefixes. Empty sequence disables coalescing.
+        freshness : float
+            Time in seconds for which the response is reused, used when ``prefixes`` is not a dictionary.
+        """
+        if not isinstance(prefixes, dict):
+            prefixes = {prefix: freshness for prefix in prefixes}
+        coalescing = {}
+        for prefix, window in prefixes.items():
+            prefix = prefix.lstrip(':').upper()
+            if prefix.startswith(NEVER_COALESCE_PREFIXES):
+                raise ValueError('Queries %s cannot be coalesced' % prefix)
+            if window < 0:
+                raise ValueError('Negative freshness window %g' % window)
+            coalescing[prefix] = float(window)
+        self._coalescing = coalescing
+        self._scheduler.invalidate()
+
+    def get_coalescing(self) -> dict:
+        """Freshness windows of coalesced queries indexed by command prefixes (see :meth:`set_coalescing`)."""
+        return dict(self._coalescing)
+
+    def _coalesce_key(self, query) -> Tuple[str, float]:
+        """Key and freshness window for merging of identical queries, key is None when the query must be sent."""
+        if not self._coalescing:
+            return None, 0.0
+        freshness = None
+        for command in split_commands(query):
+            if not command.endswith('?') and '? ' not in command:
+                return None, 0.0
+            header = command.upper()
+            windows = [window for prefix, window in self._coalescing.items() if header.startswith(prefix)]
+            if not windows or header.startswith(NEVER_COALESCE_PREFIXES):
+                return None, 0.0
+            window = max(windows)
+            freshness = window if freshness is None else min(freshness, window)
+        return query, freshness
+
+    def set_tracer(self, tracer=None):
+        """Attach transaction tracer or detach it when None.
+
+        Parameters
+        ----------
+        tracer : pyfea.trace.Tracer
+            Collector of transaction records.
+        """
+        self._tracer = tracer
+
+    def _trace(self, tracer, kind, command, start, locked, bytes_written, bytes_read, error):
+        """Pass record of finished transaction to the tracer."""
+        wait = getattr(self._local, 'lock_wait', 0.0) if locked else 0.0
+        self._local.lock_wait = 0.0
+        tracer.record(self, kind, command, start, wait, bytes_written, bytes_read, error)
+
+    def set_recovery(self, policy=None):
+        """Set recovery of the session after transport failures.
+
+        When a transfer fails and the unit does not answer serial poll, the resource is reopened according to
+        the policy, the identity of the unit is verified, event registers are configured and the service request
+        handler is reinstalled. If the unit was power cycled meanwhile, settings written during the session are
+        replayed. Then the failed transfer is repeated when it is idempotent (see
+        :func:`pyfea.recovery.is_idempotent`), otherwise :class:`pyfea.errors.CommandNotConfirmed` is raised.
+        Outputs are never switched on by the recovery.
+
+        Parameters
+        ----------
+        policy : pyfea.recovery.RecoveryPolicy
+            Reconnection attempts and backoff, None disables the recovery.
+        """
+        self._recovery = policy
+
+    def get_recovery(self):
+        return self._recovery
+
+    def add_reconnect_listener(self, listener):
+        """Call ``listener(reconnection)`` on a separate thread after every recovery of the session.
+
+        The listener gets :class:`pyfea.recovery.Reconnection`, e.g. to switch outputs on again after the unit
+        restarted.
+        """
+        self._reconnect_listeners.append(listener)
+
+    def remove_reconnect_listener(self, listener):
+        self._reconnect_listeners.remove(listener)
+
+    def _io(self, operation, command):
+        """Run ``operation(resource)``, the resource lock must be held by the caller.
+
+        When the link is lost, the session is recovered and an idempotent command is sent again.
+        """
+        try:
+            return operation(self._visa)
+        except pyvisa.errors.Error as visa_error:
+            if self._recovery is None or not self._opened or self._is_link_alive():
+                raise
+            reconnection = self._reconnect(visa_error, command)
+        if reconnection.unconfirmed is not None:
+            raise CommandNotConfirmed(self.visa_name, command)
+        return operation(self._visa)
+
+    def _is_link_alive(self) -> bool:
+        """Probe the link by serial poll."""
+        try:
+            self._visa.read_stb()
+            return True
+        except pyvisa.errors.Error:
+            return False
+
+    def _reconnect(self, error, command) -> Reconnection:
+        """Reopen the resource and restore the session, the resource lock must be held by the caller."""
+        reconnection = Reconnection(self.visa_name, str(error), command)
+        tracer = self._tracer
+        start = time.perf_counter()
+        self._release_resource()
+        response = None
+        for delay in self._recovery.delays():
+            time.sleep(delay)
+            reconnection.attempts += 1
+            try:
+                self._visa = self._open_resource(self.visa_name)
+                response = self._visa.query(join_commands(self._init_commands(clear=False) + ['*IDN?', '*ESR?']))
+                break
+            except pyvisa.errors.Error:
+                self._release_resource()
+        try:
+            if response is None:
+                raise VISAError('Connection to %s lost (%s), %d reconnection attempts failed' %
+                                (self.visa_name, error, reconnection.attempts))
+            idn, esr = split_response(response)
+            serial = idn.split(',')[2]
+            if serial != self.serial:
+                self._release_resource()
+                raise VISAError('Unit %s found on %s instead of %s' % (serial, self.visa_name, self.serial))
+            self.esr = int(esr)
+            self.instrument_selected = None
+            self._scheduler.invalidate()
+            self._install_handler()
+
+            if self.esr & ESR_PON:
+                # settings were lost, the unit starts with outputs off
+                reconnection.restarted = True
+                self.invalidate_cache()
+                commands = []
+                for instrument in list(self._instrument_objects.values()):
+                    commands.extend(instrument._setting_commands())
+                if self.ready_events:
+                    commands.extend(self._ready_event_commands(True))
+                for message in pack_commands(commands, BATCH_MAX_LENGTH):
+                    self._visa.write(message)
+                self._unchecked_commands.extend(commands)
+                reconnection.replayed = commands
+            reconnection.succeeded = True
+        except pyvisa.errors.Error as replay_error:
+            raise VISAError('Session on %s not restored: %s' % (self.visa_name, replay_error))
+        finally:
+            reconnection.duration = time.perf_counter() - start
+            self.reconnections.append(reconnection)
+            if tracer is not None:
+                self._trace(tracer, 'reconnect', self.visa_name, start, True, 0, 0,
+                            None if reconnection.succeeded else str(error))
+
+        if not is_idempotent(command):
+            reconnection.unconfirmed = command
+        else:
+            reconnection.retried = True
+        if self._reconnect_listeners or self.esr & ESR_OPC:
+            # listeners may access the unit, so they must not run while the resource lock is held
+            threading.Thread(target=self._notify_reconnect, args=(reconnection, self.esr & ESR_OPC != 0),
+                             name='pyfea-reconnect', daemon=True).start()
+        return reconnection
+
+    def _notify_reconnect(self, reconnection, operation_complete):
+        for listener in list(self._reconnect_listeners):
+            listener(reconnection)
+        if operation_complete:
+            for listener in list(self._opc_listeners):
+                listener()
+
+    def batch(self, max_length=BATCH_MAX_LENGTH, check_errors=True) -> Batch:
+        """Start batch of commands joined into compound SCPI messages.
+
+        Commands written by the calling thread while the batch is active are queued and sent when the batch
+        context is left. Nested calls return the already active batch.
+
+        Parameters
+        ----------
+        max_length : int
+            Maximal length of one program message in characters.
+        check_errors : bool
+            When True the STB register error flag is tested once at the end of the batch.
+
+        Returns
+        -------
+        pyfea.batch.Batch
+            Batch object to be used as a context manager.
+        """
+        batch = self._active_batch()
+        if batch is not None:
+            return batch
+        return Batch(self, max_length, check_errors)
+
+    def _active_batch(self):
+        return getattr(self._local, 'batch', None)
+
+    def _begin_batch(self, batch):
+        self._local.batch = batch
+
+    def _end_batch(self, batch):
+        if self._active_batch() is batch:
+            self._local.batch = None
+
+    def _flush_batch(self):
+        """Send commands queued by the active batch of the calling thread."""
+        batch = self._active_batch()
+        if batch is not None:
+            self._unchecked_commands.extend(batch.flush())
 
     def write(self, command, check_errors=True, lock=True):
         """Send command string to the ELO device.
@@ -181,18 +618,39 @@ class Fea:
         lock : bool
             When True the resource lock is acquired before accessing the interface.
         """
+        if command.startswith(('*RST', '*RCL')):
+            self.invalidate_cache()
+            for instrument in list(self._instrument_objects.values()):
+                instrument._forget_settings()
+
+        batch = self._active_batch()
+        if batch is not None and lock:
+            batch.write(command)
+            return
+
+        tracer = self._tracer
+        if tracer is not None:
+            error = None
+        self._scheduler.invalidate()
         if lock:
-            self._lock()
+            self._lock(PRIORITY_HIGH)
+        if tracer is not None:
+            # the lock wait is not included, it is reported by the scheduler statistics
+            start = time.perf_counter()
         try:
-            self._visa.write(command)
-        except pyvisa.errors.VisaIOError:
+            self._io(lambda visa: visa.write(command), command)
+        except pyvisa.errors.VisaIOError as visa_error:
+            if tracer is not None:
+                error = str(visa_error)
             raise VISAError
         finally:
             if lock:
                 self._unlock()
+            if tracer is not None:
+                self._trace(tracer, 'write', command, start, lock, len(command) + 1, 0, error)
 
         if check_errors:
-            self._check_for_error()
+            self._after_command(command)
 
     def query(self, query, check_errors=True, lock=True, time_out=None) -> str:
         """Send query string to the ELO device and retrieve a response.
@@ -207,50 +665,312 @@ class Fea:
         lock : bool
             When True the resource lock is acquired before accessing the interface.
         time_out : int
-            Maximal time to wait for response (in milliseconds). (not implemented yet)
+            Maximal time to wait for response (in milliseconds), default VISA timeout is used when None.
 
         Returns
         -------
         str
             Response string received from the remote device.
         """
+        if not all(is_query(command) for command in split_commands(query)):
+            # setting commands sent with the query end the freshness of stored responses
+            self._scheduler.invalidate()
+
         if lock:
-            self._lock()
+            # queued commands must reach the device before the query
+            self._flush_batch()
+
+            def transfer(wait):
+                self._local.lock_wait = wait
+                return self._transfer_query(query, time_out, True)
+
+            # identical queries of other threads are answered by one transaction
+            key, freshness = self._coalesce_key(query) if time_out is None else (None, 0.0)
+            response = self._scheduler.run(transfer, key, self._priority(PRIORITY_NORMAL), freshness)
+        else:
+            response = self._transfer_query(query, time_out, False)
+
+        if check_errors:
+            self._after_command(query)
+
+        return response
+
+    def _transfer_query(self, query, time_out, locked) -> str:
+        """Send query and read response, the resource lock must be handled by the caller."""
+        tracer = self._tracer
+        if tracer is not None:
+            start = time.perf_counter()
+            response = ''
+            error = None
+
+        def transfer(visa):
+            if time_out is None:
+                return visa.query(query)
+            default_time_out = visa.timeout
+            visa.timeout = time_out
+            try:
+                return visa.query(query)
+            finally:
+                visa.timeout = default_time_out
+
         try:
-            response = self._visa.query(query)
-        except pyvisa.errors.VisaIOError:
+            response = self._io(transfer, query)
+        except pyvisa.errors.VisaIOError as visa_error:
+            if tracer is not None:
+                error = str(visa_error)
             raise VISAError
         finally:
-            if lock:
-                self._unlock()
+            if tracer is not None:
+                self._trace(tracer, 'query', query, start, locked, len(query) + 1, len(response) + 1, error)
+        return response
+
+    def query_values(self, query, check_errors=True, datatype='d') -> 'numpy.ndarray':
+        """Send query string and retrieve array of numbers.
+
+        When the firmware provides ``OPTION_BINARY``, the response is transferred as IEEE 488.2 definite length
+        binary block and decoded without copying, otherwise the comma separated ASCII response is parsed.
+
+        Parameters
+        ----------
+        query : str
+            SCPI command string to be sent to the FEA
+        check_errors : bool
+            When True the STB register error flag will be tested.
+        datatype : str
+            Binary data type, 'd' for 64 bit or 'f' for 32 bit floats.
+
+        Returns
+        -------
+        numpy.ndarray
+            Values received from the remote device, empty array for blank response.
+        """
+        import numpy
+        if not self.has_option(OPTION_BINARY):
+            response = self.query(query, check_errors).strip()
+            if not response:
+                return numpy.empty(0)
+            return numpy.array(response.split(','), dtype=float)
+
+        self._flush_batch()
+        message = join_commands(['FORM:DATA %s' % BINARY_FORMATS[datatype], query, 'FORM:DATA ASC'])
+        tracer = self._tracer
+        if tracer is not None:
+            values = numpy.empty(0)
+            error = None
+        self._lock()
+        if tracer is not None:
+            start = time.perf_counter()
+        try:
+            values = self._io(lambda visa: visa.query_binary_values(message, datatype=datatype, is_big_endian=True,
+                                                                    container=numpy.ndarray), message)
+        except pyvisa.errors.VisaIOError as visa_error:
+            if tracer is not None:
+                error = str(visa_error)
+            raise VISAError
+        finally:
+            self._unlock()
+            if tracer is not None:
+                self._trace(tracer, 'query', message, start, True, len(message) + 1, values.nbytes, error)
 
         if check_errors:
-            self._check_for_error()
+            self._after_command(query)
 
-        return response
+        return values
+
+    def write_values(self, command, values, check_errors=True, datatype='d'):
+        """Send command string followed by array of numbers.
+
+        When the firmware provides ``OPTION_BINARY``, the values are transferred as IEEE 488.2 definite length
+        binary block, otherwise as comma separated ASCII list.
+
+        Parameters
+        ----------
+        command : str
+            SCPI command string (including separator of the values if needed)
+        values
+            Sequence of numbers.
+        check_errors : bool
+            When True the STB register error flag will be tested.
+        datatype : str
+            Binary data type, 'd' for 64 bit or 'f' for 32 bit floats.
+        """
+        if not self.has_option(OPTION_BINARY):
+            self.write(command + ','.join(['%.6g' % value for value in values]), check_errors)
+            return
+
+        import numpy
+        self._flush_batch()
+        values = numpy.asarray(values, dtype=datatype)
+        tracer = self._tracer
+        if tracer is not None:
+            error = None
+        self._scheduler.invalidate()
+        self._lock(PRIORITY_HIGH)
+        if tracer is not None:
+            start = time.perf_counter()
+        try:
+            self._io(lambda visa: visa.write_binary_values(command, values, datatype=datatype, is_big_endian=True),
+                     command)
+        except pyvisa.errors.VisaIOError as visa_error:
+            if tracer is not None:
+                error = str(visa_error)
+            raise VISAError
+        finally:
+            self._unlock()
+            if tracer is not None:
+                self._trace(tracer, 'write', command, start, True, len(command) + values.nbytes + 1, 0, error)
 
-    def get_stb(self) -> int:
+        if check_errors:
+            self._after_command(command)
+
+    def get_stb(self, lock=True) -> int:
         """Read device's Status Byte register.
 
+        Parameters
+        ----------
+        lock : bool
+            When True the resource lock is acquired before accessing the interface.
+
         Returns
         -------
         int
             Status Byte.
         """
-        self.stb = self._visa.read_stb()
+        tracer = self._tracer
+        if tracer is not None:
+            error = None
+        if lock:
+            self._lock(PRIORITY_HIGH)
+        if tracer is not None:
+            start = time.perf_counter()
+        try:
+            self.stb = self._io(lambda visa: visa.read_stb(), '*STB?')
+        except pyvisa.errors.VisaIOError as visa_error:
+            if tracer is not None:
+                error = str(visa_error)
+            raise
+        finally:
+            if lock:
+                self._unlock()
+            if tracer is not None:
+                self._trace(tracer, 'stb', '*STB', start, lock, 0, 1, error)
         return self.stb
 
     def init(self):
         """Restart ELO and configure event registers."""
         self._visa.clear()
-        self._visa.write('*CLS;')
+        self._visa.write(join_commands(self._init_commands()))
+        self._reset_state()
+
+    def _init_commands(self, clear=True) -> List[str]:
+        """Commands clearing status (when clear is True) and configuring event registers."""
         #self._visa.write('*SRE %d' % (pyelo.constants.STB_ERR + pyelo.constants.STB_QES))  # enable ERR and QES
-        self._visa.write('*ESE %d' % ESR_OPC)  # enable OPC
+        commands = ['*CLS'] if clear else []
+        commands.append('*ESE %d' % (ESR_OPC | ESR_URQ | ESR_PON))  # enable OPC, user request and power on
+        if self._service_request_mask:
+            commands.append('*SRE %d' % self._service_request_mask)
+        return commands
+
+    def _reset_state(self):
+        """Forget client-side state after the device status was cleared."""
+        self._unchecked_commands.clear()
+        with self._pending_errors_lock:
+            self._pending_errors = []
+        self.invalidate_cache()
+
+    def enable_cache(self, enable=True, instruments=None):
+        """Enable or disable client-side cache of settings of virtual instruments.
+
+        Service request from the ESR summary bit is enabled together with the cache, so that the cache can be
+        invalidated on device-side events (power on, user request).
+
+        Parameters
+        ----------
+        enable : bool
+            When True the cache is enabled.
+        instruments
+            List of virtual instruments, all instruments when None.
+        """
+        if instruments is None:
+            instruments = self.instruments
+        for instrument in instruments:
+            instrument.enable_cache(enable)
+        self._set_service_request_enable(STB_ESR, self._is_cache_enabled() or bool(self._opc_listeners))
+
+    def _is_cache_enabled(self) -> bool:
+        return any(instrument.cache_enabled for instrument in list(self._instrument_objects.values()))
+
+    def invalidate_cache(self):
+        """Forget cached settings of all virtual instruments."""
+        # instruments not created yet have nothing cached
+        for instrument in list(self._instrument_objects.values()):
+            instrument.invalidate_cache()
+
+    def set_error_policy(self, policy):
+        """Select when the device's error queue is checked.
+
+        Parameters
+        ----------
+        policy : str
+            ``ERROR_POLICY_STRICT`` checks the STB register after every command (default),
+            ``ERROR_POLICY_DEFERRED`` checks it only at synchronization points (:meth:`check_errors`,
+            :meth:`wait_for_operation_complete`, end of a batch) and
+            ``ERROR_POLICY_SRQ`` relies on service request raised by the STB error flag.
+        """
+        if policy not in (ERROR_POLICY_STRICT, ERROR_POLICY_DEFERRED, ERROR_POLICY_SRQ):
+            raise ValueError('Unknown error policy %s' % policy)
+
+        if self.is_opened():
+            self.check_errors()
+        self.error_policy = policy
+        self._set_service_request_enable(STB_ERR, policy == ERROR_POLICY_SRQ)
+
+    def get_error_policy(self) -> str:
+        return self.error_policy
+
+    def _set_service_request_enable(self, bits, enable):
+        """Set or clear bits in the service request enable register."""
+        if enable:
+            mask = self._service_request_mask | bits
+        else:
+            mask = self._service_request_mask & ~bits
+        if mask != self._service_request_mask:
+            self._service_request_mask = mask
+            if self.is_opened():
+                self.write('*SRE %d' % mask, check_errors=False)
 
     def get_esr(self):
         self.esr = int(self.query('*ESR?'))
         return self.esr
 
+    def read_options(self) -> List[str]:
+        """Read list of firmware options (e.g. ``OPTION_TRACE``).
+
+        Returns
+        -------
+        List[str]
+            Options reported by ``*OPT?``, empty list when the query is not supported.
+
+        Notes
+        -----
+        :meth:`open` reads the options of each unit (serial number and firmware version) only once per process.
+        """
+        try:
+            # firmware without options may not respond at all
+            response = self.query('*OPT?', check_errors=False, time_out=OPTIONS_TIME_OUT)
+        except VISAError:
+            # a late response must not be read as the response to the next query
+            self._visa.clear()
+            response = ''
+        if self.get_stb() & STB_ERR:
+            self._drain_errors()
+            return []
+        return [option.strip().strip('"').upper() for option in response.split(',')
+                if option.strip().strip('"') not in ('', '0')]
+
+    def has_option(self, option) -> bool:
+        return option in self.options
+
     def read_instrument_list(self) -> Tuple[List[int], List[str]]:
         """Read list of installed ELO's instruments (modules).
 
@@ -273,6 +993,27 @@ class Fea:
     def wait_for_operation_complete(self, timeout=15000):
         """Wait for finishing of previous (pending) operations ."""
         self.query('*OPC?', time_out=timeout)
+        self.check_errors()
+
+    def add_operation_complete_listener(self, listener):
+        """Register function called from the service request handler when operation complete event occurs.
+
+        Service request from the ESR summary bit is enabled while any listener is registered. Operation complete
+        event is generated by the device after ``*OPC`` command when all pending operations are finished.
+
+        Parameters
+        ----------
+        listener
+            Function without parameters. It is called from the VISA event thread.
+        """
+        self._opc_listeners.append(listener)
+        self._set_service_request_enable(STB_ESR, True)
+
+    def remove_operation_complete_listener(self, listener):
+        """Unregister operation complete listener."""
+        self._opc_listeners.remove(listener)
+        if not self._opc_listeners and not self._is_cache_enabled():
+            self._set_service_request_enable(STB_ESR, False)
 
     def select_instrument(self, inst_num: int):
         """Select one of virtual instruments.
@@ -299,25 +1040,108 @@ class Fea:
             Error description
         """
         try:
-            error = self._visa.query('SYST:ERROR?').split(',')
+            error_code, error_text = self._parse_error(self._read_error_queue(lock=True))
         except pyvisa.errors.VisaIOError:
             return None
 
-        error_code = int(error[0])
-        error_text = error[1][1:-1]
-
         self._event_callback()
 
         return error_code, error_text
 
-    def _check_for_error(self):
+    def _read_error_queue(self, lock=False) -> str:
+        """Send error queue query without error checking."""
+        tracer = self._tracer
+        if tracer is not None:
+            response = ''
+            error = None
+        if lock:
+            self._lock(PRIORITY_HIGH)
+        if tracer is not None:
+            start = time.perf_counter()
+        try:
+            response = self._io(lambda visa: visa.query('SYST:ERROR?'), 'SYST:ERROR?')
+        except pyvisa.errors.VisaIOError as visa_error:
+            if tracer is not None:
+                error = str(visa_error)
+            raise
+        finally:
+            if lock:
+                self._unlock()
+            if tracer is not None:
+                self._trace(tracer, 'error', 'SYST:ERROR?', start, lock, 12, len(response) + 1, error)
+        return response
+
+    @staticmethod
+    def _parse_error(response) -> Tuple[int, str]:
+        error = response.split(',', 1)
+        return int(error[0]), error[1][1:-1]
+
+    def _drain_errors(self) -> List[Tuple[int, str]]:
+        """Read all errors from the error queue."""
+        errors = []
+        self._lock(PRIORITY_HIGH)
+        try:
+            for _ in range(MAX_ERROR_QUEUE):
+                error_code, error_text = self._parse_error(self._read_error_queue())
+                if error_code == 0:
+                    break
+                errors.append((error_code, error_text))
+        except pyvisa.errors.VisaIOError:
+            raise VISAError
+        finally:
+            self._unlock()
+        self.error = False
+        return errors
+
+    def _after_command(self, command):
+        """Check or postpone error check of just sent command according to the error policy."""
+        if self.error_policy == ERROR_POLICY_STRICT:
+            self._check_for_error(command)
+        else:
+            self._unchecked_commands.append(command)
+
+    def _check_for_error(self, command=None):
         """Read STB register and if any error in the queue read it and raise exception."""
-        if self.get_stb() & 4:
+        if self.get_stb() & STB_ERR:
             error_code, error_text = self.read_error()
-            raise FeaError(error_code, error_text)
+            self.invalidate_cache()
+            raise FeaError(error_code, error_text, [command] if command else None)
+
+    def check_errors(self, commands=None):
+        """Synchronization point of the error checking.
+
+        Raise exception for any error reported by the device since the last check. With the strict error policy
+        only the STB register is tested, with the deferred policy the whole error queue is drained and with the
+        SRQ policy errors collected by the service request handler are reported.
+
+        Parameters
+        ----------
+        commands : List[str]
+            Commands sent without error check (e.g. by a batch) which may have caused the error.
+
+        Raises
+        ------
+        FeaError
+            First error found, list of all errors and commands sent since the last check are attached.
+        """
+        candidates = list(self._unchecked_commands) + list(commands or [])
+        self._unchecked_commands.clear()
+
+        if self.error_policy == ERROR_POLICY_SRQ:
+            with self._pending_errors_lock:
+                errors = self._pending_errors
+                self._pending_errors = []
+        elif self.get_stb() & STB_ERR:
+            errors = self._drain_errors()
+        else:
+            errors = []
+
+        if errors:
+            self.invalidate_cache()
+            raise FeaError(errors[0][0], errors[0][1], candidates, errors)
 
 
-    def get_instrument_by_number(self, number: int) -> Instrument:
+    def get_instrument_by_number(self, number: int) -> 'Instrument':
         """Get virtual instrument object according to SCPI logical number.
 
         Parameters
@@ -330,66 +1154,236 @@ class Fea:
         pyelo.Instrument
             Instrument object or None if instrument not found
         """
-        for inst in self._instruments:
-            if inst.number == number:
-                return inst
+        if number in (self.instrument_nums or []):
+            return self._instrument(number)
 
         return None
 
-    def read_questionable_regs(self):
-        """Read questionable register tree and set appropriate flags in instruments' objects."""
-        self._lock()
-        try:
-            event = int(self.query('STAT:QUES?', False, lock=False))
-            if event & pyfea.constants.QUEST_INST_SUM:
-                inst_event = int(self.query('STAT:QUES:INST?', False, lock=False))
-                for inst in self._instruments:
-                    if inst_event & (1 << inst.number):
-                        isum_event = int(self.query('STAT:QUES:INST%d:ISUM?' % inst.number, False, lock=False))
-                        for channel in inst.channels:
-                            if isum_event & (1 << channel):
-                                channel_event = int(self.query('STAT:QUES:INST%d:ISUM? (@%d)' %
-                                                               (inst.number, channel), False, lock=False))
-                                channel_cond = int(self.query('STAT:QUES:INST%d:ISUM:COND? (@%d)' %
-                                                              (inst.number, channel), False, lock=False))
-
-                                if channel_event & pyfea.constants.QUEST_VOLTAGE:
-                                    inst._set_ready(channel, not channel_cond & pyfea.constants.QUEST_VOLTAGE)
-                                    # print('Inst. %s/channel %d is %sready' %
-                                    #      (inst.name, channel, 'NOT ' if not inst.is_ready(channel) else ''))
-        finally:
-            self._unlock()
+    def read_questionable_regs(self) -> 'StatusTable':
+        """Read questionable register tree and set appropriate flags in instruments' objects.
+
+        The whole tree (summary, instrument summary and event and condition registers of every channel) is read
+        by one compound query.
+
+        Returns
+        -------
+        pyfea.status.StatusTable
+            Decoded registers including the bits changed since the previous read.
+        """
+        if self._status_tree is None:
+            from pyfea.status import StatusTree
+            self._status_tree = StatusTree(self, self.instruments)
+        table = self._status_tree.read()
+
+        not_ready = table.flag(QUEST_VOLTAGE)
+        for (inst, channel), voltage_not_ready in zip(table.rows, not_ready):
+            inst._set_ready(channel, not voltage_not_ready)
+
+        with self._ready_condition:
+            self._ready_condition.notify_all()
+
+        return table
+
+    def enable_ready_events(self, enable=True):
+        """Enable or disable event-driven tracking of voltage ready flags.
+
+        When enabled, questionable status registers are configured to raise service request on both edges of the
+        voltage ready condition of every channel. The ready flags of instruments are then updated by the service
+        request handler and :meth:`pyfea.Supply.is_ready` does not poll the device anymore.
+
+        Parameters
+        ----------
+        enable : bool
+            When True the ready events are enabled.
+        """
+        with self.batch() as batch:
+            for command in self._ready_event_commands(enable):
+                batch.write(command)
+            conditions = [(inst, channel, batch.query('STAT:QUES:INST%d:ISUM:COND? (@%d)' % (inst.number, channel),
+                                                      int))
+                          for inst in self.instruments for channel in inst.channels]
+
+        for inst, channel, condition in conditions:
+            inst._set_ready(channel, not condition.result() & QUEST_VOLTAGE)
+
+        self._set_service_request_enable(STB_QES, enable)
+        self.ready_events = enable
+
+        with self._ready_condition:
+            self._ready_condition.notify_all()
+
+    def _ready_event_commands(self, enable) -> List[str]:
+        """Commands configuring questionable status registers for ready events."""
+        mask = QUEST_VOLTAGE if enable else 0
+        commands = []
+        for inst in self.instruments:
+            for channel in inst.channels:
+                for register in ('ENAB', 'PTR', 'NTR'):
+                    commands.append('STAT:QUES:INST%d:ISUM:%s %d,(@%d)' % (inst.number, register, mask, channel))
+            commands.append('STAT:QUES:INST%d:ISUM:ENAB %d' %
+                            (inst.number, sum(1 << channel for channel in inst.channels) if enable else 0))
+        commands.append('STAT:QUES:INST:ENAB %d' %
+                        (sum(1 << inst.number for inst in self.instruments) if enable else 0))
+        commands.append('STAT:QUES:ENAB %d' % (QUEST_INST_SUM if enable else 0))
+        return commands
+
+    def wait_until_ready(self, instruments=None, timeout=None, poll_interval=0.1) -> bool:
+        """Wait until output voltage of virtual instruments is ready (settled).
+
+        With ready events enabled (see :meth:`enable_ready_events`) the calling thread sleeps until the service
+        request handler reports the change, otherwise the questionable registers are polled.
+
+        Parameters
+        ----------
+        instruments
+            List of virtual instruments, all supplies when None.
+        timeout : float
+            Maximal time to wait (in seconds), no limit when None.
+        poll_interval : float
+            Polling period (in seconds) used when ready events are not enabled.
+
+        Returns
+        -------
+        bool
+            True when all instruments are ready, False on timeout.
+        """
+        if instruments is None:
+            instruments = self._supplies()
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        with self._ready_condition:
+            while True:
+                if not self.ready_events:
+                    self._ready_condition.release()
+                    try:
+                        self.read_questionable_regs()
+                    finally:
+                        self._ready_condition.acquire()
+
+                if all(inst._is_ready_flag() for inst in instruments):
+                    return True
+
+                wait = None if self.ready_events else poll_interval
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        return False
+                    wait = remaining if wait is None else min(wait, remaining)
+                self._ready_condition.wait(wait)
+
+    def settle(self, voltages=None, tolerance=None, timeout=None) -> bool:
+        """Set output voltages and wait until all of them are settled.
+
+        Parameters
+        ----------
+        voltages
+            Dictionary of new output voltages in volts indexed by supplies or list of supplies whose programmed
+            voltages are awaited, all supplies with output turned on when None.
+        tolerance : float
+            Stability tolerance in volts, 1e-4 of the full scale voltage of each supply when None.
+        timeout : float
+            Maximal waiting time in seconds, no limit when None.
+
+        Returns
+        -------
+        bool
+            True when all outputs are settled, False on timeout or when an awaited output is turned off.
+        """
+        ignore_off = voltages is None
+        if voltages is None:
+            voltages = self._supplies()
+        if not isinstance(voltages, dict):
+            voltages = {supply: None for supply in voltages}
+        with self.batch():
+            for supply, voltage in voltages.items():
+                if voltage is not None:
+                    supply.set_voltage(voltage)
+        from pyfea.settling import settle_supplies
+        return settle_supplies(self, voltages, tolerance, timeout, ignore_off=ignore_off)
 
     def _event_callback(self):
+        with self.io_priority(PRIORITY_HIGH):
+            self._handle_event()
+
+    def _handle_event(self):
         stb = self.get_stb()
         # print('STB: %02x' % stb)
 
         if stb & pyfea.constants.STB_QES:
             self.read_questionable_regs()
 
+        if stb & pyfea.constants.STB_ESR and (self._opc_listeners or self._is_cache_enabled()):
+            self.esr = int(self.query('*ESR?', check_errors=False))
+            if self.esr & (pyfea.constants.ESR_URQ | pyfea.constants.ESR_PON):
+                self.invalidate_cache()
+            if self.esr & pyfea.constants.ESR_OPC:
+                for listener in list(self._opc_listeners):
+                    listener()
+
         if stb & pyfea.constants.STB_ERR:
             self.error = True
+            self.invalidate_cache()
+            if self.error_policy == ERROR_POLICY_SRQ:
+                # drain outside the lock, the list may be taken by check_errors() meanwhile
+                errors = self._drain_errors()
+                with self._pending_errors_lock:
+                    self._pending_errors.extend(errors)
         else:
             self.error = False
 
+    def measure_all(self, instruments=None) -> Snapshot:
+        """Measure voltage, current, temperature and output state of virtual instruments by one compound query.
+
+        Parameters
+        ----------
+        instruments
+            List of virtual instruments to be measured, all instruments when None.
+
+        Returns
+        -------
+        pyfea.snapshot.Snapshot
+            Readings of all requested instruments with common timestamp.
+        """
+        if instruments is None:
+            instruments = self.instruments
+
+        key = tuple(id(instrument) for instrument in instruments)
+        plan = self._snapshot_plans.get(key)
+        if plan is None:
+            plan = SnapshotPlan(instruments)
+            self._snapshot_plans[key] = plan
+
+        start = time.time()
+        response = self.query(plan.message)
+        timestamp = (start + time.time()) / 2
+
+        return plan.parse(timestamp, split_response(response))
+
+    def snapshot(self) -> Snapshot:
+        """Measure all virtual instruments by one compound query (see :meth:`measure_all`)."""
+        return self.measure_all()
+
     def is_operation_completed(self) -> bool:
-        fea.write('*OPC')
+        self.write('*OPC')
         if self.get_stb() & pyfea.constants.STB_ESR:
             return self.get_esr() & pyfea.constants.ESR_OPC != 0
         else:
             return False
 
+    def _supplies(self):
+        return [instrument for instrument in self.instruments if isinstance(instrument, pyfea.Supply)]
+
     def turn_on(self, instruments=None, wait=True, delay=0):
         if not instruments:
-            instruments = self._instruments
+            instruments = self._supplies()
         for instrument in instruments:
             instrument.turn_on(wait)
             if not wait:
-                sleep(delay)
+                time.sleep(delay)
 
     def turn_off(self, instruments=None, wait=True):
         if not instruments:
-            instruments = self._instruments
+            instruments = self._supplies()
         for instrument in instruments:
             instrument.turn_off(wait)
 
@@ -398,6 +1392,7 @@ class Fea:
             self.write('CAL:MODE ON,"%s"' % password)
         else:
             self.write('CAL:MODE OFF')
+        self.invalidate_cache()
 
     def get_calibration_mode(self):
         return int(self.query('CAL:MODE?')) != 0
@@ -446,6 +1441,7 @@ class Fea:
 
     def load_calibration(self):
         self.write('CAL:LOAD')
+        self.invalidate_cache()
 
 
 if __name__ == '__main__':
@@ -458,7 +1454,7 @@ if __name__ == '__main__':
     print('Fw version: %s' % fea.fw_version)
     print('Instruments: %s' % ', '.join(fea.instrument_names))
 
-    instruments = fea._instruments
+    instruments = fea.instruments
 
     from time import sleep
 
@@ -473,9 +1469,9 @@ if __name__ == '__main__':
     done = False
     timer = 10
     while not done:
-        for instrument in instruments:
-            voltage = instrument.measure_voltage()
-            print('%s voltage: %.2f V' % (instrument.name, voltage))
+        for reading in fea.measure_all():
+            if reading.voltage is not None:
+                print('%s voltage: %.2f V' % (reading.name, reading.voltage))
             # currents = instrument.measure_current(instrument.channels)
             # print('%s currents: %s' % (instrument.name, ', '.join(['%.2f uA' % (val * 1e6) for val in currents])))
         sleep(0.5)
@@ -24,12 +24,33 @@ class ExpectedBooleanValue(Error):
 
 
 class FeaError(Error):
-    def __init__(self, error_code, error_text):
-        super( FeaError, self).__init__(
-            "FEA error: %d, '%s'" % (error_code, error_text)
-        )
+    def __init__(self, error_code, error_text, commands=None, errors=None):
+        message = "FEA error: %d, '%s'" % (error_code, error_text)
+        if commands:
+            message += " caused by: %s" % '; '.join(commands)
+        super( FeaError, self).__init__(message)
         self.error_code = error_code
         self.error_text = error_text
+        self.commands = list(commands) if commands else []
+        self.errors = list(errors) if errors else [(error_code, error_text)]
 
 class VISAError(Error):
     pass
+
+
+class CommandNotConfirmed(VISAError):
+    def __init__(self, visa_name, command):
+        super(CommandNotConfirmed, self).__init__(
+            "Connection to %s was restored, but it is unknown whether '%s' was executed" % (visa_name, command)
+        )
+        self.visa_name = visa_name
+        self.command = command
+
+
+class ClusterError(Error):
+    def __init__(self, visa_name, error):
+        super(ClusterError, self).__init__(
+            "Operation failed on %s: %s" % (visa_name, error)
+        )
+        self.visa_name = visa_name
+        self.error = error
@@ -3,7 +3,10 @@
 This file is part of PyFEA.
 
 """
-from typing import (List)
+from typing import (List, Dict, TYPE_CHECKING)
+
+if TYPE_CHECKING:
+    from pyfea.measurement import BufferedMeasurement
 
 
 def floats(string_list) -> List[float]:
@@ -28,7 +31,12 @@ class Instrument:
         self.number = number
         self.name = name
         self.ready = False
+        self.channels = [1]
         self.type = "Unknown"
+        self.cache_enabled = False
+        self._cache = {}
+        # last command written for each setting, replayed when the unit restarted during a session
+        self._settings = {}
 
     def select(self):
         self._parent.select_instrument(self.number)
@@ -36,13 +44,86 @@ class Instrument:
     def is_ready(self, channel):
         """Check if is ready or not."""
 
-        self._parent.read_questionable_regs()
+        if not self._parent.ready_events:
+            self._parent.read_questionable_regs()
 
         if channel not in self.channels:
             return None
         else:
             return self.ready[channel - 1]
 
+    def enable_cache(self, enable=True):
+        """Enable or disable client-side cache of instrument settings.
+
+        When enabled, getters of settings answer from the last value written or read and setters writing
+        the already cached value are skipped. The cache is invalidated by the parent on device reinitialization,
+        calibration changes and device-side events.
+        """
+        self.cache_enabled = enable
+        self.invalidate_cache()
+
+    def invalidate_cache(self):
+        """Forget all cached settings."""
+        self._cache.clear()
+
+    def _cached_query(self, key, query, convert):
+        """Query setting unless it is cached."""
+        if self.cache_enabled and key in self._cache:
+            return self._cache[key]
+        value = convert(self._parent.query(query))
+        if self.cache_enabled:
+            self._cache[key] = value
+        return value
+
+    def _cached_write(self, key, command, value):
+        """Write setting unless the same value is cached."""
+        if self.cache_enabled and key in self._cache and self._cache[key] == value:
+            return
+        self._parent.write(command)
+        self._settings[key] = command
+        if self.cache_enabled:
+            self._cache[key] = value
+
+    def _setting_commands(self) -> List[str]:
+        """Commands restoring settings written during the session."""
+        return list(self._settings.values())
+
+    def _forget_settings(self):
+        """Forget settings written during the session (after the unit was reset)."""
+        self._settings.clear()
+
+    def measure_buffered(self, quantities: List[str], count, interval) -> Dict[str, 'BufferedMeasurement']:
+        """Acquire block of samples of several quantities.
+
+        Parameters
+        ----------
+        quantities
+            Names of measured quantities, e.g. 'voltage', 'current', 'voltage_adc' or 'current_adc'.
+        count : int
+            Number of samples.
+        interval : float
+            Sampling interval in seconds.
+
+        Returns
+        -------
+        Dict[str, BufferedMeasurement]
+            Samples and their summary statistics per quantity.
+        """
+        from pyfea.measurement import measure_buffered
+        return measure_buffered(self, quantities, count, interval)
+
+    def _buffered_queries(self):
+        """Dictionary of quantity: (trace feed, SCPI query) used by :meth:`measure_buffered`."""
+        return {}
+
+    def _snapshot_queries(self):
+        """List of (quantity, SCPI query) pairs used by :meth:`pyfea.Fea.measure_all`."""
+        return []
+
+    def _is_ready_flag(self) -> bool:
+        """Readiness of all channels known from the last read of the questionable registers."""
+        return all(self.ready)
+
     def _set_ready(self, channel, ready):
         if channel in self.channels:
             self.ready[channel - 1] = ready
@@ -0,0 +1,102 @@
+"""Buffered measurement
+
+This file is part of PyFEA.
+
+"""
+import time
+import numpy as np
+from typing import (Dict, List)
+from pyfea.constants import *
+from pyfea.scpi import (join_commands, split_response)
+
+
+class BufferedMeasurement:
+    """Block of samples of one measured quantity."""
+
+    def __init__(self, values: np.ndarray, timestamps: np.ndarray):
+        self.values = values
+        self.timestamps = timestamps
+
+    def __len__(self):
+        return len(self.values)
+
+    @property
+    def mean(self) -> float:
+        return float(self.values.mean())
+
+    @property
+    def std(self) -> float:
+        return float(self.values.std())
+
+    @property
+    def min(self) -> float:
+        return float(self.values.min())
+
+    @property
+    def max(self) -> float:
+        return float(self.values.max())
+
+    def summary(self) -> Dict[str, float]:
+        """Summary statistics of the block."""
+        return {'mean': self.mean, 'std': self.std, 'min': self.min, 'max': self.max, 'count': len(self)}
+
+    def __repr__(self):
+        return 'BufferedMeasurement(count=%d, mean=%g, std=%g, min=%g, max=%g)' % \
+               (len(self), self.mean, self.std, self.min, self.max)
+
+
+def measure_buffered(instrument, quantities: List[str], count, interval) -> Dict[str, BufferedMeasurement]:
+    """Acquire ``count`` samples of quantities of a virtual instrument in given interval.
+
+    When the firmware provides ``OPTION_TRACE``, the samples are acquired by the unit and fetched in one
+    transfer. Otherwise the acquisition is emulated by a client-side loop reading all quantities by one
+    compound query per sample.
+    """
+    available = instrument._buffered_queries()
+    for quantity in quantities:
+        if quantity not in available:
+            raise ValueError('%s cannot measure %s' % (instrument.name, quantity))
+
+    if instrument._parent.has_option(OPTION_TRACE):
+        return _measure_trace(instrument, quantities, count, interval)
+    else:
+        return _measure_emulated(instrument, quantities, count, interval)
+
+
+def _measure_trace(instrument, quantities, count, interval):
+    parent = instrument._parent
+    feeds = [instrument._buffered_queries()[quantity][0] for quantity in quantities]
+
+    parent.write(join_commands(['TRAC%d:FEED %s' % (instrument.number, ','.join(feeds)),
+                                'TRAC%d:POIN %d' % (instrument.number, count),
+                                'TRAC%d:TIM %g' % (instrument.number, interval),
+                                'INIT%d:TRAC' % instrument.number]))
+    start = time.time()
+    parent.wait_for_operation_complete(timeout=int((count * interval + 10) * 1000))
+
+    values = parent.query_values('FETC%d:TRAC?' % instrument.number)
+    values = np.asarray(values, dtype=float).reshape(count, len(quantities))
+    timestamps = start + np.arange(count) * interval
+    return {quantity: BufferedMeasurement(values[:, index], timestamps)
+            for index, quantity in enumerate(quantities)}
+
+
+def _measure_emulated(instrument, quantities, count, interval):
+    parent = instrument._parent
+    message = join_commands([instrument._buffered_queries()[quantity][1] for quantity in quantities])
+
+    values = np.empty((count, len(quantities)))
+    timestamps = np.empty(count)
+    next_time = time.monotonic()
+    for index in range(count):
+        delay = next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        start = time.time()
+        response = parent.query(message)
+        timestamps[index] = (start + time.time()) / 2
+        values[index] = [float(value) for value in split_response(response)]
+        next_time += interval
+
+    return {quantity: BufferedMeasurement(values[:, index], timestamps)
+            for index, quantity in enumerate(quantities)}
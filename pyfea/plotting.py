@@ -0,0 +1,210 @@
+"""Live plotting of values acquired in the background
+
+Plots are redrawn by blitting: persistent line artists get new data by ``set_data`` and only they are drawn over
+a cached background, the axes, ticks and labels are rendered again only when the y limits or the figure size
+change. The visible history is decimated to a minimum and a maximum per pixel column, so the cost of a frame
+depends on the width of the axes rather than on the number of samples in the window.
+
+matplotlib is imported only when a plot is created.
+
+Example
+-------
+>>> acq = Acquisition(fea, telemetry_channels(fea), rate=20)
+>>> acq.start()
+>>> LivePlot(acq, window=120).show()
+>>> acq.stop()
+
+This file is part of PyFEA.
+
+"""
+import numpy as np
+from typing import (Dict, List, Tuple)
+
+MAX_FPS = 10.0
+WINDOW = 60.0
+
+# fraction of the y range added above and below the data when axes are rescaled
+Y_MARGIN = 0.1
+# axes are shrunk only when the data with margins occupy less than this fraction of the y range
+Y_SHRINK = 0.25
+
+LABELS = {'voltage': 'Voltage (V)', 'current': 'Current (A)', 'temperature': 'Temperature (°C)'}
+
+
+def decimate_minmax(x: np.ndarray, y: np.ndarray, bins) -> Tuple[np.ndarray, np.ndarray]:
+    """Reduce samples to a minimum and a maximum per bin.
+
+    The x range is divided into ``bins`` equal intervals (one per pixel column), each non-empty interval is
+    represented by two points at its first x: the minimal and the maximal y. Peaks and the envelope of the
+    signal are kept, NaN values (gaps) are ignored unless whole interval is NaN.
+
+    Parameters
+    ----------
+    x : numpy.ndarray
+        Sorted x values of shape (samples,).
+    y : numpy.ndarray
+        Values of shape (samples,) or (samples, channels).
+    bins : int
+        Number of intervals.
+
+    Returns
+    -------
+    tuple
+        Decimated x and y, the input arrays when there are not more than 2 * bins samples.
+    """
+    if len(x) <= 2 * bins:
+        return x, y
+    edges = np.linspace(x[0], x[-1], bins + 1)[:-1]
+    starts = np.unique(np.searchsorted(x, edges, 'left'))
+    low = np.fmin.reduceat(y, starts, axis=0)
+    high = np.fmax.reduceat(y, starts, axis=0)
+    decimated = np.empty((2 * len(starts),) + y.shape[1:], dtype=low.dtype)
+    decimated[0::2] = low
+    decimated[1::2] = high
+    return np.repeat(x[starts], 2), decimated
+
+
+def telemetry_channels(fea) -> List[Tuple[object, str]]:
+    """Acquisition channels of the telemetry view: voltages of supplies and currents of ammeters."""
+    channels = []
+    for instrument in fea.instruments:
+        quantities = dict(instrument._snapshot_queries())
+        for quantity in ('voltage', 'current'):
+            if quantity in quantities:
+                channels.append((instrument, quantity))
+                break
+    return channels
+
+
+class LivePlot:
+    """Scrolling plot of the latest samples of an acquisition.
+
+    Channels measuring the same quantity share y axis, further quantities get twin axes. The x axis shows
+    time relative to the latest sample. The plot is updated by a GUI timer at most ``max_fps`` times per
+    second independently of the acquisition rate, frames are skipped when there are no new samples.
+    """
+
+    def __init__(self, acquisition, window=WINDOW, max_fps=MAX_FPS, figure=None, title=None):
+        """Object constructor
+
+        Parameters
+        ----------
+        acquisition : pyfea.Acquisition
+            Source of samples, it is only read by the plot.
+        window : float
+            Length of the visible history in seconds.
+        max_fps : float
+            Maximal number of redraws per second.
+        figure : matplotlib.figure.Figure
+            Figure to plot to, new figure when None.
+        title : str
+            Title of the figure.
+        """
+        from matplotlib import pyplot as plt
+
+        self.acquisition = acquisition
+        self.window = window
+        self.max_fps = max_fps
+        self.figure = figure if figure is not None else plt.figure()
+        if title:
+            self.figure.suptitle(title)
+
+        # one axes per quantity in order of the channels
+        quantities: Dict[str, List[int]] = {}
+        for index, (_, quantity) in enumerate(acquisition.channels):
+            quantities.setdefault(quantity, []).append(index)
+        host = self.figure.add_subplot()
+        self._axes = [host] + [host.twinx() for _ in range(len(quantities) - 1)]
+        if len(self._axes) > 2:
+            self.figure.subplots_adjust(right=1.0 - 0.1 * len(self._axes))
+            for offset, axes in enumerate(self._axes[2:], 1):
+                axes.spines.right.set_position(('axes', 1.0 + 0.2 * offset))
+
+        self._lines = [None] * len(acquisition.channels)
+        self._groups = []
+        names = acquisition.names[1:]
+        for axes, (quantity, indexes) in zip(self._axes, quantities.items()):
+            axes.set_ylabel(LABELS.get(quantity, quantity))
+            axes.set_ylim(-1.0, 1.0)
+            for index in indexes:
+                self._lines[index], = axes.plot([], [], color='C%d' % (index % 10), label=names[index],
+                                                animated=True)
+            self._groups.append((axes, indexes))
+        host.set_xlim(-window, 0.0)
+        host.set_xlabel('Time (s)')
+        host.grid()
+        host.legend(handles=self._lines, loc='upper left')
+
+        self.frames = 0
+        self.full_redraws = 0
+        self._count = 0
+        self._background = None
+        canvas = self.figure.canvas
+        canvas.mpl_connect('draw_event', self._on_draw)
+        canvas.mpl_connect('close_event', lambda event: self.stop())
+        self._timer = canvas.new_timer(interval=max(int(1000 / max_fps), 1))
+        self._timer.add_callback(self.update)
+
+    def start(self):
+        """Start periodic updates, the GUI event loop has to run (e.g. :meth:`show` or ``plt.pause``)."""
+        self._timer.start()
+
+    def stop(self):
+        self._timer.stop()
+
+    def show(self, block=True):
+        """Start updates and show the figure."""
+        from matplotlib import pyplot as plt
+        self.start()
+        plt.show(block=block)
+
+    def _on_draw(self, event):
+        # full redraw (rescale, resize), animated lines are not part of the cached background
+        self._background = self.figure.canvas.copy_from_bbox(self.figure.bbox)
+        for line in self._lines:
+            line.axes.draw_artist(line)
+
+    def _rescale(self, y) -> bool:
+        """Adjust y limits to the data, return True when any axes changed."""
+        changed = False
+        for axes, indexes in self._groups:
+            values = y[:, indexes]
+            if not np.isfinite(values).any():
+                continue
+            low, high = np.nanmin(values), np.nanmax(values)
+            margin = (high - low) * Y_MARGIN or max(abs(high) * Y_MARGIN, 1e-9)
+            bottom, top = axes.get_ylim()
+            if low >= bottom and high <= top and high - low + 2 * margin >= Y_SHRINK * (top - bottom):
+                continue
+            axes.set_ylim(low - margin, high + margin)
+            changed = True
+        return changed
+
+    def update(self):
+        """Redraw lines with the samples in the window, called by the timer."""
+        acquisition = self.acquisition
+        count = acquisition.count
+        if count == self._count:
+            return
+        self._count = count
+
+        # samples covering the window at the target rate, the ring buffer may hold much longer history
+        samples = min(int(self.window * acquisition.rate * 1.1) + 2, acquisition.capacity)
+        data = acquisition.view(count - samples, count)
+        data = data[np.searchsorted(data[:, 0], data[-1, 0] - self.window):]
+        bins = max(int(self._axes[0].bbox.width), 1)
+        x, y = decimate_minmax(data[:, 0] - data[-1, 0], data[:, 1:], bins)
+        for index, line in enumerate(self._lines):
+            line.set_data(x, y[:, index])
+
+        self.frames += 1
+        canvas = self.figure.canvas
+        if self._rescale(y) or self._background is None or not getattr(canvas, 'supports_blit', True):
+            self.full_redraws += 1
+            canvas.draw_idle()
+            return
+        canvas.restore_region(self._background)
+        for line in self._lines:
+            line.axes.draw_artist(line)
+        canvas.blit(self.figure.bbox)
+        canvas.flush_events()
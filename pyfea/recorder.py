@@ -0,0 +1,602 @@
+"""Columnar time-series recording of measurements and events
+
+A recording is a directory with an index file and two tables: ``samples`` (timestamp and one column per
+measured quantity, e.g. ``APS.voltage`` or ``APS.ready``) and ``events`` (timestamp, kind, code and text, e.g.
+FEA errors). Tables are split into chunks of a fixed number of rows, every column of a chunk is stored
+separately, so readers touch only the columns and time ranges they need.
+
+The chunk being filled is a set of memory-mapped ``.npy`` files, so rows are stored without extra copies and
+survive a crash of the writer up to the last flush. Completed chunks are kept as ``.npy`` files (memory-mapped
+by the reader), or compressed into ``.npz`` archives or Parquet files (needs pyarrow) by the flush thread.
+
+Example
+-------
+>>> with Recorder('run-2021-06-01') as recorder:
+...     while running:
+...         recorder.poll(fea)
+...         time.sleep(1)
+>>> reader = RecordingReader('run-2021-06-01')
+>>> data = reader.read(start=t0, stop=t0 + 3600, columns=['APS.voltage'])
+
+This file is part of PyFEA.
+
+"""
+import json
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import time
+import numpy as np
+from typing import (Dict, Iterator, List, Optional, Tuple)
+from pyfea.errors import *
+from pyfea.snapshot import Reading
+
+RECORDING_VERSION = 1
+INDEX_FILE = 'index.json'
+CHUNK_SIZE = 65536
+FLUSH_INTERVAL = 1.0
+MAX_PENDING_CHUNKS = 4
+
+FORMAT_NPY = 'npy'                      # uncompressed, memory-mapped by the reader
+FORMAT_NPZ = 'npz'                      # deflate compressed NumPy archives
+FORMAT_PARQUET = 'parquet'              # zstd compressed Parquet files (pyarrow)
+FORMATS = (FORMAT_NPY, FORMAT_NPZ, FORMAT_PARQUET)
+
+SAMPLES = 'samples'
+EVENTS = 'events'
+
+# flags (state, ready) are stored as int8, MISSING_FLAG when unknown
+MISSING_FLAG = -1
+FLAG_FIELDS = ('state', 'ready')
+
+EVENT_COLUMNS = [('time', '<f8'), ('kind', 'S16'), ('code', '<i4'), ('text', 'S160')]
+
+_STOP = object()
+
+
+def _import_parquet():
+    """pyarrow and pyarrow.parquet modules, ImportError when pyarrow is not installed."""
+    import pyarrow
+    import pyarrow.parquet
+    return pyarrow, pyarrow.parquet
+
+
+def has_parquet() -> bool:
+    try:
+        _import_parquet()
+        return True
+    except ImportError:
+        return False
+
+
+def column_dtype(name) -> str:
+    """Storage type of a sample column derived from its name."""
+    if name == 'time':
+        return '<f8'
+    if name.rsplit('.', 1)[-1] in FLAG_FIELDS:
+        return '|i1'
+    return '<f8'
+
+
+def _missing(dtype):
+    dtype = np.dtype(dtype)
+    if dtype.kind == 'f':
+        return np.nan
+    if dtype.kind == 'S':
+        return b''
+    return MISSING_FLAG
+
+
+def _write_json(path, content):
+    """Write JSON file atomically."""
+    directory = os.path.dirname(os.path.abspath(path))
+    handle, temporary = tempfile.mkstemp(dir=directory, prefix='.index-', suffix='.json')
+    try:
+        with os.fdopen(handle, 'w') as file:
+            json.dump(content, file, indent=1)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+class _Table:
+    """Chunks of one table, the last one being filled through memory maps."""
+
+    def __init__(self, directory, name, columns: List[Tuple[str, str]], chunk_size, chunks=None):
+        self.directory = os.path.join(directory, name)
+        self.name = name
+        self.columns = [(column, np.dtype(dtype).str) for column, dtype in columns]
+        self.chunk_size = chunk_size
+        self.chunks: List[dict] = list(chunks or [])
+        self.rows = sum(entry['rows'] for entry in self.chunks)
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._entry = None
+
+    def describe(self) -> dict:
+        return {'columns': self.columns, 'chunk_size': self.chunk_size,
+                'chunks': [dict(entry) for entry in self.chunks]}
+
+    def _open_chunk(self):
+        name = 'chunk-%06d' % len(self.chunks)
+        path = os.path.join(self.directory, name)
+        os.makedirs(path, exist_ok=True)
+        self._arrays = {}
+        for column, dtype in self.columns:
+            array = np.lib.format.open_memmap(os.path.join(path, column + '.npy'), mode='w+', dtype=dtype,
+                                              shape=(self.chunk_size,))
+            array[:] = _missing(dtype)
+            self._arrays[column] = array
+        self._entry = {'name': name, 'format': FORMAT_NPY, 'rows': 0, 'start': None, 'stop': None}
+        self.chunks.append(self._entry)
+
+    def append(self, rows: Dict[str, object], count) -> List[Tuple[dict, Dict[str, np.ndarray]]]:
+        """Store rows given as column arrays (or scalars when count is 1).
+
+        Returns
+        -------
+        list
+            Index entries and arrays of chunks completed by the rows.
+        """
+        completed = []
+        times = np.atleast_1d(np.asarray(rows['time'], dtype=float))
+        offset = 0
+        while offset < count:
+            if self._arrays is None:
+                self._open_chunk()
+            row = self._entry['rows']
+            size = min(count - offset, self.chunk_size - row)
+            for column, values in rows.items():
+                values = np.atleast_1d(values)
+                self._arrays[column][row:row + size] = values[offset:offset + size] if len(values) > 1 else values
+            if self._entry['start'] is None:
+                self._entry['start'] = float(times[offset])
+            self._entry['stop'] = float(times[offset + size - 1])
+            self._entry['rows'] = row + size
+            self.rows += size
+            offset += size
+            if self._entry['rows'] == self.chunk_size:
+                completed.append((self._entry, self._arrays))
+                self._arrays = None
+                self._entry = None
+        return completed
+
+    def detach_active(self) -> Optional[Tuple[dict, Dict[str, np.ndarray]]]:
+        """Take the partially filled chunk, it is removed from the index when empty."""
+        if self._arrays is None:
+            return None
+        entry, arrays = self._entry, self._arrays
+        self._arrays = None
+        self._entry = None
+        if entry['rows'] == 0:
+            self.chunks.remove(entry)
+            shutil.rmtree(os.path.join(self.directory, entry['name']), ignore_errors=True)
+            return None
+        return entry, arrays
+
+    def flush_active(self):
+        if self._arrays is not None:
+            for array in self._arrays.values():
+                array.flush()
+
+
+class Recorder:
+    """Appends snapshots, ready flags and error events to a columnar recording.
+
+    Rows are written into memory-mapped chunk files by the calling thread. A background thread flushes them
+    to disk every ``flush_interval`` seconds, updates the index and converts completed chunks to the storage
+    format. At most ``max_pending`` completed chunks wait for conversion, further rows block the writer.
+
+    The sample columns are given by the first snapshot recorded (or by ``columns``), quantities which are not
+    present later are stored as NaN (or -1 for flags), new quantities raise ValueError. An error of the flush
+    thread (e.g. full disk) is raised by the following record, :meth:`flush` and :meth:`close` calls.
+    """
+
+    def __init__(self, path, storage=FORMAT_NPY, chunk_size=CHUNK_SIZE, flush_interval=FLUSH_INTERVAL,
+                 max_pending=MAX_PENDING_CHUNKS, columns=None, metadata=None):
+        """Object constructor
+
+        Parameters
+        ----------
+        path : str
+            Directory of the recording, an existing recording is appended.
+        storage : str
+            Format of completed chunks: 'npy', 'npz' or 'parquet', 'auto' selects Parquet when pyarrow is
+            installed, npy otherwise.
+        chunk_size : int
+            Number of rows per chunk.
+        flush_interval : float
+            Time between flushes in seconds.
+        max_pending : int
+            Maximal number of completed chunks waiting for conversion.
+        columns
+            Names of sample columns without 'time', taken from the first recorded snapshot when None.
+        metadata : dict
+            JSON serializable description stored in the index (e.g. serial number of the unit).
+        """
+        if storage == 'auto':
+            storage = FORMAT_PARQUET if has_parquet() else FORMAT_NPY
+        if storage not in FORMATS:
+            raise ValueError('Unknown storage format %s' % storage)
+        if storage == FORMAT_PARQUET:
+            _import_parquet()
+        self.path = path
+        self.storage = storage
+        self.chunk_size = chunk_size
+        self.flush_interval = flush_interval
+        self.metadata = dict(metadata or {})
+        os.makedirs(path, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._tables: Dict[str, _Table] = {}
+        self._load_index()
+        if EVENTS not in self._tables:
+            self._tables[EVENTS] = _Table(path, EVENTS, EVENT_COLUMNS, chunk_size)
+        if columns is not None and SAMPLES not in self._tables:
+            self._create_samples(columns)
+
+        self.error = None
+        self._pending = queue.Queue(maxsize=max_pending)
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='pyfea-recorder', daemon=True)
+        self._thread.start()
+
+    def _load_index(self):
+        path = os.path.join(self.path, INDEX_FILE)
+        if not os.path.exists(path):
+            return
+        with open(path) as file:
+            index = json.load(file)
+        self.metadata = dict(index.get('metadata', {}), **self.metadata)
+        for name, table in index['tables'].items():
+            self._tables[name] = _Table(self.path, name, table['columns'], self.chunk_size, table['chunks'])
+
+    def _create_samples(self, names):
+        columns = [('time', column_dtype('time'))] + [(name, column_dtype(name)) for name in names if name != 'time']
+        self._tables[SAMPLES] = _Table(self.path, SAMPLES, columns, self.chunk_size)
+
+    @property
+    def columns(self) -> List[str]:
+        """Names of sample columns."""
+        table = self._tables.get(SAMPLES)
+        return [column for column, _ in table.columns] if table is not None else []
+
+    def _check_error(self):
+        """Raise the error of the flush thread, the recorded data are not being persisted."""
+        if self.error is not None:
+            raise self.error
+
+    def _append(self, table_name, rows, count):
+        self._check_error()
+        with self._lock:
+            if self._closed:
+                raise ValueError('Recorder is closed')
+            completed = self._tables[table_name].append(rows, count)
+        for entry, arrays in completed:
+            # blocks while the flush thread is behind
+            self._pending.put((table_name, entry, arrays))
+
+    def record(self, snapshot, ready: Optional[Dict[str, bool]] = None):
+        """Append one snapshot.
+
+        Parameters
+        ----------
+        snapshot : pyfea.snapshot.Snapshot
+            Readings of instruments (e.g. from :meth:`pyfea.Fea.measure_all`).
+        ready
+            Voltage ready flags indexed by instrument names.
+        """
+        values = {'time': snapshot.timestamp}
+        for reading in snapshot:
+            for field in Reading.FIELDS:
+                value = getattr(reading, field)
+                if value is not None:
+                    values['%s.%s' % (reading.name, field)] = value
+        for name, flag in (ready or {}).items():
+            values['%s.ready' % name] = flag
+        self.record_values(values)
+
+    def record_values(self, values: Dict[str, object]):
+        """Append one row given as column name: value, 'time' is required."""
+        with self._lock:
+            if SAMPLES not in self._tables:
+                self._create_samples(list(values))
+        columns = self.columns
+        unknown = [name for name in values if name not in columns]
+        if unknown:
+            raise ValueError('Columns %s are not in the recording' % ', '.join(unknown))
+        self._append(SAMPLES, values, 1)
+
+    def record_block(self, names: List[str], block: np.ndarray):
+        """Append block of samples, e.g. from :meth:`pyfea.Acquisition.blocks`.
+
+        Parameters
+        ----------
+        names
+            Column names of the block, the first one is 'time' (see :attr:`pyfea.Acquisition.names`).
+        block
+            Array of shape (samples, columns).
+        """
+        block = np.asarray(block)
+        if len(block) == 0:
+            return
+        with self._lock:
+            if SAMPLES not in self._tables:
+                self._create_samples(names)
+        columns = self.columns
+        unknown = [name for name in names if name not in columns]
+        if unknown:
+            raise ValueError('Columns %s are not in the recording' % ', '.join(unknown))
+        rows = {name: block[:, index] for index, name in enumerate(names)}
+        self._append(SAMPLES, rows, len(block))
+
+    def record_event(self, kind, code=0, text='', timestamp=None):
+        """Append one event.
+
+        Parameters
+        ----------
+        kind : str
+            Kind of the event, e.g. 'error' (up to 16 characters).
+        code : int
+            Numeric code, e.g. SCPI error code.
+        text : str
+            Description (up to 160 bytes of UTF-8).
+        timestamp : float
+            Time of the event, now when None.
+        """
+        self._append(EVENTS, {'time': time.time() if timestamp is None else timestamp,
+                              'kind': kind.encode()[:16],
+                              'code': code,
+                              'text': text.encode()[:160]}, 1)
+
+    def record_error(self, error: Error, timestamp=None):
+        """Append FEA errors (all errors read from the queue) or other PyFEA error as events."""
+        if isinstance(error, FeaError):
+            for code, text in error.errors:
+                self.record_event('error', code, text, timestamp)
+        else:
+            self.record_event(type(error).__name__, 0, str(error), timestamp)
+
+    def poll(self, fea, instruments=None, ready=True):
+        """Measure instruments by one compound query and append the snapshot.
+
+        Errors reported by the unit are recorded as events and raised.
+
+        Parameters
+        ----------
+        fea : pyfea.Fea
+            Opened FEA unit.
+        instruments
+            Virtual instruments to be measured, all instruments when None.
+        ready : bool
+            When True, voltage ready flags are recorded too. They are read from the questionable registers
+            unless ready events are enabled (see :meth:`pyfea.Fea.enable_ready_events`).
+        """
+        if instruments is None:
+            instruments = fea.instruments
+        if not self.metadata.get('serial'):
+            self.metadata.update(serial=fea.serial, fw_version=fea.fw_version, visa_name=fea.visa_name)
+        try:
+            flags = None
+            if ready:
+                if not fea.ready_events:
+                    fea.read_questionable_regs()
+                flags = {instrument.name: instrument._is_ready_flag() for instrument in instruments}
+            snapshot = fea.measure_all(instruments)
+        except Error as error:
+            self.record_error(error)
+            raise
+        self.record(snapshot, flags)
+
+    def flush(self):
+        """Write rows recorded so far to disk and update the index."""
+        self._pending.join()
+        self._check_error()
+        with self._lock:
+            for table in self._tables.values():
+                table.flush_active()
+            self._write_index()
+
+    def _write_index(self):
+        """Write the index, the lock must be held by the caller."""
+        _write_json(os.path.join(self.path, INDEX_FILE),
+                    {'version': RECORDING_VERSION,
+                     'metadata': self.metadata,
+                     'tables': {name: table.describe() for name, table in self._tables.items()}})
+
+    def _run(self):
+        while True:
+            try:
+                task = self._pending.get(timeout=self.flush_interval)
+            except queue.Empty:
+                task = None
+            try:
+                if task is _STOP:
+                    return
+                if task is not None:
+                    self._complete(*task)
+                with self._lock:
+                    for table in self._tables.values():
+                        table.flush_active()
+                    self._write_index()
+            except Exception as error:
+                self.error = error
+            finally:
+                if task is not None:
+                    self._pending.task_done()
+
+    def _complete(self, table_name, entry, arrays):
+        """Store completed chunk in the storage format."""
+        table = self._tables[table_name]
+        directory = os.path.join(table.directory, entry['name'])
+        rows = entry['rows']
+        if self.storage == FORMAT_NPY:
+            for array in arrays.values():
+                array.flush()
+            if rows < table.chunk_size:
+                # the last chunk is truncated to its rows
+                for column, array in arrays.items():
+                    path = os.path.join(directory, column + '.npy')
+                    np.save(path + '.tmp.npy', array[:rows])
+                    os.replace(path + '.tmp.npy', path)
+            return
+
+        data = {column: np.asarray(array[:rows]) for column, array in arrays.items()}
+        path = '%s.%s' % (directory, self.storage)
+        temporary = '%s.tmp.%s' % (directory, self.storage)
+        if self.storage == FORMAT_NPZ:
+            np.savez_compressed(temporary, **data)
+        else:
+            pyarrow, parquet = _import_parquet()
+            parquet.write_table(pyarrow.table(data), temporary, compression='zstd')
+        os.replace(temporary, path)
+        with self._lock:
+            entry['format'] = self.storage
+            self._write_index()
+        del arrays, data
+        shutil.rmtree(directory, ignore_errors=True)
+
+    def close(self):
+        """Store the partially filled chunks, write the index and stop the flush thread."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            active = [(name, table.detach_active()) for name, table in self._tables.items()]
+        for name, chunk in active:
+            if chunk is not None:
+                self._pending.put((name, chunk[0], chunk[1]))
+        self._pending.put(_STOP)
+        self._thread.join()
+        with self._lock:
+            self._write_index()
+        self._check_error()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+        return False
+
+
+class RecordingReader:
+    """Reads time ranges of a recording without loading it whole.
+
+    Chunks stored as ``.npy`` files are memory-mapped, so only pages of the requested columns and rows are read
+    from disk. Compressed chunks are decompressed one at a time. The recording may be read while it is written,
+    :meth:`reload` picks up rows flushed since the index was read.
+    """
+
+    def __init__(self, path):
+        """Object constructor
+
+        Parameters
+        ----------
+        path : str
+            Directory of the recording.
+        """
+        self.path = path
+        self.metadata = {}
+        self._tables = {}
+        self.reload()
+
+    def reload(self):
+        """Read the index again."""
+        with open(os.path.join(self.path, INDEX_FILE)) as file:
+            index = json.load(file)
+        if index.get('version', 0) > RECORDING_VERSION:
+            raise ValueError('Recording version %s is not supported' % index['version'])
+        self.metadata = index.get('metadata', {})
+        self._tables = index['tables']
+
+    @property
+    def tables(self) -> List[str]:
+        return list(self._tables)
+
+    def columns(self, table=SAMPLES) -> List[str]:
+        return [column for column, _ in self._tables[table]['columns']]
+
+    def rows(self, table=SAMPLES) -> int:
+        return sum(entry['rows'] for entry in self._tables[table]['chunks'])
+
+    def time_range(self, table=SAMPLES) -> Tuple[Optional[float], Optional[float]]:
+        """Timestamps of the first and the last row."""
+        chunks = [entry for entry in self._tables[table]['chunks'] if entry['rows']]
+        if not chunks:
+            return None, None
+        return chunks[0]['start'], chunks[-1]['stop']
+
+    def _load(self, table, entry, columns) -> Dict[str, np.ndarray]:
+        directory = os.path.join(self.path, table, entry['name'])
+        rows = entry['rows']
+        if entry['format'] == FORMAT_NPY:
+            return {column: np.load(os.path.join(directory, column + '.npy'), mmap_mode='r')[:rows]
+                    for column in columns}
+        if entry['format'] == FORMAT_NPZ:
+            with np.load(directory + '.npz') as archive:
+                return {column: archive[column][:rows] for column in columns}
+        _, parquet = _import_parquet()
+        data = parquet.read_table(directory + '.parquet', columns=list(columns), memory_map=True)
+        return {column: data.column(column).to_numpy()[:rows] for column in columns}
+
+    def chunks(self, table=SAMPLES, start=None, stop=None, columns=None) -> Iterator[Dict[str, np.ndarray]]:
+        """Generator of column arrays of chunks overlapping the time range.
+
+        Parameters
+        ----------
+        table : str
+            'samples' or 'events'.
+        start : float
+            First timestamp, from the beginning when None.
+        stop : float
+            Timestamp after the range, to the end when None.
+        columns
+            Names of columns, all when None. 'time' is always included.
+
+        Yields
+        ------
+        dict
+            Arrays (read-only memory maps for npy chunks) of rows within the range indexed by column names.
+        """
+        if columns is None:
+            columns = self.columns(table)
+        columns = ['time'] + [column for column in columns if column != 'time']
+        for entry in self._tables[table]['chunks']:
+            if not entry['rows']:
+                continue
+            if start is not None and entry['stop'] < start:
+                continue
+            if stop is not None and entry['start'] >= stop:
+                break
+            data = self._load(table, entry, columns)
+            times = data['time']
+            first = 0 if start is None else int(np.searchsorted(times, start, 'left'))
+            last = len(times) if stop is None else int(np.searchsorted(times, stop, 'left'))
+            if last > first:
+                yield {column: values[first:last] for column, values in data.items()}
+
+    def read(self, table=SAMPLES, start=None, stop=None, columns=None) -> Dict[str, np.ndarray]:
+        """Column arrays of rows within the time range (see :meth:`chunks`).
+
+        Rows from one npy chunk are returned as memory-mapped views, rows spanning several chunks are copied.
+        """
+        parts = list(self.chunks(table, start, stop, columns))
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            names = ['time'] + [column for column in (columns or self.columns(table)) if column != 'time']
+            dtypes = dict(self._tables[table]['columns'])
+            return {column: np.empty(0, dtype=dtypes[column]) for column in names}
+        return {column: np.concatenate([part[column] for part in parts]) for column in parts[0]}
+
+    def events(self, start=None, stop=None) -> List[Tuple[float, str, int, str]]:
+        """Events within the time range as (time, kind, code, text) tuples."""
+        events = []
+        for part in self.chunks(EVENTS, start, stop):
+            for timestamp, kind, code, text in zip(part['time'], part['kind'], part['code'], part['text']):
+                events.append((float(timestamp), kind.decode(errors='replace'), int(code),
+                               text.decode(errors='replace')))
+        return events
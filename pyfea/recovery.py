@@ -0,0 +1,90 @@
+"""Recovery of the session after transport failures
+
+This file is part of PyFEA.
+
+"""
+import re
+import time
+from typing import (Iterator, List, Optional)
+from pyfea.constants import *
+from pyfea.scpi import split_commands
+
+_SUFFIX = re.compile(r'(?<=[A-Za-z])\d+')
+
+
+def is_idempotent(message) -> bool:
+    """Check that the program message can be sent again without changing its effect.
+
+    Setting commands and queries are idempotent, commands and queries with side effects listed in
+    ``NON_IDEMPOTENT_PREFIXES`` (triggers, destructive reads, calibration store) are not. Numeric suffixes of
+    headers are ignored, so ``TRAC1:DATA?`` matches ``TRAC:DATA``.
+    """
+    for command in split_commands(message):
+        header = _SUFFIX.sub('', command.split(' ', 1)[0]).upper()
+        if header.startswith(NON_IDEMPOTENT_PREFIXES):
+            return False
+    return True
+
+
+class RecoveryPolicy:
+    """Reconnection attempts and backoff after a transport failure.
+
+    Delays between attempts grow exponentially from ``delay`` up to ``max_delay``, each randomly shortened by
+    up to ``jitter`` of its length so that units sharing a bus do not reconnect in lockstep.
+    """
+
+    def __init__(self, attempts=8, delay=0.05, factor=2.0, max_delay=5.0, jitter=0.1):
+        """Object constructor
+
+        Parameters
+        ----------
+        attempts : int
+            Maximal number of reconnection attempts.
+        delay : float
+            Delay before the first attempt in seconds.
+        factor : float
+            Growth of the delay after every failed attempt.
+        max_delay : float
+            Maximal delay between attempts in seconds.
+        jitter : float
+            Relative random shortening of the delays.
+        """
+        if attempts < 1:
+            raise ValueError('At least one reconnection attempt is needed')
+        self.attempts = attempts
+        self.delay = delay
+        self.factor = factor
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+    def delays(self) -> Iterator[float]:
+        """Delays in seconds before the individual attempts."""
+        import random
+        delay = self.delay
+        for _ in range(self.attempts):
+            yield delay * (1.0 - self.jitter * random.random())
+            delay = min(delay * self.factor, self.max_delay)
+
+
+class Reconnection:
+    """Record of one session recovery."""
+
+    def __init__(self, visa_name, error, command):
+        self.visa_name = visa_name
+        self.error = error
+        self.command = command
+        self.time = time.time()
+        self.duration = 0.0
+        self.attempts = 0
+        self.succeeded = False
+        self.restarted = False
+        self.replayed: List[str] = []
+        self.retried = False
+        self.unconfirmed: Optional[str] = None
+
+    def __repr__(self):
+        state = 'restored' if self.succeeded else 'failed'
+        if self.restarted:
+            state += ', unit restarted'
+        return 'Reconnection(%s, %s after %d attempts in %.3f s, %d settings replayed)' % \
+               (self.visa_name, state, self.attempts, self.duration, len(self.replayed))
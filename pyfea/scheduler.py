@@ -0,0 +1,208 @@
+"""Priority scheduling of access to the instrument interface
+
+This file is part of PyFEA.
+
+"""
+import itertools
+import threading
+import time
+from concurrent.futures import Future
+from typing import (Dict, Tuple)
+from pyfea.constants import *
+
+# waiting time in seconds after which a waiter is promoted by one priority level
+AGING_INTERVAL = 0.5
+
+
+class WaitStatistics:
+    """Lock wait statistics of one priority level."""
+
+    def __init__(self):
+        self.count = 0
+        self.contended = 0
+        self.coalesced = 0
+        self.reused = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def add(self, wait):
+        self.count += 1
+        if wait > 0:
+            self.contended += 1
+            self.total += wait
+            if wait > self.max:
+                self.max = wait
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def to_dict(self) -> dict:
+        return {'count': self.count, 'contended': self.contended, 'coalesced': self.coalesced,
+                'reused': self.reused, 'mean': self.mean, 'max': self.max, 'total': self.total}
+
+
+class _Waiter:
+    __slots__ = ('priority', 'sequence', 'enqueued', 'event')
+
+    def __init__(self, priority, sequence):
+        self.priority = priority
+        self.sequence = sequence
+        self.enqueued = time.perf_counter()
+        self.event = threading.Event()
+
+
+class IoScheduler:
+    """Exclusive access to the interface granted by priority.
+
+    When the interface is released, it is handed over to the waiting thread with the best priority, threads
+    with equal priority are served in order of arrival. Waiters are promoted by one level per
+    ``aging_interval`` seconds of waiting, so background threads cannot be starved by a busy foreground.
+
+    Identical queries waiting for the interface or being executed at the same time are executed only once, and
+    results of recently finished ones can be reused within a freshness window (see :meth:`run`).
+    """
+
+    def __init__(self, aging_interval=AGING_INTERVAL):
+        """Object constructor
+
+        Parameters
+        ----------
+        aging_interval : float
+            Waiting time in seconds after which the priority of a waiter is raised by one level.
+        """
+        self.aging_interval = aging_interval
+        self._mutex = threading.Lock()
+        self._busy = False
+        self._waiters = []
+        self._sequence = itertools.count()
+        self._pending: Dict[object, Future] = {}
+        self._results: Dict[object, Tuple[float, object]] = {}
+        self._generation = 0
+        self._statistics = {priority: WaitStatistics() for priority in PRIORITY_NAMES}
+
+    def acquire(self, priority=PRIORITY_NORMAL) -> float:
+        """Wait for the interface.
+
+        Returns
+        -------
+        float
+            Time spent waiting in seconds.
+        """
+        with self._mutex:
+            if not self._busy:
+                self._busy = True
+                self._statistics[priority].add(0.0)
+                return 0.0
+            waiter = _Waiter(priority, next(self._sequence))
+            self._waiters.append(waiter)
+
+        try:
+            waiter.event.wait()
+        except BaseException:
+            with self._mutex:
+                handed_over = waiter not in self._waiters
+                if not handed_over:
+                    self._waiters.remove(waiter)
+            if handed_over:
+                # the interface was handed over meanwhile, pass it on
+                self.release()
+            raise
+        wait = time.perf_counter() - waiter.enqueued
+        with self._mutex:
+            self._statistics[priority].add(wait)
+        return wait
+
+    def release(self):
+        """Release the interface and hand it over to the next waiter."""
+        with self._mutex:
+            if not self._busy:
+                raise RuntimeError('IoScheduler released too many times')
+            if not self._waiters:
+                self._busy = False
+                return
+            now = time.perf_counter()
+            waiter = min(self._waiters,
+                         key=lambda w: (w.priority - (now - w.enqueued) / self.aging_interval, w.sequence))
+            self._waiters.remove(waiter)
+            # the interface stays busy, ownership passes to the waiter
+            waiter.event.set()
+
+    def run(self, function, key=None, priority=PRIORITY_NORMAL, freshness=0.0):
+        """Call ``function`` with the interface acquired.
+
+        Parameters
+        ----------
+        function
+            Function performing the transaction, called with the lock wait time in seconds.
+        key
+            When not None and another call with the same key is waiting for the interface or being executed, the
+            result of that call is returned instead of executing ``function``.
+        priority : int
+            PRIORITY_HIGH, PRIORITY_NORMAL or PRIORITY_LOW.
+        freshness : float
+            Time in seconds for which the result of a finished call with the same key is reused.
+        """
+        if key is not None:
+            with self._mutex:
+                if freshness > 0:
+                    recent = self._results.get(key)
+                    if recent is not None and time.perf_counter() - recent[0] <= freshness:
+                        self._statistics[priority].reused += 1
+                        return recent[1]
+                future = self._pending.get(key)
+                joined = future is not None
+                if joined:
+                    self._statistics[priority].coalesced += 1
+                else:
+                    future = self._pending[key] = Future()
+                    generation = self._generation
+            if joined:
+                return future.result()
+
+        wait = self.acquire(priority)
+        try:
+            result = function(wait)
+        except BaseException as error:
+            if key is not None:
+                self._finish(key, future)
+                future.set_exception(error)
+            raise
+        finally:
+            self.release()
+        if key is not None:
+            self._finish(key, future, generation if freshness > 0 else None, result)
+            future.set_result(result)
+        return result
+
+    def _finish(self, key, future, generation=None, result=None):
+        with self._mutex:
+            if self._pending.get(key) is future:
+                del self._pending[key]
+            if generation is not None and generation == self._generation:
+                self._results[key] = (time.perf_counter(), result)
+
+    def invalidate(self):
+        """Forget results of finished calls and do not join calls being executed.
+
+        To be called when the device state may have changed, e.g. after a setting command.
+        """
+        with self._mutex:
+            self._generation += 1
+            self._results.clear()
+            self._pending.clear()
+
+    def statistics(self) -> Dict[str, dict]:
+        """Number of acquisitions, number of contended ones, coalesced calls, mean and maximal wait per priority."""
+        with self._mutex:
+            return {PRIORITY_NAMES[priority]: statistics.to_dict()
+                    for priority, statistics in self._statistics.items()}
+
+    def reset_statistics(self):
+        with self._mutex:
+            self._statistics = {priority: WaitStatistics() for priority in PRIORITY_NAMES}
+
+    @property
+    def queue_length(self) -> int:
+        """Number of threads waiting for the interface."""
+        return len(self._waiters)
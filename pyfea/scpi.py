@@ -0,0 +1,105 @@
+"""SCPI message helpers
+
+This file is part of PyFEA.
+
+"""
+from typing import (List, Iterable, Sequence)
+
+
+def join_commands(commands: Iterable[str]) -> str:
+    """Join several SCPI commands into one program message.
+
+    Every command except common (``*``) commands is prefixed by a colon so that its header is resolved from
+    the root of the command tree and not relative to the previous command.
+
+    Parameters
+    ----------
+    commands
+        Sequence of SCPI commands or queries.
+
+    Returns
+    -------
+    str
+        Semicolon separated program message.
+    """
+    message = ''
+    for command in commands:
+        if message:
+            if command.startswith('*') or command.startswith(':'):
+                message += ';' + command
+            else:
+                message += ';:' + command
+        else:
+            message = command
+    return message
+
+
+def split_response(response: str) -> List[str]:
+    """Split response to a compound query into the individual responses.
+
+    Semicolons inside quoted strings are not treated as separators.
+
+    Parameters
+    ----------
+    response
+        Response string received from the remote device.
+
+    Returns
+    -------
+    List[str]
+        List of response units in the order of the queries.
+    """
+    if '"' not in response:
+        return response.split(';')
+
+    units = []
+    start = 0
+    quoted = False
+    for index, char in enumerate(response):
+        if char == '"':
+            quoted = not quoted
+        elif char == ';' and not quoted:
+            units.append(response[start:index])
+            start = index + 1
+    units.append(response[start:])
+    return units
+
+
+def is_query(command: str) -> bool:
+    """Check if the SCPI command is a query (produces response)."""
+    return '?' in command
+
+
+def split_commands(message: str) -> List[str]:
+    """Split program message into the individual commands without leading colons."""
+    return [command.lstrip(':') for command in split_response(message)]
+
+
+def group_commands(commands: Sequence[str], max_length: int) -> List[range]:
+    """Split commands into as few program messages not exceeding ``max_length`` as possible.
+
+    A command longer than ``max_length`` is sent alone.
+
+    Returns
+    -------
+    List[range]
+        Ranges of indexes of the commands joined into each message.
+    """
+    groups = []
+    first = 0
+    length = 0
+    for index, command in enumerate(commands):
+        if index > first and length + len(command) + 2 > max_length:
+            groups.append(range(first, index))
+            first = index
+            length = 0
+        length += len(command) + 2
+    if first < len(commands):
+        groups.append(range(first, len(commands)))
+    return groups
+
+
+def pack_commands(commands: Iterable[str], max_length: int) -> List[str]:
+    """Join commands into as few program messages not exceeding ``max_length`` as possible."""
+    commands = list(commands)
+    return [join_commands(commands[group.start:group.stop]) for group in group_commands(commands, max_length)]
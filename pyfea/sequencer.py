@@ -0,0 +1,243 @@
+"""Setpoint sequencer
+
+This file is part of PyFEA.
+
+"""
+import threading
+import time
+import numpy as np
+from pyfea.errors import *
+from pyfea.constants import *
+from pyfea.scpi import join_commands
+
+# time before a step spent busy waiting instead of sleeping (s)
+SPIN_TIME = 0.002
+
+
+class SequenceReport:
+    """Scheduled and actual timing of a played sequence.
+
+    Times are in seconds relative to the start of the sequence. In host mode ``actual`` is the time the step
+    message was sent and ``latency`` the time it took, in list mode only the start and end are known.
+    """
+
+    def __init__(self, scheduled, mode):
+        self.mode = mode
+        self.scheduled = scheduled
+        self.actual = np.full(len(scheduled), np.nan)
+        self.latency = np.full(len(scheduled), np.nan)
+        self.start = None
+        self.duration = None
+        self.error = None
+        self.completed = False
+
+    @property
+    def lateness(self) -> np.ndarray:
+        """Actual minus scheduled time of the steps."""
+        return self.actual - self.scheduled
+
+    @property
+    def sent(self) -> int:
+        """Number of steps sent."""
+        return int(np.count_nonzero(~np.isnan(self.actual)))
+
+    def summary(self) -> dict:
+        """Number of steps sent, mean, standard deviation and maximum of lateness and latency."""
+        lateness = self.lateness[~np.isnan(self.actual)]
+        latency = self.latency[~np.isnan(self.latency)]
+        return {'steps': len(self.scheduled),
+                'sent': len(lateness),
+                'mean_lateness': float(lateness.mean()) if len(lateness) else 0.0,
+                'std_lateness': float(lateness.std()) if len(lateness) else 0.0,
+                'max_lateness': float(lateness.max()) if len(lateness) else 0.0,
+                'mean_latency': float(latency.mean()) if len(latency) else 0.0,
+                'max_latency': float(latency.max()) if len(latency) else 0.0,
+                'duration': self.duration}
+
+    def __repr__(self):
+        summary = self.summary()
+        return 'SequenceReport(%s, %d/%d steps, max lateness %.3f ms)' % \
+               (self.mode, summary['sent'], summary['steps'], summary['max_lateness'] * 1e3)
+
+
+class Sequencer:
+    """Player of voltage setpoint sequences on a dedicated thread.
+
+    Each row of the step array holds the time of the step (in seconds from the start of the pass) followed by
+    output voltages of the supplies. All voltages of one step are sent in one program message. NaN voltage
+    keeps the output of the supply unchanged in that step.
+
+    When the firmware provides ``OPTION_LIST`` and ``use_list`` is True, the sequence is uploaded to the unit
+    and played by its hardware timer, otherwise the host schedules the steps.
+
+    Example
+    -------
+    >>> t = np.arange(0, 10, 0.5)
+    >>> steps = np.column_stack((t, 1000 + 500 * np.sin(t), np.full_like(t, 2000), np.full_like(t, 500)))
+    >>> with Sequencer(fea, steps, repeat=10) as sequencer:
+    ...     sequencer.wait()
+    >>> print(sequencer.report.summary())
+    """
+
+    def __init__(self, parent, steps, supplies=None, repeat=1, period=None, use_list=True):
+        """Object constructor
+
+        Parameters
+        ----------
+        parent : pyfea.Fea
+            FEA unit.
+        steps
+            Array of shape (steps, 1 + supplies) with times and voltages, times must not decrease.
+        supplies
+            Supplies of voltage columns in order, all supplies of the unit (APS, EPS, SPS) when None.
+        repeat : int
+            Number of passes.
+        period : float
+            Duration of one pass in seconds, the time of the last step plus the last step interval when None.
+        use_list : bool
+            When False, the sequence is always played by the host.
+        """
+        self._parent = parent
+        self.supplies = list(parent._supplies() if supplies is None else supplies)
+        self.steps = np.array(steps, dtype=float, ndmin=2)
+        if self.steps.shape[1] != len(self.supplies) + 1:
+            raise ValueError('Steps must have %d columns' % (len(self.supplies) + 1))
+        times = self.steps[:, 0]
+        if len(times) == 0 or np.any(np.diff(times) < 0) or times[0] < 0:
+            raise ValueError('Step times must be non-negative and must not decrease')
+        if period is None:
+            period = times[-1] + (times[-1] - times[-2] if len(times) > 1 else 0.0)
+        if period < times[-1]:
+            raise ValueError('Period shorter than the sequence')
+        self.repeat = int(repeat)
+        self.period = float(period)
+        self.use_list = use_list
+        self.messages = [self._message(row) for row in self.steps[:, 1:]]
+
+        self.report = None
+        self._thread = None
+        self._stop = threading.Event()
+
+    def _message(self, voltages) -> str:
+        return join_commands(['SOUR%d:VOLT %f' % (supply.number, voltage)
+                              for supply, voltage in zip(self.supplies, voltages) if not np.isnan(voltage)])
+
+    def _list_mode(self) -> bool:
+        return self.use_list and self._parent.has_option(OPTION_LIST) and not np.isnan(self.steps[:, 1:]).any()
+
+    def start(self):
+        """Start playing on a background thread."""
+        if self.is_running():
+            return
+        mode = 'list' if self._list_mode() else 'host'
+        offsets = (np.arange(self.repeat) * self.period)[:, np.newaxis]
+        self.report = SequenceReport((offsets + self.steps[:, 0]).ravel(), mode)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name='pyfea-sequencer', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Stop playing, outputs keep the last voltages sent."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def wait(self, timeout=None) -> bool:
+        """Wait until the sequence is finished.
+
+        Returns
+        -------
+        bool
+            True when finished, False on timeout.
+
+        Raises
+        ------
+        pyfea.errors.Error
+            Error which stopped the sequence.
+        """
+        if self._thread is not None:
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                return False
+        if self.report is not None and self.report.error is not None:
+            raise self.report.error
+        return True
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.stop()
+        return False
+
+    def _run(self):
+        report = self.report
+        try:
+            with self._parent.io_priority(PRIORITY_HIGH):
+                if report.mode == 'list':
+                    self._play_list(report)
+                else:
+                    self._play_host(report)
+                self._parent.check_errors()
+            report.completed = not self._stop.is_set()
+        except Error as error:
+            report.error = error
+
+    def _play_host(self, report):
+        parent = self._parent
+        count = len(self.messages)
+        start = time.perf_counter()
+        report.start = time.time()
+        for index, scheduled in enumerate(report.scheduled):
+            target = start + scheduled
+            delay = target - time.perf_counter() - SPIN_TIME
+            if delay > 0 and self._stop.wait(delay):
+                break
+            if self._stop.is_set():
+                break
+            while time.perf_counter() < target:
+                pass
+            sent = time.perf_counter()
+            parent.write(self.messages[index % count], check_errors=False)
+            done = time.perf_counter()
+            report.actual[index] = sent - start
+            report.latency[index] = done - sent
+        report.duration = time.perf_counter() - start
+
+    def _play_list(self, report):
+        parent = self._parent
+        times = self.steps[:, 0]
+        dwells = np.append(np.diff(times), self.period - times[-1])
+        commands = []
+        for column, supply in enumerate(self.supplies, 1):
+            commands.append('SOUR%d:LIST:VOLT %s' % (supply.number,
+                                                    ','.join('%f' % value for value in self.steps[:, column])))
+            commands.append('SOUR%d:LIST:DWEL %s' % (supply.number, ','.join('%g' % value for value in dwells)))
+            commands.append('SOUR%d:LIST:COUN %d' % (supply.number, self.repeat))
+        for command in commands:
+            parent.write(command, check_errors=False)
+        parent.check_errors(commands)
+
+        # the first step starts when INIT is executed
+        start = time.perf_counter()
+        report.start = time.time()
+        parent.write('INIT:LIST', check_errors=False)
+        report.actual[0] = 0.0
+        report.latency[0] = time.perf_counter() - start
+
+        end = start + self.period * self.repeat
+        while not self._stop.is_set():
+            remaining = end - time.perf_counter()
+            if remaining <= 0:
+                break
+            self._stop.wait(min(remaining, 0.1))
+        if self._stop.is_set():
+            parent.write('ABOR:LIST', check_errors=False)
+        else:
+            parent.wait_for_operation_complete()
+        report.duration = time.perf_counter() - start
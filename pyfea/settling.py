@@ -0,0 +1,200 @@
+"""Adaptive detection of settled readings and outputs
+
+This file is part of PyFEA.
+
+"""
+import time
+import numpy as np
+from collections import deque
+from typing import (Callable, Tuple)
+from pyfea.scpi import (join_commands, split_response)
+
+
+class StabilityDetector:
+    """Decides from a stream of readings whether the measured quantity has settled.
+
+    The quantity is considered settled when the last ``window`` readings stay within ``tolerance`` around
+    their mean and the trend fitted through them would not move the value by more than ``tolerance``
+    over the length of the window.
+    """
+
+    def __init__(self, tolerance, window=5, relative=0.0):
+        """Object constructor
+
+        Parameters
+        ----------
+        tolerance : float
+            Absolute tolerance of the readings.
+        window : int
+            Number of readings tested (at least 3).
+        relative : float
+            Tolerance relative to the mean of the readings, added to the absolute tolerance.
+        """
+        if window < 3:
+            raise ValueError('Stability window must contain at least 3 readings')
+        self.tolerance = tolerance
+        self.relative = relative
+        self.window = window
+        self._values = deque(maxlen=window)
+        self._times = deque(maxlen=window)
+
+    def reset(self):
+        self._values.clear()
+        self._times.clear()
+
+    def add(self, value, timestamp=None) -> bool:
+        """Add reading and return True when the readings are settled."""
+        self._values.append(float(value))
+        self._times.append(time.monotonic() if timestamp is None else timestamp)
+        return self.is_stable()
+
+    def is_stable(self) -> bool:
+        if len(self._values) < self.window:
+            return False
+        values = np.array(self._values)
+        times = np.array(self._times)
+        mean = values.mean()
+        tolerance = self.tolerance + self.relative * abs(mean)
+        if np.max(np.abs(values - mean)) > tolerance:
+            return False
+        span = times[-1] - times[0]
+        if span <= 0:
+            return True
+        slope = np.polyfit(times - times[0], values, 1)[0]
+        return abs(slope) * span <= tolerance
+
+    @property
+    def values(self) -> np.ndarray:
+        """Readings in the window."""
+        return np.array(self._values)
+
+
+def wait_until_stable(read: Callable[[], float], detector: StabilityDetector, interval=0.1,
+                      timeout=None) -> Tuple[bool, np.ndarray]:
+    """Read values until they are settled.
+
+    Parameters
+    ----------
+    read
+        Function returning one reading.
+    detector : StabilityDetector
+        Detector deciding about stability, it is reset first.
+    interval : float
+        Time between readings in seconds.
+    timeout : float
+        Maximal waiting time in seconds, no limit when None.
+
+    Returns
+    -------
+    bool
+        True when settled, False on timeout.
+    numpy.ndarray
+        Readings in the stability window.
+    """
+    detector.reset()
+    deadline = None if timeout is None else time.monotonic() + timeout
+    next_time = time.monotonic()
+    while True:
+        if detector.add(read()):
+            return True, detector.values
+        next_time += interval
+        now = time.monotonic()
+        if deadline is not None and now >= deadline:
+            return False, detector.values
+        if next_time > now:
+            time.sleep(next_time - now)
+        else:
+            next_time = now
+
+
+def settle_supplies(parent, targets, tolerance=None, timeout=None, interval=0.05, window=5,
+                    ignore_off=False) -> bool:
+    """Wait until output voltages of supplies are settled.
+
+    The output states and voltages are read by one compound query. Supplies with output turned off are not
+    awaited. The ramp time is predicted from the actual voltages, targets and rise or fall rates and slept through
+    without accessing the interface. Then the voltage ready condition (``QUEST_VOLTAGE``) is awaited, using
+    service request events when enabled, and finally the output voltages are streamed by one compound query
+    per reading until they pass the stability test.
+
+    Parameters
+    ----------
+    parent : pyfea.Fea
+        FEA unit of the supplies.
+    targets
+        Target voltages in volts indexed by supplies, None values are replaced by the programmed voltages.
+    tolerance : float
+        Stability tolerance in volts, 1e-4 of the full scale voltage of each supply when None.
+    timeout : float
+        Maximal waiting time in seconds, no limit when None.
+    interval : float
+        Time between streamed readings in seconds.
+    window : int
+        Number of readings which must stay within tolerance.
+    ignore_off : bool
+        When False, a supply with output turned off makes the result False, otherwise it is silently skipped.
+
+    Returns
+    -------
+    bool
+        True when all outputs are settled, False on timeout or when an awaited output is turned off.
+    """
+    supplies = list(targets)
+    if not supplies:
+        return True
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining():
+        return None if deadline is None else max(deadline - time.monotonic(), 0.0)
+
+    message = join_commands(['OUTP%d:STAT?' % supply.number for supply in supplies] +
+                            ['MEAS%d:VOLT?' % supply.number for supply in supplies])
+    responses = split_response(parent.query(message))
+    states = [int(value) != 0 for value in responses[:len(supplies)]]
+    actuals = [float(value) for value in responses[len(supplies):]]
+
+    # the voltage of a turned off output never reaches the target
+    result = ignore_off or all(states)
+    actuals = [actual for actual, state in zip(actuals, states) if state]
+    supplies = [supply for supply, state in zip(supplies, states) if state]
+    if not supplies:
+        return result
+    message = join_commands(['MEAS%d:VOLT?' % supply.number for supply in supplies])
+
+    def read_voltages():
+        return [float(value) for value in split_response(parent.query(message))]
+
+    ramp_time = 0.0
+    for supply, actual in zip(supplies, actuals):
+        target = targets[supply]
+        if target is None:
+            target = supply.get_voltage()
+        rate = supply.get_rise_rate() if abs(target) > abs(actual) else supply.get_fall_rate()
+        if rate > 0:
+            ramp_time = max(ramp_time, abs(target - actual) / rate)
+
+    left = remaining()
+    time.sleep(ramp_time if left is None else min(ramp_time, left))
+
+    if parent.ready_events:
+        # flags may still describe the state before the setpoint change
+        parent.read_questionable_regs()
+    if not parent.wait_until_ready(supplies, remaining(), poll_interval=interval):
+        return False
+
+    detectors = [StabilityDetector(supply.full_scale_voltage * 1e-4 if tolerance is None else tolerance, window)
+                 for supply in supplies]
+    next_time = time.monotonic()
+    while True:
+        voltages = read_voltages()
+        now = time.monotonic()
+        settled = [detector.add(voltage, now) for detector, voltage in zip(detectors, voltages)]
+        if all(settled):
+            return result
+        if deadline is not None and now >= deadline:
+            return False
+        next_time += interval
+        if next_time > now:
+            time.sleep(next_time - now)
+        else:
+            next_time = now
@@ -0,0 +1,1159 @@
+"""Simulated FEA unit
+
+Software model of the FEA unit speaking the SCPI dialect used by PyFEA. It is used by :class:`pyfea.Fea` for
+resource names starting with ``SIM::``, e.g. ``Fea('SIM::GPIB::22::INSTR')``, and allows to run, test and
+benchmark PyFEA without the hardware.
+
+The model emulates output ramps, settling, the questionable status register tree, the error queue and status
+byte including service requests. Every bus transaction is delayed according to the latency model of the
+interface given in the resource name (GPIB, USB or LAN).
+
+This file is part of PyFEA.
+
+"""
+import bisect
+import queue
+import random
+import re
+import threading
+import time
+from collections import deque
+from typing import (Dict, List, Optional, Tuple)
+import pyvisa
+from pyvisa import constants
+from pyfea.constants import *
+from pyfea.scpi import split_response
+
+# per transaction overhead (s), per byte transfer time (s)
+LATENCY_MODELS = {
+    'GPIB': (0.0015, 1.0e-6),
+    'USB': (0.0005, 1.0e-7),
+    'LAN': (0.0008, 1.0e-8),
+    'NONE': (0.0, 0.0),
+}
+
+SIM_PASSWORD = '1234'
+
+ERROR_MESSAGES = {
+    -100: 'Command error',
+    -102: 'Syntax error',
+    -113: 'Undefined header',
+    -203: 'Command protected',
+    -221: 'Settings conflict',
+    -222: 'Data out of range',
+    -224: 'Illegal parameter value',
+    -350: 'Queue overflow',
+}
+
+
+class SimError(Exception):
+    def __init__(self, code):
+        super(SimError, self).__init__(code)
+        self.code = code
+
+
+def _interpolate(points, value) -> float:
+    """Piece-wise linear conversion through calibration points with linear extrapolation."""
+    if len(points) == 0:
+        return value
+    if len(points) == 1:
+        return points[0][1]
+    xs = [point[0] for point in points]
+    index = min(max(bisect.bisect_right(xs, value), 1), len(points) - 1)
+    (x0, y0), (x1, y1) = points[index - 1], points[index]
+    if x1 == x0:
+        return y0
+    return y0 + (value - x0) * (y1 - y0) / (x1 - x0)
+
+
+class ChannelStatus:
+    """Questionable status registers of one channel."""
+
+    def __init__(self):
+        self.condition = 0
+        self.event = 0
+        self.enable = 0
+        self.ptr = 0xffff
+        self.ntr = 0
+
+    def update(self, condition):
+        rising = condition & ~self.condition
+        falling = ~condition & self.condition
+        self.event |= (rising & self.ptr) | (falling & self.ntr)
+        self.condition = condition
+
+
+class SimInstrument:
+    """Model of one virtual instrument."""
+
+    def __init__(self, device, number, name):
+        self.device = device
+        self.number = number
+        self.name = name
+        self.channels = {1: ChannelStatus()}
+        self.isum_enable = 0
+        self.temperature = 30.0
+
+    def condition(self, now) -> int:
+        return 0
+
+    def is_busy(self, now) -> bool:
+        return False
+
+    def busy_until(self, now) -> float:
+        return now
+
+    def update_status(self, now):
+        for status in self.channels.values():
+            status.update(self.condition(now))
+
+    def isum_event(self) -> int:
+        value = 0
+        for channel, status in self.channels.items():
+            if status.event & status.enable:
+                value |= 1 << channel
+        return value
+
+    def read_temperature(self, now) -> float:
+        return self.temperature + random.gauss(0, 0.05)
+
+
+class SimSupply(SimInstrument):
+    """Model of a high voltage power supply with calibrated program and monitors."""
+
+    def __init__(self, device, number, name, max_voltage, max_norm_prog, gain_error=0.01):
+        super().__init__(device, number, name)
+        self.max_voltage = max_voltage
+        self.max_norm_prog = max_norm_prog
+        nominal_full_scale = max_voltage / max_norm_prog
+        self.full_scale = nominal_full_scale * (1 + gain_error)     # output voltage at DAC = 1
+        self.adc_full_scale = nominal_full_scale * (1 - gain_error)  # voltage at voltage ADC = 1
+        self.current_full_scale = 1e-3                               # current at current ADC = 1
+        self.load_resistance = 100e6
+        self.quiescent_resistance = 10e9
+        self.settle_time = 0.05
+        self.noise = 1e-5
+
+        self.setpoint = 0.0
+        self.state = False
+        self.range = max_voltage
+        self.rise_rate = 1000.0
+        self.fall_rate = 1000.0
+        self.ocp = True
+        self.ovp = True
+        self.hw_range = max_voltage
+        self.qcom = False
+        self.tables = {
+            'SOUR:VOLT': [(0.0, 0.0), (max_voltage, max_voltage / nominal_full_scale)],
+            'MEAS:VOLT': [(0.0, 0.0), (1.0, nominal_full_scale)],
+            'MEAS:CURR': [(0.0, 0.0), (1.0, self.current_full_scale)],
+            'MEAS:CURR:QCOM': [(0.0, 0.0), (1.0, 0.0)],
+        }
+        self.counts = {target: len(points) for target, points in self.tables.items()}
+
+        self._ramp_start = 0.0
+        self._ramp_voltage = 0.0
+        self._ramp_target = 0.0
+        self._ramp_rate = 1.0
+        self._reached = 0.0
+
+        self.list_voltages = []
+        self.list_dwells = []
+        self.list_count = 1
+        self.list_start = None
+        self._list_index = -1
+
+    def _target(self) -> float:
+        if not self.state:
+            return 0.0
+        dac = _interpolate(self.tables['SOUR:VOLT'][:self.counts['SOUR:VOLT']], self.setpoint)
+        return min(max(dac, 0.0), 1.0) * self.full_scale
+
+    def voltage(self, now) -> float:
+        """Actual output voltage."""
+        elapsed = now - self._ramp_start
+        delta = self._ramp_target - self._ramp_voltage
+        step = self._ramp_rate * elapsed
+        if step >= abs(delta):
+            return self._ramp_target
+        return self._ramp_voltage + step * (1 if delta > 0 else -1)
+
+    def retarget(self, now):
+        """Start new ramp from the actual voltage to the target."""
+        voltage = self.voltage(now)
+        target = self._target()
+        self._ramp_start = now
+        self._ramp_voltage = voltage
+        self._ramp_target = target
+        self._ramp_rate = max(self.rise_rate if target > voltage else self.fall_rate, 1e-9)
+        self._reached = now + abs(target - voltage) / self._ramp_rate
+
+    def busy_until(self, now) -> float:
+        until = self._reached + self.settle_time
+        if self.list_start is not None:
+            until = max(until, self.list_start + sum(self.list_dwells) * self.list_count)
+        return until
+
+    def is_busy(self, now) -> bool:
+        return now < self.busy_until(now)
+
+    def condition(self, now) -> int:
+        return QUEST_VOLTAGE if self.is_busy(now) else 0
+
+    def update_status(self, now):
+        self.advance_list(now)
+        super().update_status(now)
+
+    def start_list(self, now):
+        if not self.list_voltages or len(self.list_voltages) != len(self.list_dwells):
+            raise SimError(-221)
+        self.list_start = now
+        self._list_index = -1
+        self.advance_list(now)
+
+    def advance_list(self, now):
+        """Apply list steps started up to the given time in chronological order."""
+        if self.list_start is None:
+            return
+        count = len(self.list_voltages)
+        period = sum(self.list_dwells)
+        offsets = [sum(self.list_dwells[:index]) for index in range(count)]
+        while self._list_index + 1 < count * self.list_count:
+            index = self._list_index + 1
+            start = self.list_start + (index // count) * period + offsets[index % count]
+            if start > now:
+                return
+            self.setpoint = self.list_voltages[index % count]
+            self.retarget(start)
+            self._list_index = index
+        if now >= self.list_start + period * self.list_count:
+            self.list_start = None
+
+    def current(self, now) -> float:
+        return self.voltage(now) / self.load_resistance
+
+    def voltage_adc(self, now) -> float:
+        return self.voltage(now) / self.adc_full_scale + random.gauss(0, self.noise)
+
+    def current_adc(self, now) -> float:
+        quiescent = self.voltage(now) / self.quiescent_resistance
+        return (self.current(now) + quiescent) / self.current_full_scale + random.gauss(0, self.noise)
+
+    def measure_voltage(self, now) -> float:
+        return _interpolate(self.tables['MEAS:VOLT'][:self.counts['MEAS:VOLT']], self.voltage_adc(now))
+
+    def measure_current(self, now) -> float:
+        voltage_adc = self.voltage_adc(now)
+        current_adc = self.current_adc(now)
+        if self.qcom:
+            current_adc -= _interpolate(self.tables['MEAS:CURR:QCOM'][:self.counts['MEAS:CURR:QCOM']],
+                                        voltage_adc)
+        return _interpolate(self.tables['MEAS:CURR'][:self.counts['MEAS:CURR']], current_adc)
+
+    def read_temperature(self, now) -> float:
+        return self.temperature + 5.0 * self.voltage(now) / self.full_scale + random.gauss(0, 0.05)
+
+
+class SimAmmeter(SimInstrument):
+    """Model of the ammeter measuring current proportional to the APS output."""
+
+    def __init__(self, device, number, name):
+        super().__init__(device, number, name)
+        self.range = 1e-6
+        self.auto_range = True
+        self.averaging = 1
+        self.zero_check = True
+        self.auto_zero = False
+        self.noise = 1e-12
+
+    def current(self, now) -> float:
+        aps = self.device.instrument_by_name('APS')
+        value = 0.0 if aps is None else 1e-13 * aps.voltage(now)
+        if self.zero_check:
+            value = 0.0
+        return value + random.gauss(0, self.noise)
+
+    def current_adc(self, now) -> float:
+        return self.current(now) / self.range
+
+
+class SimTrace:
+    """Hardware timed buffered acquisition of one instrument."""
+
+    def __init__(self):
+        self.feeds = ['VOLT']
+        self.points = 1
+        self.interval = 0.1
+        self.start = None
+        self.values = []
+
+
+class SimulatedFea:
+    """Model of the FEA unit interpreting SCPI messages."""
+
+    def __init__(self, serial='SIM0001', fw_version='1.0.0', options=()):
+        self.vendor = FEA_VENDOR
+        self.unit_name = FEA_NAME
+        self.serial = serial
+        self.fw_version = fw_version
+        self.options = list(options)
+        self.lock = threading.RLock()
+        self.link_epoch = 0
+        self.link_down_until = 0.0
+
+        # non-volatile memory
+        self.cal_password = SIM_PASSWORD
+        self.cal_state = True
+        self.cal_remark = ''
+        self.cal_serial = serial
+        self.cal_temperature = 25.0
+        self.cal_date = '2021-01-01 00:00:00'
+        self.saved_tables = {}
+
+        self.transactions = 0
+        self.round_trips = 0
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.power_on()
+
+    def power_on(self):
+        """Set the power on state, settings of instruments are lost."""
+        self.instruments: List[SimInstrument] = [
+            SimSupply(self, 1, 'APS', 10000, 0.8),
+            SimSupply(self, 2, 'EPS', 5000, 0.9),
+            SimSupply(self, 3, 'SPS', 1500, 0.6),
+            SimAmmeter(self, 4, 'AMP'),
+        ]
+        self.selected = None
+        self.errors = deque()
+        self.esr = ESR_PON
+        self.ese = 0
+        self.sre = 0
+        self.ques_enable = 0
+        self.inst_enable = 0
+        self.binary = False
+        self.opc_pending = None
+        self.cal_mode = False
+        self.traces: Dict[int, SimTrace] = {}
+
+    def interrupt(self, duration, restart=False):
+        """Break the link to the unit.
+
+        Opened resources are lost and new resources cannot be opened for the duration.
+
+        Parameters
+        ----------
+        duration : float
+            Time in seconds until the link is restored.
+        restart : bool
+            When True the unit is also power cycled.
+        """
+        with self.lock:
+            self.link_epoch += 1
+            self.link_down_until = time.monotonic() + duration
+            if restart:
+                self.power_on()
+
+    def is_link_up(self) -> bool:
+        return time.monotonic() >= self.link_down_until
+
+    def instrument(self, number) -> SimInstrument:
+        for inst in self.instruments:
+            if inst.number == number:
+                return inst
+        raise SimError(-224)
+
+    def instrument_by_name(self, name) -> Optional[SimInstrument]:
+        for inst in self.instruments:
+            if inst.name == name:
+                return inst
+        return None
+
+    def supply(self, number) -> SimSupply:
+        inst = self.instrument(number)
+        if not isinstance(inst, SimSupply):
+            raise SimError(-113)
+        return inst
+
+    def push_error(self, code):
+        if len(self.errors) >= MAX_ERROR_QUEUE:
+            self.errors[-1] = -350
+        else:
+            self.errors.append(code)
+
+    # status reporting
+
+    def update(self, now=None):
+        """Update time dependent status (condition registers and pending operation complete)."""
+        now = time.monotonic() if now is None else now
+        for inst in self.instruments:
+            inst.update_status(now)
+        if self.opc_pending is not None and now >= self.opc_pending:
+            self.opc_pending = None
+            self.esr |= ESR_OPC
+
+    def busy_until(self, now) -> float:
+        until = now
+        for inst in self.instruments:
+            until = max(until, inst.busy_until(now))
+        for trace in self.traces.values():
+            if trace.start is not None:
+                until = max(until, trace.start + trace.points * trace.interval)
+        return until
+
+    def inst_summary(self) -> int:
+        value = 0
+        for inst in self.instruments:
+            if inst.isum_event() & inst.isum_enable:
+                value |= 1 << inst.number
+        return value
+
+    def ques_summary(self) -> int:
+        return QUEST_INST_SUM if self.inst_summary() & self.inst_enable else 0
+
+    def stb(self) -> int:
+        value = 0
+        if self.errors:
+            value |= STB_ERR
+        if self.ques_summary() & self.ques_enable:
+            value |= STB_QES
+        if self.esr & self.ese:
+            value |= STB_ESR
+        return value
+
+    # message processing
+
+    def execute(self, message) -> List[object]:
+        """Execute program message and return list of responses (strings or lists of numbers)."""
+        with self.lock:
+            now = time.monotonic()
+            self.update(now)
+            responses = []
+            for unit in split_response(message):
+                unit = unit.strip()
+                if not unit:
+                    continue
+                try:
+                    response = self._execute_unit(unit, now)
+                except SimError as error:
+                    self.push_error(error.code)
+                    continue
+                except (ValueError, IndexError):
+                    self.push_error(-224)
+                    continue
+                if response is not None:
+                    responses.append(response)
+            self.update()
+            return responses
+
+    def execute_binary(self, message, values) -> None:
+        """Execute command followed by binary block of values."""
+        header = message.strip().rstrip(',')
+        with self.lock:
+            try:
+                self._execute_unit('%s,%s' % (header, ','.join(repr(float(value)) for value in values)),
+                                   time.monotonic())
+            except SimError as error:
+                self.push_error(error.code)
+
+    @staticmethod
+    def _parse(unit) -> Tuple[str, List[int], List[str], bool]:
+        """Split program message unit into normalized header, node numbers, parameters and query flag."""
+        unit = unit.lstrip(':')
+        if ' ' in unit:
+            header, params = unit.split(' ', 1)
+        else:
+            header, params = unit, ''
+        query = header.endswith('?')
+        header = header.rstrip('?').upper()
+
+        nodes = []
+        numbers = []
+        for node in header.split(':'):
+            match = re.fullmatch(r'(\*?[A-Z]+)(\d*)', node)
+            if not match:
+                raise SimError(-102)
+            nodes.append(match.group(1))
+            if match.group(2):
+                numbers.append(int(match.group(2)))
+
+        arguments = []
+        if params:
+            depth = 0
+            quoted = False
+            start = 0
+            for index, char in enumerate(params):
+                if char == '"':
+                    quoted = not quoted
+                elif char == '(' and not quoted:
+                    depth += 1
+                elif char == ')' and not quoted:
+                    depth -= 1
+                elif char == ',' and not quoted and depth == 0:
+                    arguments.append(params[start:index].strip())
+                    start = index + 1
+            arguments.append(params[start:].strip())
+        return ':'.join(nodes), numbers, arguments, query
+
+    @staticmethod
+    def _bool(argument) -> bool:
+        argument = argument.upper()
+        if argument in ('1', 'ON'):
+            return True
+        if argument in ('0', 'OFF'):
+            return False
+        raise SimError(-224)
+
+    @staticmethod
+    def _channel(arguments) -> Optional[int]:
+        for argument in arguments:
+            match = re.fullmatch(r'\(@(\d+)\)', argument.replace(' ', ''))
+            if match:
+                return int(match.group(1))
+        return None
+
+    @staticmethod
+    def _format(value) -> str:
+        if isinstance(value, bool):
+            return '1' if value else '0'
+        if isinstance(value, int):
+            return '%d' % value
+        return '%.9g' % value
+
+    def _execute_unit(self, unit, now):
+        header, numbers, arguments, query = self._parse(unit)
+        number = numbers[0] if numbers else None
+
+        if header.startswith('*'):
+            return self._common(header, arguments, query, now)
+
+        handler = getattr(self, '_cmd_' + header.split(':')[0], None)
+        if handler is None:
+            raise SimError(-113)
+        return handler(header, number, numbers, arguments, query, now)
+
+    def _common(self, header, arguments, query, now):
+        if header == '*IDN' and query:
+            return '%s,%s,%s,%s' % (self.vendor, self.unit_name, self.serial, self.fw_version)
+        if header == '*OPT' and query:
+            return ','.join(self.options) if self.options else '0'
+        if header == '*CLS':
+            self.errors.clear()
+            self.esr = 0
+            for inst in self.instruments:
+                for status in inst.channels.values():
+                    status.event = 0
+            return None
+        if header == '*RST':
+            for inst in self.instruments:
+                if isinstance(inst, SimSupply):
+                    inst.state = False
+                    inst.setpoint = 0.0
+                    inst.retarget(now)
+            return None
+        if header == '*ESE':
+            if query:
+                return '%d' % self.ese
+            self.ese = int(arguments[0])
+            return None
+        if header == '*SRE':
+            if query:
+                return '%d' % self.sre
+            self.sre = int(arguments[0])
+            return None
+        if header == '*ESR' and query:
+            value = self.esr
+            self.esr = 0
+            return '%d' % value
+        if header == '*STB' and query:
+            return '%d' % self.stb()
+        if header == '*OPC':
+            if query:
+                delay = self.busy_until(now) - now
+                if delay > 0:
+                    self.lock.release()
+                    try:
+                        time.sleep(delay)
+                    finally:
+                        self.lock.acquire()
+                return '1'
+            self.opc_pending = self.busy_until(now)
+            return None
+        if header == '*WAI':
+            return None
+        raise SimError(-113)
+
+    def _cmd_INST(self, header, number, numbers, arguments, query, now):
+        if header == 'INST:CAT:FULL' and query:
+            return ','.join('"%s",%d' % (inst.name, inst.number) for inst in self.instruments)
+        if header == 'INST:NSEL':
+            if query:
+                return '%d' % (self.selected or 0)
+            self.instrument(int(arguments[0]))
+            self.selected = int(arguments[0])
+            return None
+        raise SimError(-113)
+
+    def _cmd_SOUR(self, header, number, numbers, arguments, query, now):
+        supply = self.supply(number)
+        if header == 'SOUR:VOLT':
+            if query:
+                return self._format(supply.setpoint)
+            voltage = float(arguments[0])
+            if voltage < 0 or voltage > supply.range or voltage > supply.hw_range:
+                raise SimError(-222)
+            supply.list_start = None
+            supply.setpoint = voltage
+            supply.retarget(now)
+            return None
+        if header.startswith('SOUR:LIST'):
+            return self._list(supply, header, arguments, query, now)
+        raise SimError(-113)
+
+    def _list(self, supply, header, arguments, query, now):
+        if OPTION_LIST not in self.options:
+            raise SimError(-113)
+        if header == 'SOUR:LIST:VOLT':
+            if query:
+                return list(supply.list_voltages)
+            voltages = [float(argument) for argument in arguments]
+            if any(voltage < 0 or voltage > supply.range or voltage > supply.hw_range for voltage in voltages):
+                raise SimError(-222)
+            supply.list_voltages = voltages
+            return None
+        if header == 'SOUR:LIST:DWEL':
+            if query:
+                return list(supply.list_dwells)
+            dwells = [float(argument) for argument in arguments]
+            if any(dwell < 0 for dwell in dwells):
+                raise SimError(-222)
+            supply.list_dwells = dwells
+            return None
+        if header == 'SOUR:LIST:COUN':
+            if query:
+                return '%d' % supply.list_count
+            supply.list_count = int(arguments[0])
+            if supply.list_count < 1:
+                raise SimError(-222)
+            return None
+        raise SimError(-113)
+
+    def _cmd_MEAS(self, header, number, numbers, arguments, query, now):
+        inst = self.instrument(number)
+        if header == 'MEAS:VOLT' and query:
+            return self._format(self.supply(number).measure_voltage(now))
+        if header == 'MEAS:CURR' and query:
+            if isinstance(inst, SimSupply):
+                return self._format(inst.measure_current(now))
+            return self._format(inst.current(now))
+        if not isinstance(inst, SimAmmeter):
+            raise SimError(-113)
+        if header == 'MEAS:CURR:RANG':
+            if query:
+                return self._format(inst.range)
+            inst.range = float(arguments[0])
+            inst.auto_range = False
+            return None
+        if header == 'MEAS:CURR:RANG:AUTO':
+            if query:
+                return self._format(inst.auto_range)
+            inst.auto_range = True
+            return None
+        if header in ('MEAS:CURR:AVER', 'MEAS:CURR:RANG:AVER'):
+            if query:
+                return '%d' % inst.averaging
+            inst.averaging = int(arguments[0])
+            return None
+        raise SimError(-113)
+
+    def _cmd_OUTP(self, header, number, numbers, arguments, query, now):
+        supply = self.supply(number)
+        attributes = {
+            'OUTP:RANG': ('range', float),
+            'OUTP:RISE': ('rise_rate', float),
+            'OUTP:FALL': ('fall_rate', float),
+            'OUTP:OCP:STAT': ('ocp', self._bool),
+            'OUTP:OVP:STAT': ('ovp', self._bool),
+            'OUTP:STAT': ('state', self._bool),
+        }
+        if header not in attributes:
+            raise SimError(-113)
+        name, convert = attributes[header]
+        if query:
+            return self._format(getattr(supply, name))
+        value = convert(arguments[0])
+        if name in ('rise_rate', 'fall_rate', 'range') and value <= 0:
+            raise SimError(-222)
+        setattr(supply, name, value)
+        if name in ('state', 'rise_rate', 'fall_rate'):
+            supply.retarget(now)
+        return None
+
+    def _cmd_DIAG(self, header, number, numbers, arguments, query, now):
+        if header == 'DIAG:TEMP' and query:
+            return self._format(self.instrument(number).read_temperature(now))
+        raise SimError(-113)
+
+    def _cmd_SYST(self, header, number, numbers, arguments, query, now):
+        if header in ('SYST:ERR', 'SYST:ERROR') and query:
+            if not self.errors:
+                return '0,"No error"'
+            code = self.errors.popleft()
+            return '%d,"%s"' % (code, ERROR_MESSAGES.get(code, 'Error'))
+        ammeter = self.instrument_by_name('AMP')
+        if header in ('SYST:ZCH', 'SYST:ZERO'):
+            name = 'zero_check' if header == 'SYST:ZCH' else 'auto_zero'
+            if query:
+                return self._format(getattr(ammeter, name))
+            setattr(ammeter, name, self._bool(arguments[0]))
+            return None
+        raise SimError(-113)
+
+    def _cmd_FORM(self, header, number, numbers, arguments, query, now):
+        if header == 'FORM:DATA':
+            if query:
+                return 'REAL,64' if self.binary else 'ASC'
+            self.binary = arguments[0].upper().startswith('REAL')
+            return None
+        raise SimError(-113)
+
+    def _cmd_STAT(self, header, number, numbers, arguments, query, now):
+        channel = self._channel(arguments)
+        values = [argument for argument in arguments if not argument.startswith('(')]
+        if header == 'STAT:QUES':
+            return '%d' % self.ques_summary() if query else None
+        if header == 'STAT:QUES:ENAB':
+            if query:
+                return '%d' % self.ques_enable
+            self.ques_enable = int(values[0])
+            return None
+        if header == 'STAT:QUES:INST' and number is None:
+            return '%d' % self.inst_summary() if query else None
+        if header == 'STAT:QUES:INST:ENAB' and number is None:
+            if query:
+                return '%d' % self.inst_enable
+            self.inst_enable = int(values[0])
+            return None
+        if not header.startswith('STAT:QUES:INST:ISUM') or number is None:
+            raise SimError(-113)
+
+        inst = self.instrument(number)
+        register = header[len('STAT:QUES:INST:ISUM'):].lstrip(':')
+        if channel is None:
+            if register == '' and query:
+                return '%d' % inst.isum_event()
+            if register == 'ENAB':
+                if query:
+                    return '%d' % inst.isum_enable
+                inst.isum_enable = int(values[0])
+                return None
+            raise SimError(-113)
+
+        if channel not in inst.channels:
+            raise SimError(-224)
+        status = inst.channels[channel]
+        if register == '' and query:
+            value = status.event
+            status.event = 0
+            return '%d' % value
+        if register == 'COND' and query:
+            return '%d' % status.condition
+        attributes = {'ENAB': 'enable', 'PTR': 'ptr', 'NTR': 'ntr'}
+        if register not in attributes:
+            raise SimError(-113)
+        if query:
+            return '%d' % getattr(status, attributes[register])
+        setattr(status, attributes[register], int(values[0]))
+        return None
+
+    def _cmd_CAL(self, header, number, numbers, arguments, query, now):
+        if number is None:
+            return self._calibration(header, arguments, query, now)
+
+        supply = self.supply(number)
+        if header == 'CAL:MEAS:VOLT:LEVEL' and query:
+            return self._format(supply.voltage_adc(now))
+        if header == 'CAL:MEAS:CURR:LEVEL' and query:
+            return self._format(supply.current_adc(now))
+        if header == 'CAL:MEAS:CURR:QCOM:STATE':
+            if query:
+                return self._format(supply.qcom)
+            supply.qcom = self._bool(arguments[0])
+            return None
+        if header == 'CAL:OUTP:RANGE':
+            self._check_cal_mode()
+            supply.hw_range = float(arguments[0])
+            return None
+
+        target, _, register = header[len('CAL:'):].rpartition(':')
+        if target not in supply.tables:
+            raise SimError(-113)
+        if register == 'CAT' and query:
+            points = supply.tables[target][:supply.counts[target]]
+            return [value for point in points for value in point]
+        if register == 'COUNT':
+            if query:
+                return '%d' % supply.counts[target]
+            self._check_cal_mode()
+            count = int(arguments[0])
+            if count > len(supply.tables[target]):
+                raise SimError(-222)
+            supply.counts[target] = count
+            supply.retarget(now)
+            return None
+        if register == 'DATA':
+            self._check_cal_mode()
+            index = int(arguments[0])
+            values = [float(value) for value in arguments[1:]]
+            if len(values) % 2:
+                raise SimError(-224)
+            points = list(supply.tables[target])
+            new_points = list(zip(values[0::2], values[1::2]))
+            points[index:index + len(new_points)] = new_points
+            supply.tables[target] = points
+            return None
+        raise SimError(-113)
+
+    def _check_cal_mode(self):
+        if not self.cal_mode:
+            raise SimError(-203)
+
+    def _calibration(self, header, arguments, query, now):
+        if header == 'CAL:MODE':
+            if query:
+                return self._format(self.cal_mode)
+            if self._bool(arguments[0]):
+                if len(arguments) < 2 or arguments[1].strip('"') != self.cal_password:
+                    raise SimError(-221)
+                self.cal_mode = True
+            else:
+                self.cal_mode = False
+            return None
+        if header == 'CAL:PASS:NEW':
+            if arguments[0].strip('"') != self.cal_password:
+                raise SimError(-221)
+            self.cal_password = arguments[1].strip('"')
+            return None
+        if header in ('CAL:SERIAL', 'CAL:SER'):
+            if query:
+                return '"%s"' % self.cal_serial
+            self._check_cal_mode()
+            self.cal_serial = arguments[0].strip('"')
+            return None
+        if header == 'CAL:STATE':
+            if query:
+                return self._format(self.cal_state)
+            self.cal_state = self._bool(arguments[0])
+            return None
+        if header == 'CAL:REM':
+            if query:
+                return '"%s"' % self.cal_remark
+            self.cal_remark = arguments[0].strip('"')
+            return None
+        if header == 'CAL:TEMP':
+            if query:
+                return self._format(self.cal_temperature)
+            self.cal_temperature = float(arguments[0])
+            return None
+        if header == 'CAL:UPD':
+            self.cal_temperature = self.instruments[0].read_temperature(now)
+            self.cal_date = time.strftime('%Y-%m-%d %H:%M:%S')
+            return None
+        if header == 'CAL:DATE':
+            if query:
+                return '"%s"' % self.cal_date
+            self.cal_date = arguments[0].strip('"')
+            return None
+        if header == 'CAL:SAVE':
+            self._check_cal_mode()
+            self.saved_tables = {inst.number: ({target: list(points) for target, points in inst.tables.items()},
+                                               dict(inst.counts))
+                                 for inst in self.instruments if isinstance(inst, SimSupply)}
+            return None
+        if header == 'CAL:LOAD':
+            for inst in self.instruments:
+                if inst.number in self.saved_tables:
+                    tables, counts = self.saved_tables[inst.number]
+                    inst.tables = {target: list(points) for target, points in tables.items()}
+                    inst.counts = dict(counts)
+                    inst.retarget(now)
+            return None
+        raise SimError(-113)
+
+    def _cmd_TRAC(self, header, number, numbers, arguments, query, now):
+        if OPTION_TRACE not in self.options:
+            raise SimError(-113)
+        trace = self.traces.setdefault(number, SimTrace())
+        if header == 'TRAC:FEED':
+            trace.feeds = [argument.upper() for argument in arguments]
+        elif header == 'TRAC:POIN':
+            trace.points = int(arguments[0])
+        elif header == 'TRAC:TIM':
+            trace.interval = float(arguments[0])
+        else:
+            raise SimError(-113)
+        return None
+
+    def _cmd_INIT(self, header, number, numbers, arguments, query, now):
+        if header == 'INIT:LIST' and OPTION_LIST in self.options:
+            supplies = [self.supply(number)] if number is not None else \
+                [inst for inst in self.instruments if isinstance(inst, SimSupply) and inst.list_voltages]
+            for supply in supplies:
+                supply.start_list(now)
+            return None
+        if OPTION_TRACE not in self.options or header != 'INIT:TRAC':
+            raise SimError(-113)
+        trace = self.traces.setdefault(number, SimTrace())
+        inst = self.instrument(number)
+        sources = {'VOLT': lambda t: inst.measure_voltage(t),
+                   'CURR': lambda t: inst.measure_current(t) if isinstance(inst, SimSupply) else inst.current(t),
+                   'VOLT:LEV': lambda t: inst.voltage_adc(t),
+                   'CURR:LEV': lambda t: inst.current_adc(t)}
+        trace.start = now
+        trace.values = [sources[feed](now + index * trace.interval)
+                        for index in range(trace.points) for feed in trace.feeds]
+        return None
+
+    def _cmd_ABOR(self, header, number, numbers, arguments, query, now):
+        if header != 'ABOR:LIST' or OPTION_LIST not in self.options:
+            raise SimError(-113)
+        for inst in self.instruments:
+            if isinstance(inst, SimSupply) and (number is None or inst.number == number):
+                inst.list_start = None
+        return None
+
+    def _cmd_FETC(self, header, number, numbers, arguments, query, now):
+        if OPTION_TRACE not in self.options or header != 'FETC:TRAC' or not query:
+            raise SimError(-113)
+        trace = self.traces.get(number)
+        if trace is None or trace.start is None:
+            raise SimError(-221)
+        return list(trace.values)
+
+
+class _UserHandle:
+    def __init__(self, value):
+        self.value = value
+
+
+class SimulatedResource:
+    """Transport to the simulated unit mimicking message based pyvisa resource."""
+
+    def __init__(self, resource_name, device: SimulatedFea, interface='GPIB', poll_interval=0.005):
+        self.resource_name = resource_name
+        self.device = device
+        self.interface = interface
+        self.latency, self.byte_time = LATENCY_MODELS[interface]
+        self.read_termination = '\n'
+        self.write_termination = '\n'
+        self.timeout = 2000
+        self.query_delay = 0.0
+        self.poll_interval = poll_interval
+
+        self._output = deque()
+        self._lock = threading.Lock()
+        self._handlers = []
+        self._events_enabled = False
+        self._summary = False
+        self._requesting = False
+        self._events = None
+        self._event_thread = None
+        self._poll_thread = None
+        self._closed = False
+        self._epoch = device.link_epoch
+
+    # latency model
+
+    def _is_lost(self) -> bool:
+        return self._closed or self._epoch != self.device.link_epoch
+
+    def _transaction(self, size, round_trip=True):
+        if self._is_lost():
+            raise pyvisa.errors.VisaIOError(constants.StatusCode.error_connection_lost)
+        with self.device.lock:
+            self.device.transactions += 1
+            if round_trip:
+                self.device.round_trips += 1
+        delay = self.latency + size * self.byte_time
+        if delay > 0:
+            time.sleep(delay)
+
+    def _timeout_error(self):
+        return pyvisa.errors.VisaIOError(constants.StatusCode.error_timeout)
+
+    # message based resource interface
+
+    def clear(self):
+        self._transaction(0)
+        self._output.clear()
+
+    def close(self):
+        self._closed = True
+        self._events_enabled = False
+        if self._events is not None:
+            self._events.put(None)
+
+    def write(self, message):
+        if self._closed:
+            raise pyvisa.errors.VisaIOError(constants.StatusCode.error_connection_lost)
+        self._transaction(len(message) + len(self.write_termination))
+        with self.device.lock:
+            self.device.bytes_written += len(message) + len(self.write_termination)
+        responses = self.device.execute(message)
+        if responses:
+            self._output.append(responses)
+        self._check_service_request()
+
+    def _format_responses(self, responses) -> str:
+        units = []
+        for response in responses:
+            if isinstance(response, list):
+                units.append(','.join(SimulatedFea._format(value) for value in response))
+            else:
+                units.append(response)
+        return ';'.join(units)
+
+    def read(self):
+        if not self._output:
+            # device did not produce any response
+            time.sleep(min(self.timeout, 50) / 1000)
+            raise self._timeout_error()
+        response = self._format_responses(self._output.popleft())
+        self._transaction(len(response) + len(self.read_termination), round_trip=False)
+        with self.device.lock:
+            self.device.bytes_read += len(response) + len(self.read_termination)
+        return response
+
+    def query(self, message, delay=None):
+        self.write(message)
+        return self.read()
+
+    def read_stb(self) -> int:
+        self._transaction(1)
+        with self.device.lock:
+            self.device.update()
+            stb = self.device.stb()
+        if self._requesting:
+            stb |= STB_SRQ
+            self._requesting = False
+        return stb
+
+    def query_binary_values(self, message, datatype='f', is_big_endian=False, container=list, **kwargs):
+        self.write(message)
+        if not self._output:
+            raise self._timeout_error()
+        responses = self._output.popleft()
+        values = [value for response in responses if isinstance(response, list) for value in response]
+        size = len(values) * (8 if datatype == 'd' else 4) + 12
+        self._transaction(size, round_trip=False)
+        with self.device.lock:
+            self.device.bytes_read += size
+        if container is list:
+            return values
+        import numpy
+        return numpy.array(values, dtype=datatype)
+
+    def write_binary_values(self, message, values, datatype='f', is_big_endian=False, **kwargs):
+        if self._closed:
+            raise pyvisa.errors.VisaIOError(constants.StatusCode.error_connection_lost)
+        values = list(values)
+        size = len(message) + len(values) * (8 if datatype == 'd' else 4) + 12
+        self._transaction(size)
+        with self.device.lock:
+            self.device.bytes_written += size
+        self.device.execute_binary(message, values)
+        self._check_service_request()
+
+    # events
+
+    def wrap_handler(self, handler):
+        return handler
+
+    def install_handler(self, event_type, handler, user_handle=None):
+        self._handlers.append((handler, _UserHandle(user_handle)))
+        return user_handle
+
+    def uninstall_handler(self, event_type, handler, user_handle=None):
+        self._handlers = [(h, u) for h, u in self._handlers if h is not handler]
+
+    def enable_event(self, event_type, mechanism, context=None):
+        self._events_enabled = True
+        if self._events is None:
+            self._events = queue.Queue()
+            self._event_thread = threading.Thread(target=self._dispatch_events, name='pyfea-sim-srq', daemon=True)
+            self._event_thread.start()
+            self._poll_thread = threading.Thread(target=self._poll, name='pyfea-sim-poll', daemon=True)
+            self._poll_thread.start()
+
+    def disable_event(self, event_type, mechanism):
+        self._events_enabled = False
+
+    def _check_service_request(self):
+        """Raise service request on rising edge of the enabled status byte summary."""
+        with self.device.lock:
+            self.device.update()
+            summary = bool(self.device.stb() & self.device.sre)
+        with self._lock:
+            if summary and not self._summary:
+                self._requesting = True
+                if self._events_enabled:
+                    self._events.put(constants.EventType.service_request)
+            self._summary = summary
+
+    def _poll(self):
+        while not self._closed and not self._is_lost():
+            time.sleep(self.poll_interval)
+            if self._events_enabled:
+                self._check_service_request()
+
+    def _dispatch_events(self):
+        while True:
+            event = self._events.get()
+            if event is None:
+                return
+            for handler, user_handle in list(self._handlers):
+                try:
+                    handler(self, event, user_handle)
+                except Exception:
+                    pass
+
+
+_devices: Dict[str, SimulatedFea] = {}
+
+
+def register_device(resource_name, device: SimulatedFea):
+    """Use given simulated unit for the resource name (e.g. to configure options or latency)."""
+    _devices[_device_key(resource_name)] = device
+
+
+def get_device(resource_name) -> SimulatedFea:
+    """Get simulated unit behind the resource name, the unit is created on first use."""
+    key = _device_key(resource_name)
+    if key not in _devices:
+        _devices[key] = SimulatedFea(serial='SIM%04d' % (len(_devices) + 1))
+    return _devices[key]
+
+
+def _device_key(resource_name) -> str:
+    return resource_name.upper()
+
+
+def is_simulated(resource_name) -> bool:
+    return resource_name.upper().startswith(SIM_PREFIX)
+
+
+def open_resource(resource_name) -> SimulatedResource:
+    """Open simulated resource.
+
+    Parameters
+    ----------
+    resource_name : str
+        ``SIM::<interface>::...``, where interface is one of GPIB, USB, LAN or NONE (no latency).
+        GPIB is used when the interface is not given.
+    """
+    parts = resource_name.upper().split('::')
+    interface = parts[1] if len(parts) > 1 and parts[1] in LATENCY_MODELS else 'GPIB'
+    device = get_device(resource_name)
+    if not device.is_link_up():
+        raise pyvisa.errors.VisaIOError(constants.StatusCode.error_resource_not_found)
+    return SimulatedResource(resource_name, device, interface)
@@ -0,0 +1,85 @@
+"""Snapshot of measured values of all virtual instruments
+
+This file is part of PyFEA.
+
+"""
+from typing import (List, Tuple)
+from pyfea.scpi import join_commands
+
+
+class Reading:
+    """Measured values of one virtual instrument.
+
+    Quantities not provided by the instrument (e.g. voltage of the ammeter) are None.
+    """
+    __slots__ = ('name', 'voltage', 'current', 'temperature', 'state')
+
+    FIELDS = ('voltage', 'current', 'temperature', 'state')
+
+    def __init__(self, name, voltage=None, current=None, temperature=None, state=None):
+        self.name = name
+        self.voltage = voltage
+        self.current = current
+        self.temperature = temperature
+        self.state = state
+
+    def __repr__(self):
+        return 'Reading(%s, voltage=%s, current=%s, temperature=%s, state=%s)' % \
+               (self.name, self.voltage, self.current, self.temperature, self.state)
+
+
+class Snapshot:
+    """Measured values of several virtual instruments taken by one compound query."""
+    __slots__ = ('timestamp', 'readings')
+
+    def __init__(self, timestamp: float, readings: List[Reading]):
+        self.timestamp = timestamp
+        self.readings = readings
+
+    def __getitem__(self, name) -> Reading:
+        for reading in self.readings:
+            if reading.name == name:
+                return reading
+        raise KeyError(name)
+
+    def __iter__(self):
+        return iter(self.readings)
+
+    def __len__(self):
+        return len(self.readings)
+
+    def __repr__(self):
+        return 'Snapshot(%f, %s)' % (self.timestamp, self.readings)
+
+
+def _to_state(value) -> bool:
+    return int(value) != 0
+
+
+CONVERTERS = {
+    'voltage': float,
+    'current': float,
+    'temperature': float,
+    'state': _to_state,
+}
+
+
+class SnapshotPlan:
+    """Compound query and parsing instructions for a set of virtual instruments."""
+
+    def __init__(self, instruments):
+        self.instruments = list(instruments)
+        self.queries: List[str] = []
+        self.fields: List[Tuple[int, str]] = []
+        for index, instrument in enumerate(self.instruments):
+            for field, query in instrument._snapshot_queries():
+                self.queries.append(query)
+                self.fields.append((index, field))
+        self.message = join_commands(self.queries)
+
+    def parse(self, timestamp, responses) -> Snapshot:
+        """Convert responses to the compound query into a snapshot in a single pass."""
+        readings = [Reading(instrument.name) for instrument in self.instruments]
+        for (index, field), response in zip(self.fields, responses):
+            setattr(readings[index], field, CONVERTERS[field](response))
+        return Snapshot(timestamp, readings)
@@ -0,0 +1,90 @@
+"""Questionable status register tree
+
+This file is part of PyFEA.
+
+"""
+import numpy as np
+from typing import (List, Tuple)
+from pyfea.scpi import (join_commands, split_response)
+
+STATUS_BITS = 16
+
+
+class StatusTable:
+    """Decoded content of the questionable status register tree.
+
+    Rows of the per-channel arrays correspond to ``rows`` (pairs of instrument and channel number).
+    Flag tables have one column per register bit.
+    """
+
+    def __init__(self, rows, summary, instrument_summary, isum, event, condition, previous):
+        self.rows: List[Tuple[object, int]] = rows
+        self.summary = summary
+        self.instrument_summary = instrument_summary
+        self.isum = isum
+        self.event = event
+        self.condition = condition
+        self.changed = condition ^ previous
+        bits = np.arange(STATUS_BITS)
+        self.event_flags = (event[:, np.newaxis] >> bits) & 1 != 0
+        self.condition_flags = (condition[:, np.newaxis] >> bits) & 1 != 0
+        self.changed_flags = (self.changed[:, np.newaxis] >> bits) & 1 != 0
+
+    def flag(self, bit) -> np.ndarray:
+        """Condition of one bit (e.g. ``QUEST_VOLTAGE``) for all channels."""
+        return self.condition & bit != 0
+
+    def rising(self, bit) -> np.ndarray:
+        """Channels where the condition bit was set since the previous read."""
+        return self.changed & self.condition & bit != 0
+
+    def falling(self, bit) -> np.ndarray:
+        """Channels where the condition bit was cleared since the previous read."""
+        return self.changed & ~self.condition & bit != 0
+
+    def deltas(self) -> List[Tuple[object, int, int, bool]]:
+        """List of (instrument, channel, bit, new state) for all condition bits changed since the previous read."""
+        result = []
+        for row, bit in zip(*np.nonzero(self.changed_flags)):
+            instrument, channel = self.rows[row]
+            result.append((instrument, channel, 1 << int(bit), bool(self.condition_flags[row, bit])))
+        return result
+
+
+class StatusTree:
+    """Reader of the whole questionable status register tree by one compound query."""
+
+    def __init__(self, parent, instruments):
+        self._parent = parent
+        self.instruments = list(instruments)
+        self.rows = [(inst, channel) for inst in self.instruments for channel in inst.channels]
+
+        queries = ['STAT:QUES?', 'STAT:QUES:INST?']
+        queries += ['STAT:QUES:INST%d:ISUM?' % inst.number for inst in self.instruments]
+        for inst, channel in self.rows:
+            queries.append('STAT:QUES:INST%d:ISUM? (@%d)' % (inst.number, channel))
+            queries.append('STAT:QUES:INST%d:ISUM:COND? (@%d)' % (inst.number, channel))
+        self.message = join_commands(queries)
+
+        self._previous = np.zeros(len(self.rows), dtype=np.int64)
+
+    def read(self, lock=True) -> StatusTable:
+        """Read and decode the register tree.
+
+        Parameters
+        ----------
+        lock : bool
+            When True the resource lock is acquired before accessing the interface.
+        """
+        response = self._parent.query(self.message, False, lock=lock)
+        return self.decode(split_response(response))
+
+    def decode(self, responses) -> StatusTable:
+        """Decode responses of the compound query and update edge tracking."""
+        values = np.array(responses, dtype=float).astype(np.int64)
+        count = len(self.instruments)
+        channels = values[2 + count:]
+        table = StatusTable(self.rows, int(values[0]), int(values[1]), values[2:2 + count],
+                            channels[0::2], channels[1::2], self._previous)
+        self._previous = table.condition
+        return table
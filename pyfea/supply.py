@@ -4,8 +4,13 @@ This file is part of PyFEA.
 
 """
 import pyfea
+from pyfea.constants import *
 from typing import *
 
+if TYPE_CHECKING:
+    from pyfea.calibration import (CalibrationCurve, SupplyCalibration)
+    from pyfea.measurement import BufferedMeasurement
+
 def floats(string_list) -> List[float]:
     """Convert list of floats represented as strings to list of float numbers."""
     return [float(value) for value in string_list]
@@ -16,6 +21,9 @@ def bool_to_str(bool_value):
     else:
         return "0"
 
+def str_to_bool(string) -> bool:
+    return int(string) != 0
+
 class Supply(pyfea.Instrument):
     """Base class for all FEA virtual power supplies."""
 
@@ -25,6 +33,11 @@ class Supply(pyfea.Instrument):
         self.min_voltage = 0
         self.voltage = 0
 
+    @property
+    def full_scale_voltage(self) -> float:
+        """Largest output voltage magnitude of the supply (in volts)."""
+        return max(abs(self.max_voltage), abs(self.min_voltage))
+
     def select(self):
         self._parent.select_instrument(self.number)
 
@@ -73,6 +86,28 @@ class Supply(pyfea.Instrument):
     def get_voltage(self) -> float:
         return float(self._parent.query('SOUR%d:VOLT?' % (self.number)))
 
+    def settle(self, target=None, tolerance=None, timeout=None) -> bool:
+        """Wait until the output voltage is settled (see :func:`pyfea.settling.settle_supplies`).
+
+        Parameters
+        ----------
+        target : float
+            New output voltage in volts, when None the programmed voltage is awaited.
+        tolerance : float
+            Stability tolerance in volts, 1e-4 of the full scale voltage when None.
+        timeout : float
+            Maximal waiting time in seconds, no limit when None.
+
+        Returns
+        -------
+        bool
+            True when the output is settled, False on timeout or when the output is turned off.
+        """
+        if target is not None:
+            self.set_voltage(target)
+        from pyfea.settling import settle_supplies
+        return settle_supplies(self._parent, {self: target}, tolerance, timeout)
+
     def set_range(self, range, range2=None):
         self._parent.write('OUTP%d:RANG %f' % (self.number, range) +
                            ', %f' % range2 if range2 else '')
@@ -81,16 +116,16 @@ class Supply(pyfea.Instrument):
         return floats(self._parent.query('OUTP%d:RANG?' % self.number))
 
     def set_ocp(self, enable):
-        self._parent.write('OUTP%d:OCP:STAT %s' % (self.number, bool_to_str(enable)))
+        self._cached_write('ocp', 'OUTP%d:OCP:STAT %s' % (self.number, bool_to_str(enable)), bool(enable))
 
     def get_ocp(self):
-        return bool(self._parent.query('OUTP%d:OCP:STAT?' % self.number))
+        return self._cached_query('ocp', 'OUTP%d:OCP:STAT?' % self.number, str_to_bool)
 
     def set_ovp(self, enable):
-        self._parent.write('OUTP%d:OVP:STAT %s' % (self.number, bool_to_str(enable)))
+        self._cached_write('ovp', 'OUTP%d:OVP:STAT %s' % (self.number, bool_to_str(enable)), bool(enable))
 
     def get_ovp(self):
-        return bool(self._parent.query('OUTP%d:OVP:STAT?' % self.number))
+        return self._cached_query('ovp', 'OUTP%d:OVP:STAT?' % self.number, str_to_bool)
 
     def measure_voltage(self) -> float:
         """Measure actual output voltage.
@@ -132,13 +167,45 @@ class Supply(pyfea.Instrument):
         """
         return float(self._parent.query('CAL%d:MEAS:CURR:LEVEL?' % self.number))
 
+    def measure_voltage_buffered(self, count, interval) -> 'BufferedMeasurement':
+        """Acquire block of output voltage samples (see :meth:`pyfea.Instrument.measure_buffered`)."""
+        return self.measure_buffered(['voltage'], count, interval)['voltage']
+
+    def measure_current_buffered(self, count, interval) -> 'BufferedMeasurement':
+        """Acquire block of output current samples (see :meth:`pyfea.Instrument.measure_buffered`)."""
+        return self.measure_buffered(['current'], count, interval)['current']
+
+    def measure_voltage_adc_buffered(self, count, interval) -> 'BufferedMeasurement':
+        """Acquire block of voltage monitor ADC samples (see :meth:`pyfea.Instrument.measure_buffered`)."""
+        return self.measure_buffered(['voltage_adc'], count, interval)['voltage_adc']
+
+    def measure_current_adc_buffered(self, count, interval) -> 'BufferedMeasurement':
+        """Acquire block of current monitor ADC samples (see :meth:`pyfea.Instrument.measure_buffered`)."""
+        return self.measure_buffered(['current_adc'], count, interval)['current_adc']
+
+    def _buffered_queries(self):
+        return {'voltage': ('VOLT', 'MEAS%d:VOLT?' % self.number),
+                'current': ('CURR', 'MEAS%d:CURR?' % self.number),
+                'voltage_adc': ('VOLT:LEV', 'CAL%d:MEAS:VOLT:LEVEL?' % self.number),
+                'current_adc': ('CURR:LEV', 'CAL%d:MEAS:CURR:LEVEL?' % self.number)}
+
+    def _snapshot_queries(self):
+        return [('voltage', 'MEAS%d:VOLT?' % self.number),
+                ('current', 'MEAS%d:CURR?' % self.number),
+                ('temperature', 'DIAG%d:TEMP?' % self.number),
+                ('state', 'OUTP%d:STAT?' % self.number)]
+
     def is_ready(self):
         """Check if output channel voltage is ready (settled) or not."""
 
-        self._parent.read_questionable_regs()
+        if not self._parent.ready_events:
+            self._parent.read_questionable_regs()
+        return self.ready
+
+    def _is_ready_flag(self) -> bool:
         return self.ready
 
-    def _set_ready(self, ready):
+    def _set_ready(self, channel, ready):
         self.ready = ready
 
     def set_calibration_output_range(self, hw_range):
@@ -160,11 +227,11 @@ class Supply(pyfea.Instrument):
         output_range
             User defined maximum output voltage in volts.
         """
-        self._parent.write('OUTP%d:RANG %f' % (self.number, output_range))
+        self._cached_write('range', 'OUTP%d:RANG %f' % (self.number, output_range), float(output_range))
 
     def get_range(self) -> float:
         """Get output soft voltage limit (in volts)"""
-        return float(self._parent.query('OUTP%d:RANG?' % self.number))
+        return self._cached_query('range', 'OUTP%d:RANG?' % self.number, float)
 
     def set_rise_rate(self, rise_rate):
         """Set output rise rate (in volts per second)
@@ -174,11 +241,11 @@ class Supply(pyfea.Instrument):
         rise_rate
             Desired rate of change of rising output voltage in volts per second.
         """
-        self._parent.write('OUTP%d:RISE %f' % (self.number, rise_rate))
+        self._cached_write('rise_rate', 'OUTP%d:RISE %f' % (self.number, rise_rate), float(rise_rate))
 
     def get_rise_rate(self) -> float:
         """Get output rise rate (in volts per second)"""
-        return float(self._parent.query('OUTP%d:RISE?' % self.number))
+        return self._cached_query('rise_rate', 'OUTP%d:RISE?' % self.number, float)
 
     def set_fall_rate(self, fall_rate):
         """Set output fall rate (in volts per second)
@@ -188,11 +255,11 @@ class Supply(pyfea.Instrument):
         fall_rate
             Desired rate of change of falling output voltage in volts per second.
         """
-        self._parent.write('OUTP%d:FALL %f' % (self.number, fall_rate))
+        self._cached_write('fall_rate', 'OUTP%d:FALL %f' % (self.number, fall_rate), float(fall_rate))
 
     def get_fall_rate(self) -> float:
         """Get output fall rate (in volts per second)"""
-        return float(self._parent.query('OUTP%d:FALL?' % self.number))
+        return self._cached_query('fall_rate', 'OUTP%d:FALL?' % self.number, float)
 
     def set_vmonit_calibration_points(self, points):
         """Set voltage monitor calibration points.
@@ -207,6 +274,10 @@ class Supply(pyfea.Instrument):
         """
         self._set_calibration_points(points,'MEAS:VOLT')
 
+    def get_vmonit_calibration_points(self) -> List[Tuple[float, float]]:
+        """Get voltage monitor calibration points."""
+        return self._get_calibration_points('MEAS:VOLT')
+
     def set_imonit_calibration_points(self, points):
         """Set current monitor calibration points.
 
@@ -220,6 +291,10 @@ class Supply(pyfea.Instrument):
         """
         self._set_calibration_points(points,'MEAS:CURR')
 
+    def get_imonit_calibration_points(self) -> List[Tuple[float, float]]:
+        """Get current monitor calibration points."""
+        return self._get_calibration_points('MEAS:CURR')
+
     def set_program_calibration_points(self, points):
         """Set voltage program calibration points.
 
@@ -251,6 +326,10 @@ class Supply(pyfea.Instrument):
         """
         self._set_calibration_points(points,'MEAS:CURR:QCOM')
 
+    def get_quiescent_compensation_points(self) -> List[Tuple[float, float]]:
+        """Get quiescent current compensation points."""
+        return self._get_calibration_points('MEAS:CURR:QCOM')
+
     def quiescent_compensation(self, enable):
         """Enable or disable quiescent current compensation
 
@@ -261,19 +340,39 @@ class Supply(pyfea.Instrument):
         """
         self._parent.write('CAL%d:MEAS:CURR:QCOM:STATE %s' % (self.number, bool_to_str(enable)))
 
+    def is_quiescent_compensation(self) -> bool:
+        """Check if quiescent current compensation is enabled."""
+        return str_to_bool(self._parent.query('CAL%d:MEAS:CURR:QCOM:STATE?' % self.number))
+
+    def get_calibration_curve(self, target) -> 'CalibrationCurve':
+        """Read calibration table and return it as host-side conversion curve.
+
+        Parameters
+        ----------
+        target : str
+            CAL_PROGRAM, CAL_VMONIT, CAL_IMONIT or CAL_QCOM.
+        """
+        from pyfea.calibration import CalibrationCurve
+        return CalibrationCurve(self._get_calibration_points(target), target)
+
+    def get_calibration(self) -> 'SupplyCalibration':
+        """Read all calibration tables for offline conversion of ADC captures and setpoint schedules."""
+        from pyfea.calibration import SupplyCalibration
+        qcom = self.get_calibration_curve(CAL_QCOM) if self.is_quiescent_compensation() else None
+        return SupplyCalibration(self.get_calibration_curve(CAL_PROGRAM), self.get_calibration_curve(CAL_VMONIT),
+                                 self.get_calibration_curve(CAL_IMONIT), qcom)
+
     def _set_calibration_points(self, points, target):
         self._parent.write('CAL%d:%s:COUNT 0' % (self.number, target))
 
         if len(points) > 0:
             value_list = [val for tup in points for val in tup]
-            value_string = ','.join([f"{num:.6g}" for num in value_list])
 
-            self._parent.write('CAL%d:%s:DATA 0,%s' % (self.number, target, value_string))
+            self._parent.write_values('CAL%d:%s:DATA 0,' % (self.number, target), value_list)
             self._parent.write('CAL%d:%s:COUNT %d' % (self.number, target, len(points)))
 
     def _get_calibration_points(self, target) -> List[Tuple[float, float]]:
-        response = self._parent.query('CAL%d:%s:CAT?' % (self.number, target))
-        values = floats(response.split(','))
-        return [(values[i], values[i+1]) for i in range(0, len(values), 2)]
+        values = self._parent.query_values('CAL%d:%s:CAT?' % (self.number, target))
+        return [tuple(pair) for pair in values.reshape(-1, 2).tolist()]
 
 
@@ -0,0 +1,193 @@
+"""Transaction-level instrumentation
+
+Tracer attached to :class:`pyfea.Fea` by :meth:`pyfea.Fea.set_tracer` records every bus transaction (write,
+query, status byte read and error queue read) with its latency, time spent waiting for the interface lock,
+number of bytes moved and outcome. Latency histograms are kept in memory per command prefix, records can be
+passed to exporters (JSONL trace file, ``logging``).
+
+This file is part of PyFEA.
+
+"""
+import bisect
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from typing import (Dict, List, Optional, Tuple)
+
+# histogram bin edges in seconds (logarithmic, 10 us .. 10 s)
+HISTOGRAM_EDGES = [10 ** (exponent / 4) for exponent in range(-20, 5)]
+
+_NUMBERS = re.compile(r'(?<=[A-Za-z])\d+')
+
+
+def command_prefix(command) -> str:
+    """Header of the first command of a program message without numeric suffixes and parameters."""
+    header = command.split(';', 1)[0].split(' ', 1)[0].lstrip(':').upper()
+    return _NUMBERS.sub('', header)
+
+
+def command_instrument(command) -> Optional[int]:
+    """Logical number of the instrument addressed by the first command of a program message."""
+    match = _NUMBERS.search(command.split(';', 1)[0].split(' ', 1)[0])
+    return int(match.group(0)) if match else None
+
+
+class Transaction:
+    """Record of one bus transaction."""
+    __slots__ = ('timestamp', 'kind', 'command', 'instrument', 'latency', 'wait', 'bytes_written', 'bytes_read',
+                 'error')
+
+    def __init__(self, timestamp, kind, command, instrument, latency, wait, bytes_written, bytes_read, error):
+        self.timestamp = timestamp
+        self.kind = kind
+        self.command = command
+        self.instrument = instrument
+        self.latency = latency
+        self.wait = wait
+        self.bytes_written = bytes_written
+        self.bytes_read = bytes_read
+        self.error = error
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return 'Transaction(%s %r, %.3f ms)' % (self.kind, self.command, self.latency * 1e3)
+
+
+class Histogram:
+    """Latency histogram of one command prefix."""
+
+    def __init__(self, edges=HISTOGRAM_EDGES):
+        self.edges = edges
+        self.counts = [0] * (len(edges) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.wait = 0.0
+
+    def add(self, latency, wait):
+        self.counts[bisect.bisect_right(self.edges, latency)] += 1
+        self.count += 1
+        self.total += latency
+        self.wait += wait
+        if latency > self.max:
+            self.max = latency
+
+    @property
+    def mean(self) -> float:
+        return self.total / self.count if self.count else 0.0
+
+    def percentile(self, fraction) -> float:
+        """Upper bin edge below which the given fraction of latencies lies."""
+        limit = fraction * self.count
+        accumulated = 0
+        for index, count in enumerate(self.counts):
+            accumulated += count
+            if accumulated >= limit and count:
+                return self.edges[index] if index < len(self.edges) else self.max
+        return 0.0
+
+
+class Tracer:
+    """Collector of transaction records."""
+
+    def __init__(self, exporters=None, history=10000, edges=HISTOGRAM_EDGES):
+        """Object constructor
+
+        Parameters
+        ----------
+        exporters
+            Objects with ``export(fea, transaction)`` method called for every record.
+        history : int
+            Number of most recent records kept in memory.
+        edges
+            Bin edges of latency histograms in seconds.
+        """
+        self.exporters = list(exporters or [])
+        self.records = deque(maxlen=history)
+        self.histograms: Dict[str, Histogram] = {}
+        self._edges = edges
+        self._lock = threading.Lock()
+
+    def record(self, fea, kind, command, start, wait, bytes_written, bytes_read, error):
+        """Store record of finished transaction (called by :class:`pyfea.Fea`)."""
+        latency = time.perf_counter() - start
+        number = command_instrument(command) if command else None
+        instrument = None
+        if number is not None:
+            inst = fea.get_instrument_by_number(number) if fea.instrument_nums else None
+            instrument = inst.name if inst is not None else None
+        transaction = Transaction(time.time(), kind, command, instrument, latency, wait, bytes_written, bytes_read,
+                                  error)
+        prefix = command_prefix(command) if command else kind
+        with self._lock:
+            self.records.append(transaction)
+            histogram = self.histograms.get(prefix)
+            if histogram is None:
+                histogram = self.histograms[prefix] = Histogram(self._edges)
+            histogram.add(latency, wait)
+        for exporter in self.exporters:
+            exporter.export(fea, transaction)
+
+    def histogram(self, prefix) -> Tuple[List[float], List[int]]:
+        """Bin edges and counts of the latency histogram of the command prefix (e.g. 'MEAS:VOLT?')."""
+        histogram = self.histograms[prefix]
+        return list(histogram.edges), list(histogram.counts)
+
+    def summary(self) -> Dict[str, dict]:
+        """Count, mean, 95th percentile and maximum of latency and total lock wait per command prefix."""
+        with self._lock:
+            return {prefix: {'count': histogram.count,
+                             'mean': histogram.mean,
+                             'p95': histogram.percentile(0.95),
+                             'max': histogram.max,
+                             'wait': histogram.wait}
+                    for prefix, histogram in self.histograms.items()}
+
+    def reset(self):
+        with self._lock:
+            self.records.clear()
+            self.histograms = {}
+
+    def close(self):
+        for exporter in self.exporters:
+            close = getattr(exporter, 'close', None)
+            if close:
+                close()
+
+
+class JsonlExporter:
+    """Exporter writing one JSON object per transaction to a file."""
+
+    def __init__(self, path):
+        self._file = open(path, 'a')
+        self._lock = threading.Lock()
+
+    def export(self, fea, transaction):
+        line = json.dumps(transaction.to_dict())
+        with self._lock:
+            self._file.write(line + '\n')
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+class LoggingExporter:
+    """Exporter passing transactions to the ``logging`` module."""
+
+    def __init__(self, logger=None, level=logging.DEBUG):
+        self.logger = logger if logger is not None else logging.getLogger('pyfea.trace')
+        self.level = level
+
+    def export(self, fea, transaction):
+        if transaction.error:
+            self.logger.warning('%s %s %r failed after %.3f ms: %s', fea.visa_name, transaction.kind,
+                                transaction.command, transaction.latency * 1e3, transaction.error)
+        elif self.logger.isEnabledFor(self.level):
+            self.logger.log(self.level, '%s %s %r %.3f ms (wait %.3f ms)', fea.visa_name, transaction.kind,
+                            transaction.command, transaction.latency * 1e3, transaction.wait * 1e3)